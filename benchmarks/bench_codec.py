@@ -0,0 +1,81 @@
+"""
+Compares the runner message codecs - the time to encode and decode an
+invocation and its response, and the encoded size - for small, medium and
+large events, with and without compression.
+
+    python benchmarks/bench_codec.py
+"""
+
+import timeit
+
+from smyth.runner.codec import CODECS, MessageCodec, get_codec
+from smyth.types import RunnerInputMessage, RunnerResponseMessage
+
+EVENT_SIZES = {"small": 1, "medium": 100, "large": 5_000}
+COMPRESSION_THRESHOLD = 16 * 1024
+ROUNDS = 1_000
+
+
+def make_messages(items: int) -> tuple[RunnerInputMessage, RunnerResponseMessage]:
+    records = [
+        {
+            "messageId": f"message-{index}",
+            "body": f'{{"order_id": {index}, "status": "paid", "total": 12.5}}',
+            "attributes": {"ApproximateReceiveCount": "1"},
+        }
+        for index in range(items)
+    ]
+    invocation = RunnerInputMessage(
+        type="smyth.lambda.invoke",
+        event={"Records": records},
+        context={"aws_request_id": "request-id", "deadline_ms": 0},
+    )
+    response = RunnerResponseMessage(
+        type="smyth.lambda.response",
+        response={"statusCode": 200, "body": "x" * (items * 50)},
+    )
+    return invocation, response
+
+
+def round_trip(
+    codec: MessageCodec,
+    invocation: RunnerInputMessage,
+    response: RunnerResponseMessage,
+) -> int:
+    encoded_invocation = codec.encode(invocation)
+    encoded_response = codec.encode(response)
+    codec.decode_input(encoded_invocation)
+    codec.decode_output(encoded_response)
+    return len(encoded_invocation) + len(encoded_response)
+
+
+def get_codecs() -> list[tuple[str, MessageCodec]]:
+    codecs = []
+    for name in CODECS:
+        for threshold in (None, COMPRESSION_THRESHOLD):
+            try:
+                codec = get_codec(name, compression_threshold=threshold)
+            except ValueError:
+                continue
+            codecs.append((f"{name}{'+zlib' if threshold else ''}", codec))
+    return codecs
+
+
+def main() -> None:
+    print(f"{'event':>8} {'codec':>14} {'bytes':>10} {'µs/round trip':>15}")
+    for size_name, items in EVENT_SIZES.items():
+        invocation, response = make_messages(items)
+        for codec_name, codec in get_codecs():
+            size = round_trip(codec, invocation, response)
+            duration = timeit.timeit(
+                lambda codec=codec: round_trip(codec, invocation, response),  # type: ignore[misc]
+                number=ROUNDS,
+            )
+            print(
+                f"{size_name:>8} {codec_name:>14} {size:>10} "
+                f"{duration / ROUNDS * 1e6:>15.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Compares the cost of the context data sent to a runner with every invocation -
+the whole context, with the `asdict` copy of the handler, Smyth used to send -
+with the per-invocation part sent now that the static part is kept by the
+runners.
+
+    python benchmarks/bench_context.py
+"""
+
+import asyncio
+import pickle
+import timeit
+from dataclasses import asdict
+
+from starlette.routing import compile_path
+
+from smyth.context import generate_context_data, generate_static_context_data
+from smyth.event import generate_api_gw_v2_event_data
+from smyth.runner.process import RunnerProcess
+from smyth.runner.strategy import first_warm
+from smyth.types import RunnerInputMessage, SmythHandler
+
+INVOCATIONS = 10_000
+
+
+async def generate_full_context_data(
+    smyth_handler: SmythHandler, process: RunnerProcess
+) -> dict[str, object]:
+    """What `generate_context_data` returned before the split."""
+    return {
+        "smyth": {
+            "process": {
+                "name": process.name,
+                "state": process.state,
+                "task_counter": process.task_counter,
+                "last_used_timestamp": process.last_used_timestamp,
+            },
+            "handler": {
+                "name": smyth_handler.name,
+                "smyth_handler_config": asdict(smyth_handler),
+            },
+        },
+        "timeout": smyth_handler.timeout,
+    }
+
+
+def send_cost(context: dict[str, object]) -> int:
+    return len(
+        pickle.dumps(
+            RunnerInputMessage(type="smyth.lambda.invoke", event={}, context=context)
+        )
+    )
+
+
+async def main() -> None:
+    handler = SmythHandler(
+        name="orders",
+        url_path=compile_path("/orders/{order_id}")[0],
+        lambda_handler_path="handlers.order_handler",
+        event_data_function=generate_api_gw_v2_event_data,
+        context_data_function=generate_context_data,
+        strategy_generator=first_warm,
+        timeout=30,
+        env_overrides={"DATABASE_URL": "postgres://localhost/orders"},
+    )
+    process = RunnerProcess("orders:0", handler.lambda_handler_path)
+
+    full = await generate_full_context_data(handler, process)
+    split = await generate_context_data(None, handler, process)
+    static = generate_static_context_data(handler)
+
+    async def time_invocations(full_context: bool) -> float:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _ in range(INVOCATIONS):
+            if full_context:
+                send_cost(await generate_full_context_data(handler, process))
+            else:
+                send_cost(await generate_context_data(None, handler, process))
+        return loop.time() - started
+
+    full_time = await time_invocations(full_context=True)
+    split_time = await time_invocations(full_context=False)
+    static_time = timeit.timeit(lambda: generate_static_context_data(handler), number=1)
+
+    print(f"{'':>12} {'bytes':>8} {'µs/invocation':>15}")
+    print(f"{'full':>12} {send_cost(full):>8} {full_time / INVOCATIONS * 1e6:>15.2f}")
+    print(
+        f"{'per-invoke':>12} {send_cost(split):>8} "
+        f"{split_time / INVOCATIONS * 1e6:>15.2f}"
+    )
+    print(
+        f"{'static':>12} {len(pickle.dumps(static)):>8} "
+        f"{static_time * 1e6:>15.2f}  (once per runner)"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""
+Compares the linear `url_path.match` scan Smyth used to do on every request
+with the compiled `smyth.router.Router`, for 10, 100 and 1000 routes.
+
+    python benchmarks/bench_router.py
+"""
+
+import timeit
+
+from starlette.routing import compile_path
+
+from smyth.router import Router
+from smyth.types import SmythHandler
+
+ROUTE_COUNTS = (10, 100, 1000)
+LOOKUPS = 10_000
+
+
+def make_handlers(count: int) -> list[SmythHandler]:
+    return [
+        SmythHandler(
+            name=f"handler_{index}",
+            url_path=compile_path(f"/service_{index}/items/{{item_id}}")[0],
+            lambda_handler_path="handlers.handler",
+            event_data_function=None,  # type: ignore[arg-type]
+            context_data_function=None,  # type: ignore[arg-type]
+            strategy_generator=None,  # type: ignore[arg-type]
+        )
+        for index in range(count)
+    ]
+
+
+def linear_scan(handlers: list[SmythHandler], path: str) -> SmythHandler:
+    for handler in handlers:
+        if handler.url_path.match(path):
+            return handler
+    raise LookupError(path)
+
+
+def main() -> None:
+    print(f"{'routes':>8} {'linear':>12} {'compiled':>12} {'cached':>12}  (µs/lookup)")
+    for count in ROUTE_COUNTS:
+        handlers = make_handlers(count)
+        # the worst case for the linear scan - the last registered route
+        paths = [f"/service_{count - 1}/items/{index}" for index in range(LOOKUPS)]
+
+        router = Router(cache_size=0)
+        for handler in handlers:
+            router.add(handler)
+        cached_router = Router()
+        for handler in handlers:
+            cached_router.add(handler)
+        hot_path = paths[0]
+
+        linear = timeit.timeit(
+            lambda: [linear_scan(handlers, path) for path in paths], number=1
+        )
+        compiled = timeit.timeit(
+            lambda: [router.resolve(path) for path in paths], number=1
+        )
+        cached = timeit.timeit(
+            lambda: [cached_router.resolve(hot_path) for _ in paths], number=1
+        )
+        print(
+            f"{count:>8} {linear / LOOKUPS * 1e6:>12.2f} "
+            f"{compiled / LOOKUPS * 1e6:>12.2f} {cached / LOOKUPS * 1e6:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
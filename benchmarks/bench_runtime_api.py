@@ -0,0 +1,98 @@
+"""
+Compares the runner transports - Smyth's queues and the Lambda Runtime API -
+by the round trip of an invocation of a handler returning its event, for small,
+medium and large events. The runtime is a minimal Python custom runtime
+keeping its connection to the Runtime API open, like the runtime interface
+client does.
+
+    python benchmarks/bench_runtime_api.py
+"""
+
+import os
+import sys
+import timeit
+
+from smyth.runner.process import RunnerProcess
+from smyth.runner.runtime_api import RuntimeAPIRunnerProcess
+from smyth.types import RunnerInputMessage
+from smyth.utils import import_attribute
+
+EVENT_SIZES = {"small": 1, "medium": 100, "large": 5_000}
+INVOCATIONS = 500
+
+BOOTSTRAP = """
+import http.client, json, os
+from smyth.utils import import_attribute
+
+handler = import_attribute(os.environ["_HANDLER"])
+connection = http.client.HTTPConnection(os.environ["AWS_LAMBDA_RUNTIME_API"])
+while True:
+    connection.request("GET", "/2018-06-01/runtime/invocation/next")
+    response = connection.getresponse()
+    request_id = response.headers["Lambda-Runtime-Aws-Request-Id"]
+    event = json.loads(response.read())
+    body = json.dumps(handler(event, None)).encode()
+    connection.request(
+        "POST", f"/2018-06-01/runtime/invocation/{request_id}/response", body
+    )
+    connection.getresponse().read()
+"""
+
+
+def echo(event: dict[str, object], context: object) -> dict[str, object]:
+    return event
+
+
+def make_invocation(items: int) -> RunnerInputMessage:
+    return RunnerInputMessage(
+        type="smyth.lambda.invoke",
+        event={
+            "Records": [
+                {"messageId": f"message-{index}", "body": "x" * 40}
+                for index in range(items)
+            ]
+        },
+        context={"aws_request_id": "request-id"},
+    )
+
+
+def main() -> None:
+    # The runtime imports the handler the way the runner processes do
+    os.environ["PYTHONPATH"] = os.pathsep.join(sys.path)
+    handler_path = f"{__spec__.name if __spec__ else 'bench_runtime_api'}.echo"
+    import_attribute(handler_path)
+    runners = {
+        "queue": RunnerProcess(
+            name="queue", lambda_handler_path=handler_path, log_level="WARNING"
+        ),
+        "runtime_api": RuntimeAPIRunnerProcess(
+            name="runtime_api",
+            lambda_handler_path=handler_path,
+            command=[sys.executable, "-c", BOOTSTRAP],
+            static_context={"timeout": 60},
+        ),
+    }
+    for runner in runners.values():
+        runner.start()
+    try:
+        print(f"{'event':>8} {'transport':>12} {'µs/invocation':>15}")
+        for size_name, items in EVENT_SIZES.items():
+            invocation = make_invocation(items)
+            for transport, runner in runners.items():
+                # The cold start isn't part of the round trip
+                runner.send(invocation)
+                duration = timeit.timeit(
+                    lambda runner=runner: runner.send(invocation),  # type: ignore[misc]
+                    number=INVOCATIONS,
+                )
+                print(
+                    f"{size_name:>8} {transport:>12} "
+                    f"{duration / INVOCATIONS * 1e6:>15.2f}"
+                )
+    finally:
+        for runner in runners.values():
+            runner.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Measures Smyth's own overhead, to compare Smyth versions:
+
+- `runner.send` - the round trip of a no-op handler through
+  `RunnerProcess.send`
+- `http` - a request through `SmythStarlette`, routing, the event and context
+  functions, the runner and the response
+- `cold_start.<start method>` - starting a runner and its first invocation,
+  for every runner start method available
+- `throughput.<strategy>.c<concurrency>` - invocations per second and their
+  latency, with as many concurrent invocations as the handler has runners
+
+The results are written as JSON, and compared with the results of another
+version, `--baseline`, the exit code is 1 when a metric got worse by more than
+`--threshold`.
+
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --baseline results.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import platform
+import sys
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timezone
+from time import perf_counter
+from typing import Any
+
+import httpx
+
+from smyth.__about__ import __version__
+from smyth.runner.process import (
+    RUNNER_PROCESS_CLASSES,
+    START_METHODS,
+    RunnerProcess,
+    configure_start_method,
+)
+from smyth.runner.strategy import first_warm, round_robin
+from smyth.server.app import SmythStarlette
+from smyth.smyth import Smyth
+from smyth.types import RunnerInputMessage, StrategyGenerator
+
+CONCURRENCIES = (1, 4, 16)
+STRATEGIES: dict[str, StrategyGenerator] = {
+    "first_warm": first_warm,
+    "round_robin": round_robin,
+}
+COLD_STARTS = 3
+# How much worse than the baseline a metric can get, 0.2 is 20%
+DEFAULT_THRESHOLD = 0.2
+
+Results = dict[str, dict[str, float]]
+
+
+def noop_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
+    return {"statusCode": 200, "body": ""}
+
+
+# The runners import the handler from this module
+HANDLER_PATH = f"{__spec__.name if __spec__ else 'suite'}.noop_handler"
+
+
+def percentile(samples: list[float], percent: float) -> float:
+    """Nearest-rank percentile of sorted samples."""
+    index = max(math.ceil(len(samples) * percent / 100) - 1, 0)
+    return samples[index]
+
+
+def summarize(latencies: list[float]) -> dict[str, float]:
+    """Latency statistics in microseconds."""
+    samples = sorted(latency * 1e6 for latency in latencies)
+    return {
+        "mean_us": round(sum(samples) / len(samples), 2),
+        "p50_us": round(percentile(samples, 50), 2),
+        "p99_us": round(percentile(samples, 99), 2),
+        "max_us": round(samples[-1], 2),
+    }
+
+
+def invocation() -> RunnerInputMessage:
+    return RunnerInputMessage(
+        type="smyth.lambda.invoke",
+        event={},
+        context={"aws_request_id": "request-id"},
+    )
+
+
+def bench_runner_send(rounds: int) -> dict[str, float]:
+    process = RunnerProcess(
+        name="bench:0", lambda_handler_path=HANDLER_PATH, log_level="WARNING"
+    )
+    process.start()
+    try:
+        # The cold start isn't part of the round trip
+        process.send(invocation())
+        latencies = []
+        for _ in range(rounds):
+            started = perf_counter()
+            process.send(invocation())
+            latencies.append(perf_counter() - started)
+    finally:
+        process.stop()
+    return summarize(latencies)
+
+
+def bench_cold_start(start_method: str) -> dict[str, float]:
+    configure_start_method(start_method)
+    durations = []
+    for index in range(COLD_STARTS):
+        started = perf_counter()
+        process = RUNNER_PROCESS_CLASSES[start_method](
+            name=f"bench:{index}",
+            lambda_handler_path=HANDLER_PATH,
+            log_level="WARNING",
+        )
+        process.start()
+        process.send(invocation())
+        durations.append(perf_counter() - started)
+        process.stop()
+    return {
+        "mean_ms": round(sum(durations) / len(durations) * 1000, 2),
+        "max_ms": round(max(durations) * 1000, 2),
+    }
+
+
+def create_smyth(concurrency: int, strategy: StrategyGenerator) -> Smyth:
+    smyth = Smyth()
+    smyth.add_handler(
+        name="noop",
+        path="/noop",
+        lambda_handler_path=HANDLER_PATH,
+        log_level="WARNING",
+        concurrency=concurrency,
+        strategy_generator=strategy,
+    )
+    return smyth
+
+
+async def measure(
+    call: Callable[[], Awaitable[Any]], concurrency: int, rounds: int
+) -> tuple[float, list[float]]:
+    """Runs `call` `rounds` times per concurrent caller, returns the total
+    duration and the latency of every call."""
+    latencies: list[float] = []
+
+    async def caller() -> None:
+        for _ in range(rounds):
+            started = perf_counter()
+            await call()
+            latencies.append(perf_counter() - started)
+
+    started = perf_counter()
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    return perf_counter() - started, latencies
+
+
+async def bench_http(rounds: int) -> dict[str, float]:
+    app = SmythStarlette(smyth=create_smyth(1, first_warm), smyth_path_prefix="/smyth")
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://smyth"
+        ) as client:
+
+            async def request() -> None:
+                response = await client.get("/noop")
+                response.raise_for_status()
+
+            await request()
+            _, latencies = await measure(request, 1, rounds)
+    return summarize(latencies)
+
+
+async def bench_throughput(
+    concurrency: int, strategy: StrategyGenerator, rounds: int
+) -> dict[str, float]:
+    with create_smyth(concurrency, strategy) as smyth:
+        handler = smyth.get_handler_for_name("noop")
+
+        async def invoke() -> None:
+            await smyth.invoke(handler, {})
+
+        # Warms up every runner
+        await measure(invoke, concurrency, 2)
+        duration, latencies = await measure(invoke, concurrency, rounds)
+    return {
+        "rps": round(len(latencies) / duration, 2),
+        **summarize(latencies),
+    }
+
+
+def run(rounds: int) -> Results:
+    results: Results = {}
+    print("runner.send", file=sys.stderr)
+    results["runner.send"] = bench_runner_send(rounds)
+    print("http", file=sys.stderr)
+    results["http"] = asyncio.run(bench_http(rounds))
+    for start_method in START_METHODS:
+        if start_method not in multiprocessing.get_all_start_methods():
+            continue
+        print(f"cold_start.{start_method}", file=sys.stderr)
+        results[f"cold_start.{start_method}"] = bench_cold_start(start_method)
+    for strategy_name, strategy in STRATEGIES.items():
+        for concurrency in CONCURRENCIES:
+            name = f"throughput.{strategy_name}.c{concurrency}"
+            print(name, file=sys.stderr)
+            results[name] = asyncio.run(
+                bench_throughput(concurrency, strategy, max(rounds // concurrency, 1))
+            )
+    return results
+
+
+def is_regression(metric: str, value: float, baseline: float, threshold: float) -> bool:
+    # The maximums are too noisy to fail on
+    if not baseline or metric.startswith("max_"):
+        return False
+    # Throughput is better higher, the latencies and durations lower
+    if metric == "rps":
+        return value < baseline * (1 - threshold)
+    return value > baseline * (1 + threshold)
+
+
+def compare(results: Results, baseline: Results, threshold: float) -> list[str]:
+    """Prints every metric next to its baseline, returns the regressions."""
+    regressions = []
+    print(
+        f"{'benchmark':>30} {'metric':>8} {'baseline':>12} {'current':>12} "
+        f"{'change':>8}"
+    )
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            if (previous := baseline.get(name, {}).get(metric)) is None:
+                continue
+            change = (value - previous) / previous * 100 if previous else 0.0
+            regression = is_regression(metric, value, previous, threshold)
+            if regression:
+                regressions.append(f"{name} {metric}")
+            print(
+                f"{name:>30} {metric:>8} {previous:>12.2f} {value:>12.2f} "
+                f"{change:>+7.1f}%{' !' if regression else ''}"
+            )
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare with the results in this file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--rounds", type=int, default=1000)
+    arguments = parser.parse_args()
+
+    results = run(arguments.rounds)
+    report = {
+        "smyth": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "created": datetime.now(timezone.utc).isoformat(),
+        "rounds": arguments.rounds,
+        "benchmarks": results,
+    }
+    if arguments.output:
+        with open(arguments.output, "w") as output:
+            json.dump(report, output, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if arguments.baseline:
+        with open(arguments.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline["benchmarks"], arguments.threshold)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
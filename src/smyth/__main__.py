@@ -1,19 +1,24 @@
+import asyncio
+import json
 import logging
 import logging.config
+import math
 import os
+import sys
+from dataclasses import replace
 from enum import Enum
-from typing import Annotated, Optional
+from pathlib import Path
+from typing import Annotated, Any, Optional
 
 import typer
-import uvicorn
 from setproctitle import setproctitle
 
-from smyth.config import get_config, get_config_dict, serialize_config
+from smyth.config import Config, get_config, get_config_dict, serialize_config
 from smyth.utils import get_logging_config
 
+# The commands import what they need, the server (uvicorn, starlette) isn't
+# needed to benchmark or replay, and none of it to print the help
 app = typer.Typer()
-config = get_config(get_config_dict())
-
 
 LOGGER = logging.getLogger(__name__)
 
@@ -36,8 +41,14 @@ def run(
         ),  # noqa: UP007
     ] = "smyth.server.app:create_app",
     factory: Annotated[bool, typer.Option(help="Use factory for app creation")] = True,
-    host: Annotated[Optional[str], typer.Option()] = config.host,  # noqa: UP007
-    port: Annotated[Optional[int], typer.Option()] = config.port,  # noqa: UP007
+    host: Annotated[
+        Optional[str],  # noqa: UP007
+        typer.Option(help="Override the host specified in the configuration"),
+    ] = None,
+    port: Annotated[
+        Optional[int],  # noqa: UP007
+        typer.Option(help="Override the port specified in the configuration"),
+    ] = None,
     log_level: Annotated[
         Optional[LogLevel],  # noqa: UP007
         typer.Option(
@@ -46,19 +57,62 @@ def run(
                 "only for the main process"
             )
         ),
-    ] = LogLevel(config.log_level),
+    ] = None,
     quiet: Annotated[
         bool, typer.Option(help="Effectively the same as --log-level=ERROR")
     ] = False,
+    workers: Annotated[
+        int,
+        typer.Option(
+            min=1,
+            help=(
+                "Number of HTTP worker processes, they share one pool of runners "
+                "(needs --no-reload)"
+            ),
+        ),
+    ] = 1,
+    reload: Annotated[
+        bool, typer.Option(help="Restart Smyth when your code changes")
+    ] = True,
+    hot_reload: Annotated[
+        Optional[bool],  # noqa: UP007, UP045
+        typer.Option(
+            help=(
+                "Restart only the runners of the handlers whose code changed, "
+                "instead of the whole Smyth (replaces --reload), overrides the "
+                "configuration"
+            )
+        ),
+    ] = None,
+    capture: Annotated[
+        Optional[Path],  # noqa: UP007, UP045
+        typer.Option(
+            dir_okay=False,
+            help="Record every invocation to this JSON Lines file, to replay it",
+        ),
+    ] = None,
 ) -> None:
-    if host:
-        config.host = host
-    if port:
-        config.port = port
-    if log_level:
-        config.log_level = log_level.value
-    if quiet:
-        config.log_level = "ERROR"
+    """Serves the handlers."""
+    import uvicorn
+
+    from smyth.runner.remote import RUNNER_POOL_ENVIRON
+    from smyth.supervisor import start_runner_pool, stop_runner_pool
+
+    overrides: dict[str, Any] = {
+        "host": host,
+        "port": port,
+        "log_level": "ERROR" if quiet else log_level.value if log_level else None,
+        "hot_reload": hot_reload,
+        "capture_path": str(capture.resolve()) if capture else None,
+    }
+    config = replace(
+        get_config(get_config_dict()),
+        **{name: value for name, value in overrides.items() if value is not None},
+    )
+    if config.hot_reload:
+        reload = False
+    if workers > 1 and reload:
+        raise typer.BadParameter("Multiple workers need --no-reload")
 
     logging_config = get_logging_config(
         log_level=config.log_level, filter_path_prefix=config.smyth_path_prefix
@@ -67,17 +121,260 @@ def run(
     setproctitle("smyth")
     os.environ["__SMYTH_CONFIG"] = serialize_config(config)
 
-    uvicorn.run(
-        smyth_starlette_app,
-        factory=factory,
-        host=config.host,
-        port=config.port,
-        reload=True,
-        log_config=logging_config,
-        timeout_keep_alive=60 * 15,
-        lifespan="on",
+    runner_pool = None
+    if workers > 1:
+        runner_pool = start_runner_pool()
+        os.environ[RUNNER_POOL_ENVIRON] = runner_pool[1]
+
+    try:
+        uvicorn.run(
+            smyth_starlette_app,
+            factory=factory,
+            host=config.host,
+            port=config.port,
+            reload=reload,
+            workers=workers,
+            log_config=logging_config,
+            timeout_keep_alive=60 * 15,
+            timeout_graceful_shutdown=math.ceil(config.shutdown_timeout),
+            lifespan="on",
+        )
+    finally:
+        if runner_pool is not None:
+            stop_runner_pool(*runner_pool)
+
+
+@app.command()
+def bench(
+    handler: Annotated[str, typer.Argument(help="Name of the handler to invoke")],
+    concurrency: Annotated[
+        int,
+        typer.Option(
+            min=1,
+            help=(
+                "Invocations kept in flight (with --url, also the number of "
+                "connections)"
+            ),
+        ),
+    ] = 1,
+    rps: Annotated[
+        Optional[float],  # noqa: UP007, UP045
+        typer.Option(
+            min=0.001,
+            help=(
+                "Start this many invocations a second instead, however many "
+                "are in flight"
+            ),
+        ),
+    ] = None,
+    duration: Annotated[
+        float, typer.Option(min=0.001, help="How long to invoke, in seconds")
+    ] = 10,
+    event: Annotated[str, typer.Option(help="The event, as JSON")] = "{}",
+    event_file: Annotated[
+        Optional[Path],  # noqa: UP007, UP045
+        typer.Option(
+            exists=True,
+            dir_okay=False,
+            help="A JSON event, or JSON Lines of events invoked in turn",
+        ),
+    ] = None,
+    url: Annotated[
+        Optional[str],  # noqa: UP007, UP045
+        typer.Option(
+            help=(
+                "Invoke the handler of a running Smyth at this URL, "
+                "instead of in-process"
+            )
+        ),
+    ] = None,
+    output: Annotated[
+        Optional[Path],  # noqa: UP007, UP045
+        typer.Option(help="Write the results to this JSON file"),
+    ] = None,
+    baseline: Annotated[
+        Optional[Path],  # noqa: UP007, UP045
+        typer.Option(
+            exists=True,
+            dir_okay=False,
+            help="Fail when the results are worse than the ones in this file",
+        ),
+    ] = None,
+    threshold: Annotated[
+        Optional[float],  # noqa: UP007, UP045
+        typer.Option(
+            min=0,
+            help=(
+                "How much worse than the baseline is a regression, 0.2 is 20% "
+                "[default: 0.2]"
+            ),
+        ),
+    ] = None,
+) -> None:
+    """Invokes a handler under load and reports the throughput, latencies,
+    cold starts and errors."""
+    from smyth.bench import (
+        DEFAULT_THRESHOLD,
+        HTTPTarget,
+        InProcessTarget,
+        compare_with_baseline,
+        format_summary,
+        read_events,
+        run_benchmark,
+    )
+
+    config = get_config(get_config_dict())
+    setproctitle("smyth:bench")
+    logging.config.dictConfig(get_logging_config("WARNING"))
+    try:
+        events = read_events(event_file) if event_file else [json.loads(event)]
+    except json.JSONDecodeError as error:
+        raise typer.BadParameter(f"Invalid event: {error}")
+
+    target: InProcessTarget | HTTPTarget
+    try:
+        if url:
+            target = HTTPTarget(url, handler, config.smyth_path_prefix, concurrency)
+        else:
+            target = InProcessTarget(config, handler)
+    except ValueError as error:
+        raise typer.BadParameter(str(error))
+
+    with target:
+        report = asyncio.run(
+            run_benchmark(target, events, duration, concurrency, rate=rps)
+        )
+    summary = report.get_summary()
+    typer.echo(format_summary(summary))
+    if output:
+        output.write_text(json.dumps(summary, indent=2))
+
+    if baseline:
+        baseline_summary: dict[str, Any] = json.loads(baseline.read_text())
+        if regressions := compare_with_baseline(
+            summary,
+            baseline_summary,
+            DEFAULT_THRESHOLD if threshold is None else threshold,
+        ):
+            typer.echo("Regressions against the baseline:", err=True)
+            for regression in regressions:
+                typer.echo(f"  {regression}", err=True)
+            raise typer.Exit(1)
+
+
+@app.command(name="replay")
+def replay_command(
+    capture_file: Annotated[
+        Path,
+        typer.Argument(
+            exists=True,
+            dir_okay=False,
+            help="Invocations recorded with `smyth run --capture`",
+        ),
+    ],
+    speed: Annotated[
+        float,
+        typer.Option(
+            min=0.001,
+            help="Replay this many times faster than the invocations were recorded",
+        ),
+    ] = 1.0,
+    handler: Annotated[
+        Optional[list[str]],  # noqa: UP007, UP045
+        typer.Option(help="Replay only the invocations of this handler"),
+    ] = None,
+    output: Annotated[
+        Optional[Path],  # noqa: UP007, UP045
+        typer.Option(help="Write the results to this JSON file"),
+    ] = None,
+    strict: Annotated[
+        bool,
+        typer.Option(help="Fail when a response differs from the recorded one"),
+    ] = False,
+    threshold: Annotated[
+        Optional[float],  # noqa: UP007, UP045
+        typer.Option(
+            min=0,
+            help=(
+                "Fail when a latency percentile is worse than the recorded one "
+                "by more than this, 0.2 is 20%"
+            ),
+        ),
+    ] = None,
+) -> None:
+    """Invokes the handlers with the recorded invocations and compares the
+    latencies and responses with the recorded ones."""
+    from smyth.bench import format_replay_summary, replay
+    from smyth.capture import read_capture
+    from smyth.server.app import create_smyth
+
+    setproctitle("smyth:replay")
+    logging.config.dictConfig(get_logging_config("WARNING"))
+    try:
+        invocations = read_capture(capture_file)
+    except (json.JSONDecodeError, KeyError) as error:
+        raise typer.BadParameter(f"Invalid capture file: {error}")
+    if handler:
+        invocations = [
+            invocation for invocation in invocations if invocation["handler"] in handler
+        ]
+    replay_config = get_replay_config(
+        get_config(get_config_dict()),
+        {invocation["handler"] for invocation in invocations},
     )
 
+    with create_smyth(replay_config) as smyth:
+        report = asyncio.run(replay(smyth, invocations, speed))
+    summary = report.get_summary()
+    typer.echo(format_replay_summary(summary))
+    if output:
+        output.write_text(json.dumps(summary, indent=2))
+
+    failed = False
+    if strict and summary["mismatches"]:
+        typer.echo("Responses differ from the recorded ones", err=True)
+        failed = True
+    if threshold is not None and (regressions := report.get_regressions(threshold)):
+        typer.echo("Regressions against the recorded latencies:", err=True)
+        for regression in regressions:
+            typer.echo(f"  {regression}", err=True)
+        failed = True
+    if failed:
+        raise typer.Exit(1)
+
+
+def get_replay_config(config: Config, handler_names: set[str]) -> Config:
+    """The configuration of only the replayed handlers, not capturing the
+    replayed invocations."""
+    if unknown := handler_names - set(config.handlers):
+        raise typer.BadParameter(
+            f"Unknown handlers in the capture: {', '.join(sorted(unknown))}"
+        )
+    return replace(
+        config,
+        handlers={
+            name: handler_config
+            for name, handler_config in config.handlers.items()
+            if name in handler_names
+        },
+        capture_path=None,
+    )
+
+
+def get_arguments(args: list[str]) -> list[str]:
+    """`run` is the default command, `python -m smyth` keeps starting Smyth."""
+    commands = {
+        command.name or getattr(command.callback, "__name__", "")
+        for command in app.registered_commands
+    }
+    if args and (args[0] in commands or args[0] in ("--help", "-h")):
+        return args
+    return ["run", *args]
+
+
+def main() -> None:
+    app(args=get_arguments(sys.argv[1:]))
+
 
 if __name__ == "__main__":
-    app()
+    main()
@@ -0,0 +1,515 @@
+import asyncio
+import json
+import math
+import threading
+from collections.abc import Awaitable, Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from http.client import HTTPConnection
+from itertools import cycle
+from pathlib import Path
+from time import monotonic
+from types import TracebackType
+from typing import Any
+from urllib.parse import urlsplit
+
+from smyth.capture import CapturedInvocation
+from smyth.config import Config
+from smyth.exceptions import SmythRuntimeError
+from smyth.runner.codec import decode_json_bytes, encode_json_default
+from smyth.server.app import create_smyth
+from smyth.smyth import Smyth
+from smyth.types import EventData
+
+# How much worse than the baseline the throughput and latencies can get, 0.2
+# is 20%
+DEFAULT_THRESHOLD = 0.2
+# How much the error rate can grow over the baseline's
+ERROR_RATE_TOLERANCE = 0.01
+
+# How many of the responses that differ from the recorded ones are reported
+MAX_MISMATCHES = 10
+
+# Invokes the handler with the event, returns the type of the error if it
+# failed
+Invoker = Callable[[EventData], Awaitable[str | None]]
+
+
+def percentile(samples: list[float], percent: float) -> float:
+    """Nearest-rank percentile of sorted samples."""
+    if not samples:
+        return 0.0
+    return samples[max(math.ceil(len(samples) * percent / 100) - 1, 0)]
+
+
+def get_latency_summary(latencies: list[float]) -> dict[str, float]:
+    """The latency percentiles, and the maximum, in milliseconds."""
+    samples = sorted(latencies)
+    return {
+        name: round(percentile(samples, percent) * 1000, 3)
+        for name, percent in (("p50", 50), ("p90", 90), ("p99", 99))
+    } | {"max": round(samples[-1] * 1000, 3) if samples else 0.0}
+
+
+def count_cold_starts(before: list[int], after: list[int]) -> int:
+    """How many runners served their first invocation, from their task
+    counters before and after the benchmark."""
+    return sum(
+        1
+        for index, task_counter in enumerate(after)
+        if task_counter and (index >= len(before) or not before[index])
+    )
+
+
+@dataclass
+class LoadReport:
+    invocations: int = 0
+    duration: float = 0
+    cold_starts: int = 0
+    errors: dict[str, int] = field(default_factory=dict)
+    latencies: list[float] = field(default_factory=list, repr=False)
+
+    def record(self, latency: float, error_type: str | None = None) -> None:
+        self.invocations += 1
+        # Throttled invocations fail right away, they'd hide the latency of
+        # the ones that ran
+        if error_type is None:
+            self.latencies.append(latency)
+        else:
+            self.errors[error_type] = self.errors.get(error_type, 0) + 1
+
+    def get_summary(self) -> dict[str, Any]:
+        error_count = sum(self.errors.values())
+        return {
+            "invocations": self.invocations,
+            "duration_s": round(self.duration, 3),
+            "throughput_rps": (
+                round(self.invocations / self.duration, 2) if self.duration else 0.0
+            ),
+            "latency_ms": get_latency_summary(self.latencies),
+            "cold_starts": self.cold_starts,
+            "errors": dict(self.errors),
+            "error_rate": (
+                round(error_count / self.invocations, 4) if self.invocations else 0.0
+            ),
+        }
+
+
+async def generate_load(
+    invoke: Invoker,
+    events: Iterable[EventData],
+    duration: float,
+    concurrency: int = 1,
+    rate: float | None = None,
+) -> LoadReport:
+    """
+    Invokes the handler for `duration` seconds, with the events in turn.
+
+    By default `concurrency` invocations are kept in flight, each one starting
+    when the previous one ends. With a `rate` the invocations are started that
+    many times a second instead, however many are in flight, and their latency
+    is counted from when they were due - so a slow handler shows as a growing
+    latency rather than a lower rate.
+    """
+    report = LoadReport()
+    next_event = cycle(events).__next__
+
+    async def call(event: EventData, started: float) -> None:
+        error_type = await invoke(event)
+        report.record(monotonic() - started, error_type)
+
+    started = monotonic()
+    deadline = started + duration
+    if rate is None:
+
+        async def worker() -> None:
+            while monotonic() < deadline:
+                await call(next_event(), monotonic())
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    else:
+        tasks: set[asyncio.Task[None]] = set()
+        index = 0
+        while (due := started + index / rate) < deadline:
+            await asyncio.sleep(max(due - monotonic(), 0))
+            task = asyncio.create_task(call(next_event(), due))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            index += 1
+        await asyncio.gather(*tasks)
+    report.duration = monotonic() - started
+    return report
+
+
+class InProcessTarget:
+    """Invokes the handler with `Smyth.invoke`, in a Smyth of its own started
+    with only that handler's runners, as many as configured. Invocations in
+    flight above its concurrency wait for a runner."""
+
+    def __init__(self, config: Config, handler_name: str):
+        if handler_name not in config.handlers:
+            raise ValueError(f"Unknown handler {handler_name}")
+        self.smyth = create_smyth(
+            replace(config, handlers={handler_name: config.handlers[handler_name]})
+        )
+        self.handler = self.smyth.get_handler_for_name(handler_name)
+
+    def __enter__(self) -> "InProcessTarget":
+        self.smyth.start_runners()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.smyth.stop_runners()
+
+    async def invoke(self, event: EventData) -> str | None:
+        try:
+            await self.smyth.invoke(self.handler, event)
+        except SmythRuntimeError as error:
+            return type(error).__name__
+        return None
+
+    async def get_task_counters(self) -> list[int]:
+        return [
+            process.task_counter for process in self.smyth.processes[self.handler.name]
+        ]
+
+
+class HTTPTarget:
+    """Invokes the handler of a running Smyth with the Lambda Invoke API, over
+    at most `connections` kept-alive connections."""
+
+    def __init__(
+        self,
+        url: str,
+        handler_name: str,
+        smyth_path_prefix: str = "/smyth",
+        connections: int = 1,
+    ):
+        parts = urlsplit(url)
+        if parts.scheme != "http" or not parts.hostname:
+            raise ValueError(f"Invalid Smyth URL {url}")
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.handler_name = handler_name
+        self.path = parts.path.rstrip("/")
+        self.api_path = f"{self.path}{smyth_path_prefix}/api"
+        self.executor = ThreadPoolExecutor(
+            max_workers=connections, thread_name_prefix="smyth:bench"
+        )
+        self._local = threading.local()
+
+    def __enter__(self) -> "HTTPTarget":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.executor.shutdown()
+
+    def request(
+        self, method: str, path: str, body: bytes | None = None
+    ) -> tuple[int, str | None, bytes]:
+        """Returns the status, the `x-amzn-ErrorType` header and the body."""
+        try:
+            return self.send_request(method, path, body)
+        except ConnectionError:
+            # The server may have closed the kept-alive connection
+            return self.send_request(method, path, body)
+
+    def send_request(
+        self, method: str, path: str, body: bytes | None
+    ) -> tuple[int, str | None, bytes]:
+        connection: HTTPConnection | None = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = HTTPConnection(self.host, self.port)
+        try:
+            connection.request(method, path, body=body)
+            response = connection.getresponse()
+            return (
+                response.status,
+                response.getheader("x-amzn-ErrorType"),
+                response.read(),
+            )
+        except OSError:
+            connection.close()
+            self._local.connection = None
+            raise
+
+    async def invoke(self, event: EventData) -> str | None:
+        try:
+            status, error_type, _ = await asyncio.get_running_loop().run_in_executor(
+                self.executor,
+                self.request,
+                "POST",
+                f"{self.path}/2015-03-31/functions/{self.handler_name}/invocations",
+                json.dumps(event).encode(),
+            )
+        except OSError as error:
+            return type(error).__name__
+        if status >= 400:
+            return error_type or f"HTTP {status}"
+        return None
+
+    async def get_task_counters(self) -> list[int]:
+        status, _, body = await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.request, "GET", f"{self.api_path}/status"
+        )
+        if status != 200:
+            return []
+        handlers = json.loads(body)["lambda handlers"]
+        return [
+            process["task_counter"]
+            for process in handlers.get(self.handler_name, {}).get("processes", [])
+        ]
+
+
+async def run_benchmark(
+    target: InProcessTarget | HTTPTarget,
+    events: Iterable[EventData],
+    duration: float,
+    concurrency: int = 1,
+    rate: float | None = None,
+) -> LoadReport:
+    before = await target.get_task_counters()
+    report = await generate_load(target.invoke, events, duration, concurrency, rate)
+    report.cold_starts = count_cold_starts(before, await target.get_task_counters())
+    return report
+
+
+def read_events(path: Path) -> list[EventData]:
+    """The events of a JSON file with one event, or a JSON Lines file."""
+    text = path.read_text()
+    try:
+        return [json.loads(text)]
+    except json.JSONDecodeError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def compare_with_baseline(
+    summary: dict[str, Any],
+    baseline: dict[str, Any],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> list[str]:
+    """The metrics of the summary that are worse than the baseline's."""
+    regressions = []
+    throughput, baseline_throughput = (
+        summary["throughput_rps"],
+        baseline["throughput_rps"],
+    )
+    if throughput < baseline_throughput * (1 - threshold):
+        regressions.append(
+            f"throughput {throughput} rps, baseline {baseline_throughput} rps"
+        )
+    for name in ("p50", "p90", "p99"):
+        latency, baseline_latency = (
+            summary["latency_ms"][name],
+            baseline["latency_ms"][name],
+        )
+        if latency > baseline_latency * (1 + threshold):
+            regressions.append(
+                f"{name} latency {latency} ms, baseline {baseline_latency} ms"
+            )
+    error_rate, baseline_error_rate = summary["error_rate"], baseline["error_rate"]
+    if error_rate > baseline_error_rate + ERROR_RATE_TOLERANCE:
+        regressions.append(
+            f"error rate {error_rate:.2%}, baseline {baseline_error_rate:.2%}"
+        )
+    return regressions
+
+
+def format_latency(latency: dict[str, float]) -> str:
+    return ", ".join(f"{name} {value} ms" for name, value in latency.items())
+
+
+def format_summary(summary: dict[str, Any]) -> str:
+    latency = summary["latency_ms"]
+    lines = [
+        f"Invocations:  {summary['invocations']} in {summary['duration_s']}s",
+        f"Throughput:   {summary['throughput_rps']} rps",
+        f"Latency:      {format_latency(latency)}",
+        f"Cold starts:  {summary['cold_starts']}",
+        f"Error rate:   {summary['error_rate']:.2%}",
+    ]
+    lines.extend(
+        f"  {error_type}: {count}" for error_type, count in summary["errors"].items()
+    )
+    return "\n".join(lines)
+
+
+def normalize_response(response: Any) -> Any:
+    """The response as it would be read back from a capture."""
+    return decode_json_bytes(
+        json.loads(json.dumps(response, default=encode_json_default))
+    )
+
+
+@dataclass
+class HandlerReplay:
+    recorded_latencies: list[float] = field(default_factory=list)
+    latencies: list[float] = field(default_factory=list)
+    matches: int = 0
+    mismatches: int = 0
+    # Streamed responses aren't recorded, they can't be compared
+    unchecked: int = 0
+    errors: dict[str, int] = field(default_factory=dict)
+
+    def get_summary(self) -> dict[str, Any]:
+        return {
+            "invocations": len(self.latencies),
+            "recorded_latency_ms": get_latency_summary(self.recorded_latencies),
+            "latency_ms": get_latency_summary(self.latencies),
+            "matches": self.matches,
+            "mismatches": self.mismatches,
+            "unchecked": self.unchecked,
+            "errors": dict(self.errors),
+        }
+
+
+@dataclass
+class ReplayReport:
+    handlers: dict[str, HandlerReplay] = field(default_factory=dict)
+    # The first `MAX_MISMATCHES` responses that differ from the recorded ones
+    mismatches: list[dict[str, Any]] = field(default_factory=list)
+    duration: float = 0
+
+    def record(
+        self,
+        index: int,
+        invocation: CapturedInvocation,
+        latency: float,
+        response: Any = None,
+        error_type: str | None = None,
+    ) -> None:
+        handler = self.handlers.setdefault(invocation["handler"], HandlerReplay())
+        handler.recorded_latencies.append(invocation["duration_ms"] / 1000)
+        handler.latencies.append(latency)
+        if error_type is not None:
+            handler.errors[error_type] = handler.errors.get(error_type, 0) + 1
+        recorded_error = (invocation.get("error") or {}).get("type")
+        if invocation.get("streamed") and error_type is None:
+            handler.unchecked += 1
+            return
+        if recorded_error is not None or error_type is not None:
+            matches = recorded_error == error_type
+            response = {"error": error_type}
+            expected = {"error": recorded_error}
+        else:
+            response = normalize_response(response)
+            expected = invocation["response"]
+            matches = response == expected
+        if matches:
+            handler.matches += 1
+            return
+        handler.mismatches += 1
+        if len(self.mismatches) < MAX_MISMATCHES:
+            self.mismatches.append(
+                {
+                    "index": index,
+                    "handler": invocation["handler"],
+                    "expected": expected,
+                    "actual": response,
+                }
+            )
+
+    def get_summary(self) -> dict[str, Any]:
+        return {
+            "duration_s": round(self.duration, 3),
+            "handlers": {
+                name: handler.get_summary() for name, handler in self.handlers.items()
+            },
+            "mismatches": self.mismatches,
+        }
+
+    def get_regressions(self, threshold: float = DEFAULT_THRESHOLD) -> list[str]:
+        """The latency percentiles that are worse than the recorded ones."""
+        regressions = []
+        for name, handler in self.handlers.items():
+            recorded = get_latency_summary(handler.recorded_latencies)
+            replayed = get_latency_summary(handler.latencies)
+            for percentile_name in ("p50", "p90", "p99"):
+                if replayed[percentile_name] > recorded[percentile_name] * (
+                    1 + threshold
+                ):
+                    regressions.append(
+                        f"{name} {percentile_name} latency "
+                        f"{replayed[percentile_name]} ms, "
+                        f"recorded {recorded[percentile_name]} ms"
+                    )
+        return regressions
+
+
+async def replay(
+    smyth: Smyth, invocations: list[CapturedInvocation], speed: float = 1.0
+) -> ReplayReport:
+    """
+    Invokes the handlers with the recorded events, with the same time between
+    the invocations as when they were recorded, divided by `speed`. Compares
+    the latencies, and the responses and errors, with the recorded ones.
+    """
+    if speed <= 0:
+        raise ValueError("speed must be positive")
+    report = ReplayReport()
+    if not invocations:
+        return report
+
+    async def invoke(index: int, invocation: CapturedInvocation) -> None:
+        handler = smyth.get_handler_for_name(invocation["handler"])
+        started = monotonic()
+        try:
+            response = await smyth.invoke(handler, invocation["event"])
+        except SmythRuntimeError as error:
+            report.record(
+                index,
+                invocation,
+                monotonic() - started,
+                error_type=type(error).__name__,
+            )
+        else:
+            report.record(index, invocation, monotonic() - started, response)
+
+    started = monotonic()
+    first_timestamp = invocations[0]["timestamp"]
+    tasks = []
+    for index, invocation in enumerate(invocations):
+        due = started + (invocation["timestamp"] - first_timestamp) / speed
+        await asyncio.sleep(max(due - monotonic(), 0))
+        tasks.append(asyncio.create_task(invoke(index, invocation)))
+    await asyncio.gather(*tasks)
+    report.duration = monotonic() - started
+    return report
+
+
+def format_replay_summary(summary: dict[str, Any]) -> str:
+    lines = [f"Replayed in {summary['duration_s']}s"]
+    for name, handler in summary["handlers"].items():
+        recorded, latency = handler["recorded_latency_ms"], handler["latency_ms"]
+        lines.extend(
+            [
+                f"{name}: {handler['invocations']} invocations",
+                f"  Latency:    {format_latency(latency)}",
+                f"  Recorded:   {format_latency(recorded)}",
+                (
+                    f"  Responses:  {handler['matches']} matching, "
+                    f"{handler['mismatches']} different, "
+                    f"{handler['unchecked']} streamed"
+                ),
+            ]
+        )
+        lines.extend(
+            f"  {error_type}: {count}"
+            for error_type, count in handler["errors"].items()
+        )
+    for mismatch in summary["mismatches"]:
+        lines.append(
+            f"Invocation {mismatch['index']} of {mismatch['handler']}: expected "
+            f"{json.dumps(mismatch['expected'])}, got {json.dumps(mismatch['actual'])}"
+        )
+    return "\n".join(lines)
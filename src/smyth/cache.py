@@ -0,0 +1,151 @@
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from time import monotonic
+from typing import Any, TypeAlias
+
+from starlette.requests import Request
+
+from smyth.types import LambdaResponse
+
+LOGGER = logging.getLogger(__name__)
+
+CacheKey: TypeAlias = tuple[str, str, tuple[tuple[str, str], ...], tuple[str, ...]]
+CACHEABLE_METHODS = frozenset(("GET", "HEAD"))
+
+
+@dataclass
+class CacheEntry:
+    response: LambdaResponse
+    size: int
+    expires_at: float
+
+
+@dataclass
+class CacheMetrics:
+    hits: int = 0
+    misses: int = 0
+    invalidations: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+
+def get_encoded_size(value: str | bytes) -> int:
+    return len(value.encode()) if isinstance(value, str) else len(value)
+
+
+def get_response_size(response: LambdaResponse) -> int:
+    """The size of the response in bytes, with strings counted UTF-8
+    encoded."""
+    return get_encoded_size(response.body) + sum(
+        get_encoded_size(name) + get_encoded_size(value)
+        for name, value in response.headers.items()
+    )
+
+
+def requests_invalidation(request: Request) -> bool:
+    """Whether the client asked for a fresh response with
+    `Cache-Control: max-age=0`, like API Gateway allows."""
+    directives = request.headers.get("cache-control", "").lower().split(",")
+    return any(
+        directive.strip().replace(" ", "") == "max-age=0" for directive in directives
+    )
+
+
+class ResponseCache:
+    """A handler's response cache, like the API Gateway stage cache.
+
+    Successful responses to `GET` and `HEAD` requests are cached for `ttl`
+    seconds. Responses are keyed by method and path, plus the values of the
+    `key_query_parameters` and `key_headers` - other query parameters and
+    headers don't make a difference, like in API Gateway. When the cached bodies
+    and headers take more than `max_bytes`, the least recently used responses
+    are evicted.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 300,
+        max_bytes: int = 16 * 1024 * 1024,
+        key_query_parameters: list[str] | None = None,
+        key_headers: list[str] | None = None,
+    ) -> None:
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.key_query_parameters = key_query_parameters or []
+        self.key_headers = [header.lower() for header in key_headers or []]
+        self.entries: OrderedDict[CacheKey, CacheEntry] = OrderedDict()
+        self.size = 0
+        self.metrics = CacheMetrics()
+
+    def get_key(self, request: Request) -> CacheKey | None:
+        """Returns the cache key of the request, `None` if it can't be
+        cached."""
+        if request.method not in CACHEABLE_METHODS:
+            return None
+        return (
+            request.method,
+            request.url.path,
+            tuple(
+                (name, value)
+                for name in self.key_query_parameters
+                for value in request.query_params.getlist(name)
+            ),
+            tuple(request.headers.get(name, "") for name in self.key_headers),
+        )
+
+    def get(self, key: CacheKey) -> LambdaResponse | None:
+        entry = self.entries.get(key)
+        if entry is not None and entry.expires_at <= monotonic():
+            self.metrics.expirations += 1
+            self.remove(key)
+            entry = None
+        if entry is None:
+            self.metrics.misses += 1
+            return None
+        self.metrics.hits += 1
+        self.entries.move_to_end(key)
+        return entry.response
+
+    def put(self, key: CacheKey, response: LambdaResponse) -> None:
+        if not 200 <= response.status_code < 300:
+            return
+        self.remove(key)
+        size = get_response_size(response)
+        if size > self.max_bytes:
+            LOGGER.debug("Response of %s bytes is too big to cache", size)
+            return
+        while self.size + size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= evicted.size
+            self.metrics.evictions += 1
+        self.entries[key] = CacheEntry(
+            response=response, size=size, expires_at=monotonic() + self.ttl
+        )
+        self.size += size
+
+    def invalidate(self, key: CacheKey) -> None:
+        self.metrics.invalidations += 1
+        self.remove(key)
+
+    def remove(self, key: CacheKey) -> None:
+        if (entry := self.entries.pop(key, None)) is not None:
+            self.size -= entry.size
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.size = 0
+
+    def get_status(self) -> dict[str, Any]:
+        lookups = self.metrics.hits + self.metrics.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.metrics.hits,
+            "misses": self.metrics.misses,
+            "hit_ratio": self.metrics.hits / lookups if lookups else 0,
+            "invalidations": self.metrics.invalidations,
+            "evictions": self.metrics.evictions,
+            "expirations": self.metrics.expirations,
+        }
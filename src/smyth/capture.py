@@ -0,0 +1,97 @@
+import json
+import logging
+import os
+from pathlib import Path
+from threading import Lock
+from typing import Any
+
+from smyth.runner.codec import BYTES_KEY, decode_json_bytes, encode_json_default
+from smyth.types import LambdaStreamingResponse, RunnerInputMessage
+
+LOGGER = logging.getLogger(__name__)
+
+CapturedInvocation = dict[str, Any]
+
+
+class TrafficRecorder:
+    """Appends every invocation - the event, the context, the response or
+    error, when it started, how long it took and which runner ran it - to a
+    JSON Lines file, to replay it later (see `smyth.bench.replay`).
+
+    Every invocation is written with a single append, so the HTTP workers can
+    record to the same file. Bytes are written base64 encoded, like the JSON
+    runner codec does. The file is opened by the first invocation recorded,
+    and again by the next one once it's closed.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._fd: int | None = None
+        self._lock = Lock()
+
+    def get_fd(self) -> int:
+        with self._lock:
+            if self._fd is None:
+                self._fd = os.open(
+                    self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644
+                )
+            return self._fd
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def record(
+        self,
+        handler_name: str,
+        runner: str,
+        message: RunnerInputMessage,
+        timestamp: float,
+        duration: float,
+        cold_start: bool,
+        response: Any = None,
+        error: Exception | None = None,
+    ) -> None:
+        streamed = isinstance(response, LambdaStreamingResponse)
+        invocation: CapturedInvocation = {
+            "timestamp": timestamp,
+            "handler": handler_name,
+            "runner": runner,
+            "cold_start": cold_start,
+            "duration_ms": round(duration * 1000, 3),
+            "event": message.event,
+            "context": message.context,
+            # Streamed responses are sent as they are read, they aren't kept
+            "response": None if streamed else response,
+            "streamed": streamed,
+            "error": (
+                {"type": type(error).__name__, "message": str(error)}
+                if error is not None
+                else None
+            ),
+        }
+        try:
+            line = json.dumps(invocation, default=encode_json_default) + "\n"
+        except (TypeError, ValueError) as encode_error:
+            LOGGER.warning(
+                "Can't record an invocation of %s: %s", handler_name, encode_error
+            )
+            return
+        os.write(self.get_fd(), line.encode())
+
+
+def read_capture(path: str | Path) -> list[CapturedInvocation]:
+    """The invocations recorded by `TrafficRecorder`, in the order they
+    started."""
+    invocations = []
+    with open(path, "rb") as capture:
+        for line in capture:
+            if not line.strip():
+                continue
+            invocation = json.loads(line)
+            if BYTES_KEY.encode() in line:
+                invocation = decode_json_bytes(invocation)
+            invocations.append(invocation)
+    return sorted(invocations, key=lambda invocation: invocation["timestamp"])
@@ -0,0 +1,89 @@
+import gzip
+import zlib
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# Bodies at least this big are compressed in a thread, not on the event loop
+OFF_LOOP_COMPRESSION_SIZE = 64 * 1024
+GZIP_COMPRESSION_LEVEL = 6
+BROTLI_COMPRESSION_QUALITY = 4
+
+
+def get_supported_encodings() -> list[str]:
+    """Content encodings Smyth can compress with, in order of preference."""
+    if brotli is not None:
+        return ["br", "gzip", "deflate"]
+    return ["gzip", "deflate"]
+
+
+def parse_accept_encoding(accept_encoding: str) -> dict[str, float]:
+    """Parses an `Accept-Encoding` header into encodings and their weights."""
+    encodings: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        encoding, _, parameters = item.partition(";")
+        encoding = encoding.strip().lower()
+        if not encoding:
+            continue
+        weight = 1.0
+        for parameter in parameters.split(";"):
+            name, _, value = parameter.partition("=")
+            if name.strip() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        encodings[encoding] = weight
+    return encodings
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """Picks the content encoding the client accepts with the highest weight,
+    preferring the better compression on ties."""
+    accepted = parse_accept_encoding(accept_encoding)
+    best_encoding, best_weight = None, 0.0
+    for encoding in get_supported_encodings():
+        weight = accepted.get(encoding, accepted.get("*", 0.0))
+        if weight > best_weight:
+            best_encoding, best_weight = encoding, weight
+    return best_encoding
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br" and brotli is not None:
+        compressed: bytes = brotli.compress(body, quality=BROTLI_COMPRESSION_QUALITY)
+        return compressed
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_COMPRESSION_LEVEL, mtime=0)
+    if encoding == "deflate":
+        return zlib.compress(body, GZIP_COMPRESSION_LEVEL)
+    raise ValueError(f"Unsupported content encoding {encoding}")
+
+
+async def compress_response(
+    response: Response, accept_encoding: str, minimum_compression_size: int
+) -> None:
+    """Compresses the response body like API Gateway does when it's at least
+    `minimum_compression_size` bytes and the client accepts a supported
+    encoding. Error responses are left readable."""
+    if response.status_code >= 400 or "content-encoding" in response.headers:
+        return
+    if len(response.body) < minimum_compression_size:
+        return
+    if (encoding := choose_encoding(accept_encoding)) is None:
+        return
+
+    if len(response.body) >= OFF_LOOP_COMPRESSION_SIZE:
+        body = await run_in_threadpool(compress, bytes(response.body), encoding)
+    else:
+        body = compress(bytes(response.body), encoding)
+
+    response.body = body
+    response.headers["content-encoding"] = encoding
+    response.headers["content-length"] = str(len(body))
+    response.headers.add_vary_header("Accept-Encoding")
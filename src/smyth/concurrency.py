@@ -0,0 +1,93 @@
+import logging
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import NoReturn
+
+from smyth.exceptions import ConcurrencyLimitExceededError
+
+LOGGER = logging.getLogger(__name__)
+
+
+class ConcurrencyLimiter:
+    """Shared admission control for all handlers, simulating AWS Lambda's
+    account concurrency limit and per-function reserved concurrency.
+
+    A handler with reserved concurrency can always run up to its reservation
+    and never more. Handlers without a reservation share what is left of
+    `max_concurrency` once all reservations are subtracted. When no
+    `max_concurrency` is set, only reservations are enforced.
+    """
+
+    def __init__(self, max_concurrency: int | None = None) -> None:
+        if max_concurrency is not None and max_concurrency < 0:
+            raise ValueError("max_concurrency can't be negative")
+        self.max_concurrency = max_concurrency
+        self.reserved: dict[str, int] = {}
+        self.in_flight: dict[str, int] = {}
+        self.throttled: dict[str, int] = {}
+
+    @property
+    def unreserved_concurrency(self) -> int | None:
+        if self.max_concurrency is None:
+            return None
+        return self.max_concurrency - sum(self.reserved.values())
+
+    @property
+    def unreserved_in_flight(self) -> int:
+        return sum(
+            count
+            for handler_name, count in self.in_flight.items()
+            if handler_name not in self.reserved
+        )
+
+    def reserve(self, handler_name: str, reserved_concurrency: int | None) -> None:
+        """Replaces the handler's reservation, an invalid one leaves the
+        current reservation in place."""
+        if reserved_concurrency is None:
+            self.reserved.pop(handler_name, None)
+            return
+        if reserved_concurrency < 0:
+            raise ValueError(
+                f"Reserved concurrency of {handler_name} can't be negative"
+            )
+        if (unreserved_concurrency := self.unreserved_concurrency) is not None:
+            # The handler's current reservation is given back
+            unreserved_concurrency += self.reserved.get(handler_name, 0)
+            if reserved_concurrency > unreserved_concurrency:
+                raise ValueError(
+                    f"Reserved concurrency of {handler_name} "
+                    f"({reserved_concurrency}) exceeds the unreserved account "
+                    f"concurrency ({unreserved_concurrency})"
+                )
+        self.reserved[handler_name] = reserved_concurrency
+
+    def acquire(self, handler_name: str) -> None:
+        in_flight = self.in_flight.get(handler_name, 0)
+        if handler_name in self.reserved:
+            if in_flight >= self.reserved[handler_name]:
+                self._throttle(
+                    handler_name, "ReservedFunctionConcurrentInvocationLimitExceeded"
+                )
+        elif (
+            unreserved_concurrency := self.unreserved_concurrency
+        ) is not None and self.unreserved_in_flight >= unreserved_concurrency:
+            self._throttle(handler_name, "ConcurrentInvocationLimitExceeded")
+        self.in_flight[handler_name] = in_flight + 1
+
+    def release(self, handler_name: str) -> None:
+        self.in_flight[handler_name] = max(self.in_flight.get(handler_name, 0) - 1, 0)
+
+    @contextmanager
+    def admit(self, handler_name: str) -> Iterator[None]:
+        self.acquire(handler_name)
+        try:
+            yield
+        finally:
+            self.release(handler_name)
+
+    def _throttle(self, handler_name: str, reason: str) -> NoReturn:
+        self.throttled[handler_name] = self.throttled.get(handler_name, 0) + 1
+        LOGGER.warning("Throttling invocation of %s (%s)", handler_name, reason)
+        raise ConcurrencyLimitExceededError(
+            f"Rate Exceeded for handler {handler_name}", reason=reason
+        )
@@ -1,14 +1,42 @@
 import json
 import os
 from copy import deepcopy
-from dataclasses import asdict, dataclass, field
+from dataclasses import asdict, dataclass, field, replace
 from pathlib import Path
 from typing import Any
 
 import toml
 
 from smyth.exceptions import ConfigFileNotFoundError
-from smyth.types import Environ
+from smyth.types import DEFAULT_BINARY_MEDIA_TYPES, Environ
+
+
+@dataclass
+class SQSEventSourceConfig:
+    queue_name: str
+    batch_size: int = 10
+    maximum_batching_window: float = 0
+    visibility_timeout: float = 30
+    max_receive_count: int | None = None
+    dead_letter_queue_name: str | None = None
+    report_batch_item_failures: bool = True
+
+
+@dataclass
+class AsyncInvocationConfig:
+    maximum_retry_attempts: int = 2
+    maximum_event_age: float = 21600
+    retry_delay: float = 60
+    queue_size: int = 1000
+    on_failure: str | None = None
+
+
+@dataclass
+class ResponseCacheConfig:
+    ttl: float = 300
+    max_bytes: int = 16 * 1024 * 1024
+    key_query_parameters: list[str] = field(default_factory=list)
+    key_headers: list[str] = field(default_factory=list)
 
 
 @dataclass
@@ -20,9 +48,31 @@ class HandlerConfig:
     context_data_function_path: str = "smyth.context.generate_context_data"
     log_level: str = "DEBUG"
     concurrency: int = 1
+    reserved_concurrency: int | None = None
     strategy_generator_path: str = "smyth.runner.strategy.first_warm"
+    binary_media_types: list[str] = field(
+        default_factory=lambda: list(DEFAULT_BINARY_MEDIA_TYPES)
+    )
+    minimum_compression_size: int | None = None
+    cache: ResponseCacheConfig | None = None
+    async_invocation: AsyncInvocationConfig = field(
+        default_factory=AsyncInvocationConfig
+    )
+    sqs: SQSEventSourceConfig | None = None
+    schedule: str | None = None
+    schedule_overlap: str = "skip"
+    transport: str = "queue"
+    bootstrap: list[str] | None = None
     env: Environ = field(default_factory=dict)
 
+    def __post_init__(self) -> None:
+        if isinstance(self.sqs, dict):
+            self.sqs = SQSEventSourceConfig(**self.sqs)
+        if isinstance(self.cache, dict):
+            self.cache = ResponseCacheConfig(**self.cache)
+        if isinstance(self.async_invocation, dict):
+            self.async_invocation = AsyncInvocationConfig(**self.async_invocation)
+
     def get_env_overrides(self, config: "Config") -> Environ:
         env = deepcopy(config.env)
         env.update(self.env)
@@ -36,6 +86,17 @@ class Config:
     handlers: dict[str, HandlerConfig] = field(default_factory=dict)
     log_level: str = "INFO"
     smyth_path_prefix: str = "/smyth"
+    max_concurrency: int | None = None
+    sqs_database_path: str = ":memory:"
+    runner_codec: str = "pickle"
+    runner_codec_compression_threshold: int | None = None
+    runner_start_method: str = "spawn"
+    preload_modules: list[str] = field(default_factory=list)
+    hot_reload: bool = False
+    hot_reload_interval: float = 1.0
+    capture_path: str | None = None
+    startup_timeout: float = 30.0
+    shutdown_timeout: float = 10.0
     env: Environ = field(default_factory=dict)
 
     @classmethod
@@ -48,6 +109,50 @@ class Config:
         return cls(**config_dict, handlers=handlers)
 
 
+@dataclass
+class HandlerChanges:
+    """How the handlers of two configs differ."""
+
+    added: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    # Need new runners
+    changed: list[str] = field(default_factory=list)
+    # Only the concurrency changed, the runners are added or removed in place
+    resized: list[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed or self.resized)
+
+
+def diff_handlers(old_config: Config, new_config: Config) -> HandlerChanges:
+    """Compares the handlers of the configs, including the environment they
+    get from the global `env`."""
+    changes = HandlerChanges()
+    for handler_name, old_handler in old_config.handlers.items():
+        if handler_name not in new_config.handlers:
+            changes.removed.append(handler_name)
+            continue
+        old_handler = replace(
+            old_handler, env=old_handler.get_env_overrides(old_config)
+        )
+        new_handler = new_config.handlers[handler_name]
+        new_handler = replace(
+            new_handler, env=new_handler.get_env_overrides(new_config)
+        )
+        if old_handler == new_handler:
+            continue
+        if replace(old_handler, concurrency=new_handler.concurrency) == new_handler:
+            changes.resized.append(handler_name)
+        else:
+            changes.changed.append(handler_name)
+    changes.added = [
+        handler_name
+        for handler_name in new_config.handlers
+        if handler_name not in old_config.handlers
+    ]
+    return changes
+
+
 def get_config_file_path(file_name: str = "pyproject.toml") -> Path:
     """Get config file path. If not found raise exception."""
     directory = Path.cwd()
@@ -76,5 +181,10 @@ def get_config(config_dict: dict[str, Any]) -> Config:
     return Config.from_dict(config_dict["tool"]["smyth"])
 
 
+def read_config(config_file_name: str | None = None) -> Config:
+    """Reads the config from the file, not the one Smyth was started with."""
+    return Config.from_dict(get_config_dict(config_file_name)["tool"]["smyth"])
+
+
 def serialize_config(config: Config) -> str:
     return json.dumps(asdict(config))
@@ -1,19 +1,66 @@
+from collections.abc import Callable
 from dataclasses import asdict
-from typing import Any
-
-from starlette.requests import Request
+from time import time
+from typing import TYPE_CHECKING, Any
+from uuid import uuid4
 
+from smyth.runner.fake_context import DEFAULT_TIMEOUT
 from smyth.types import ContextData, RunnerProcessProtocol, SmythHandler
 
+if TYPE_CHECKING:
+    # Runner processes merge the context data, they don't need starlette
+    from starlette.requests import Request
+
+
+def get_callable_path(function: Callable[..., Any]) -> str:
+    module = getattr(function, "__module__", None)
+    name = getattr(function, "__qualname__", None) or repr(function)
+    return f"{module}.{name}" if module else name
+
+
+def get_handler_config(smyth_handler: SmythHandler) -> dict[str, Any]:
+    """The handler's configuration, with the functions replaced by their import
+    paths - they're only meaningful in the main process and not every function
+    can be sent to a runner."""
+    return {
+        key: get_callable_path(value) if callable(value) else value
+        for key, value in asdict(smyth_handler).items()
+    }
+
+
+def generate_static_context_data(smyth_handler: SmythHandler) -> ContextData:
+    """
+    The part of the context that is the same for every invocation of the
+    handler. It's computed once, when the runners start, and kept by them, so
+    it isn't serialized and sent with every invocation.
+    """
+    context: dict[str, Any] = {
+        "smyth": {
+            "handler": {
+                "name": smyth_handler.name,
+                "smyth_handler_config": get_handler_config(smyth_handler),
+            },
+        }
+    }
+    if smyth_handler.timeout is not None:
+        context["timeout"] = smyth_handler.timeout
+    return context
+
 
 async def generate_context_data(
-    request: Request | None, smyth_handler: SmythHandler, process: RunnerProcessProtocol
+    request: "Request | None",
+    smyth_handler: SmythHandler,
+    process: RunnerProcessProtocol,
 ) -> ContextData:
     """
-    The data returned by this function is passed to the
-    `smyth.runner.FaneContext` as kwargs.
+    The data returned by this function is merged into the static context data
+    (see `generate_static_context_data`) and passed to the
+    `smyth.runner.FakeLambdaContext` as kwargs.
     """
-    context: dict[str, Any] = {
+    timeout = smyth_handler.timeout or DEFAULT_TIMEOUT
+    return {
+        "aws_request_id": str(uuid4()),
+        "deadline_ms": int((time() + timeout) * 1000),
         "smyth": {
             "process": {
                 "name": process.name,
@@ -21,12 +68,19 @@ async def generate_context_data(
                 "task_counter": process.task_counter,
                 "last_used_timestamp": process.last_used_timestamp,
             },
-            "handler": {
-                "name": smyth_handler.name,
-                "smyth_handler_config": asdict(smyth_handler),
-            },
-        }
+        },
     }
-    if smyth_handler.timeout is not None:
-        context["timeout"] = smyth_handler.timeout
+
+
+def merge_context_data(
+    static_context: ContextData, invocation_context: ContextData
+) -> ContextData:
+    """Merges the invocation's context data into the static context data,
+    nested dictionaries are merged too."""
+    context = dict(static_context)
+    for key, value in invocation_context.items():
+        if isinstance(value, dict) and isinstance(context.get(key), dict):
+            context[key] = merge_context_data(context[key], value)
+        else:
+            context[key] = value
     return context
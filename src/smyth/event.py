@@ -1,9 +1,45 @@
+import json
+from binascii import b2a_base64
+from fnmatch import fnmatch
 from typing import Any
 
 from starlette.requests import Request
 
+from smyth.payload import SYNC_PAYLOAD_LIMIT, read_body
 from smyth.types import EventData, RunnerProcessProtocol, SmythHandler
 
+ACCOUNT_ID = "000000000000"
+
+
+def is_binary_media_type(
+    content_type: str | None, binary_media_types: list[str]
+) -> bool:
+    if not content_type:
+        return False
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return any(
+        fnmatch(media_type, binary_media_type)
+        for binary_media_type in binary_media_types
+    )
+
+
+def encode_body(
+    body: bytes, content_type: str | None, binary_media_types: list[str]
+) -> tuple[str, bool]:
+    """
+    Returns the body as it would be passed by API Gateway and whether it's
+    base64 encoded. Bodies of binary media types and bodies that are not
+    valid UTF-8 are base64 encoded.
+    """
+    if not body:
+        return "", False
+    if not is_binary_media_type(content_type, binary_media_types):
+        try:
+            return body.decode("utf-8"), False
+        except UnicodeDecodeError:
+            pass
+    return b2a_base64(body, newline=False).decode("ascii"), True
+
 
 async def generate_api_gw_v2_event_data(
     request: Request, smyth_handler: SmythHandler, process: RunnerProcessProtocol
@@ -11,11 +47,17 @@ async def generate_api_gw_v2_event_data(
     source_ip = None
     if request.client:
         source_ip = request.client.host
-    return {
+    route_key = smyth_handler.route_key or f"{request.method} {request.url.path}"
+    body, is_base64_encoded = encode_body(
+        await read_body(request, SYNC_PAYLOAD_LIMIT),
+        request.headers.get("content-type"),
+        smyth_handler.binary_media_types,
+    )
+    event_data: EventData = {
         "version": "2.0",
         "rawPath": request.url.path,
-        "body": (await request.body()).decode("utf-8"),
-        "isBase64Encoded": False,
+        "body": body,
+        "isBase64Encoded": is_base64_encoded,
         "headers": dict(request.headers),
         "queryStringParameters": dict(request.query_params),
         "requestContext": {
@@ -25,16 +67,19 @@ async def generate_api_gw_v2_event_data(
                 "protocol": request.url.scheme,
                 "sourceIp": source_ip,
             },
-            "routeKey": f"{request.method} {request.url.path}",
+            "routeKey": route_key,
             "accountId": "offlineContext_accountId",
             "stage": "$default",
         },
-        "routeKey": f"{request.method} {request.url.path}",
+        "routeKey": route_key,
         "rawQueryString": request.url.query,
     }
+    if request.path_params:
+        event_data["pathParameters"] = dict(request.path_params)
+    return event_data
 
 
 async def generate_lambda_invocation_event_data(
     request: Request, smyth_handler: SmythHandler, process: RunnerProcessProtocol
 ) -> Any:
-    return await request.json()
+    return json.loads(await read_body(request, SYNC_PAYLOAD_LIMIT))
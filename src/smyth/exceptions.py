@@ -22,6 +22,20 @@ class DestroyedOnLoadError(DispatcherError):
     pass
 
 
+class ConcurrencyLimitExceededError(DispatcherError):
+    """Invocation throttled, AWS' `TooManyRequestsException`."""
+
+    def __init__(
+        self, message: str, reason: str = "ConcurrentInvocationLimitExceeded"
+    ) -> None:
+        super().__init__(message)
+        self.reason = reason
+
+
+class QueueFullError(DispatcherError):
+    """The asynchronous invocation queue is full."""
+
+
 class SubprocessError(SmythRuntimeError):
     """Generic subprocess exception."""
 
@@ -36,3 +50,15 @@ class LambdaTimeoutError(SubprocessError):
 
 class LambdaInvocationError(SubprocessError):
     """Error invoking a Lambda."""
+
+
+class ConfigReloadError(SmythRuntimeError):
+    """The configuration can't be reloaded."""
+
+
+class PayloadTooLargeError(DispatcherError):
+    """The request is over Lambda's invocation payload limit."""
+
+    def __init__(self, message: str, limit: int) -> None:
+        super().__init__(message)
+        self.limit = limit
@@ -0,0 +1,258 @@
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from time import monotonic
+from typing import Any
+from uuid import uuid4
+
+from starlette.concurrency import run_in_threadpool
+
+from smyth.event import ACCOUNT_ID
+from smyth.exceptions import (
+    ConcurrencyLimitExceededError,
+    NoAvailableProcessError,
+    QueueFullError,
+    SmythRuntimeError,
+)
+from smyth.smyth import Smyth
+from smyth.sqs import LocalQueue
+from smyth.types import EventData
+
+LOGGER = logging.getLogger(__name__)
+
+# How long to wait before retrying a throttled invocation, throttles don't
+# count as attempts
+THROTTLE_RETRY_DELAY = 1.0
+
+
+@dataclass
+class AsyncInvocation:
+    request_id: str
+    event: EventData
+    received_at: float = field(default_factory=monotonic)
+    attempts: int = 0
+
+
+@dataclass
+class AsyncInvocationMetrics:
+    received: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    retried: int = 0
+    throttled: int = 0
+    expired: int = 0
+    rejected: int = 0
+
+
+class AsyncInvocationQueue:
+    """Lambda's internal queue for asynchronous (`Event`) invocations.
+
+    Invocations are queued and processed in the background by as many workers
+    as the handler has runners. Failed invocations are retried up to
+    `maximum_retry_attempts` times, waiting `retry_delay` seconds before the
+    first retry and twice as long before each next one. Invocations that fail
+    after all the retries, or that are older than `maximum_event_age`, are sent
+    to the `on_failure` destination - `sqs:<queue name>` for a local queue or
+    a path to a JSON Lines file.
+    """
+
+    def __init__(
+        self,
+        smyth: Smyth,
+        handler_name: str,
+        maximum_retry_attempts: int = 2,
+        maximum_event_age: float = 21600,
+        retry_delay: float = 60,
+        queue_size: int = 1000,
+        on_failure: str | None = None,
+        sqs_queue: LocalQueue | None = None,
+    ):
+        if not 0 <= maximum_retry_attempts <= 2:
+            raise ValueError("maximum_retry_attempts must be between 0 and 2")
+        if on_failure and on_failure.startswith("sqs:") and sqs_queue is None:
+            raise ValueError("A local queue is needed for an SQS destination")
+        self.smyth = smyth
+        self.handler_name = handler_name
+        self.maximum_retry_attempts = maximum_retry_attempts
+        self.maximum_event_age = maximum_event_age
+        self.retry_delay = retry_delay
+        self.on_failure = on_failure
+        self.sqs_queue = sqs_queue
+        self.metrics = AsyncInvocationMetrics()
+        self.queue: asyncio.Queue[AsyncInvocation] = asyncio.Queue(maxsize=queue_size)
+        self._workers: list[asyncio.Task[None]] = []
+        self._retry_tasks: set[asyncio.Task[None]] = set()
+
+    @property
+    def name(self) -> str:
+        return f"async:{self.handler_name}"
+
+    @property
+    def function_arn(self) -> str:
+        handler = self.smyth.get_handler_for_name(self.handler_name)
+        region = handler.get_environ()["AWS_REGION"]
+        return f"arn:aws:lambda:{region}:{ACCOUNT_ID}:function:{self.handler_name}"
+
+    def start(self) -> None:
+        LOGGER.info("Starting event source %s", self.name)
+        concurrency = self.smyth.get_handler_for_name(self.handler_name).concurrency
+        self._workers = [
+            asyncio.create_task(self.work(), name=f"{self.name}:{index}")
+            for index in range(concurrency)
+        ]
+
+    async def stop(self) -> None:
+        LOGGER.info("Stopping event source %s", self.name)
+        if not self.queue.empty() or self._retry_tasks:
+            LOGGER.warning(
+                "Dropping %s queued invocations of %s",
+                self.queue.qsize() + len(self._retry_tasks),
+                self.handler_name,
+            )
+        tasks = [*self._workers, *self._retry_tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+
+    def get_status(self) -> dict[str, Any]:
+        return {
+            "handler": self.handler_name,
+            "queued": self.queue.qsize(),
+            "waiting_for_retry": len(self._retry_tasks),
+            "received": self.metrics.received,
+            "succeeded": self.metrics.succeeded,
+            "failed": self.metrics.failed,
+            "retried": self.metrics.retried,
+            "throttled": self.metrics.throttled,
+            "expired": self.metrics.expired,
+            "rejected": self.metrics.rejected,
+        }
+
+    def enqueue(self, event: EventData) -> str:
+        """Queues an invocation, returns its request id. Raises
+        `QueueFullError` when the queue is full."""
+        invocation = AsyncInvocation(request_id=str(uuid4()), event=event)
+        try:
+            self.queue.put_nowait(invocation)
+        except asyncio.QueueFull:
+            self.metrics.rejected += 1
+            raise QueueFullError(
+                f"The asynchronous invocation queue of {self.handler_name} is full"
+            )
+        self.metrics.received += 1
+        return invocation.request_id
+
+    async def work(self) -> None:
+        while True:
+            invocation = await self.queue.get()
+            try:
+                await self.process(invocation)
+            except Exception as error:
+                LOGGER.exception("Error processing invocation: %s", error)
+            finally:
+                self.queue.task_done()
+
+    async def process(self, invocation: AsyncInvocation) -> None:
+        if monotonic() - invocation.received_at > self.maximum_event_age:
+            self.metrics.expired += 1
+            await self.fail(invocation, "EventAgeExceeded")
+            return
+
+        handler = self.smyth.get_handler_for_name(self.handler_name)
+        try:
+            await self.smyth.invoke(handler, invocation.event)
+        except (ConcurrencyLimitExceededError, NoAvailableProcessError):
+            # Throttled, or all the runners are busy, the invocation didn't run
+            self.metrics.throttled += 1
+            self.requeue(invocation, THROTTLE_RETRY_DELAY)
+            return
+        except SmythRuntimeError as error:
+            invocation.attempts += 1
+            LOGGER.warning(
+                "Asynchronous invocation %s of %s failed (attempt %s): %s",
+                invocation.request_id,
+                self.handler_name,
+                invocation.attempts,
+                error,
+            )
+            if invocation.attempts > self.maximum_retry_attempts:
+                await self.fail(invocation, "RetriesExhausted", error)
+            else:
+                self.metrics.retried += 1
+                self.requeue(
+                    invocation, self.retry_delay * 2 ** (invocation.attempts - 1)
+                )
+            return
+        self.metrics.succeeded += 1
+
+    def requeue(self, invocation: AsyncInvocation, delay: float) -> None:
+        async def retry() -> None:
+            await asyncio.sleep(delay)
+            await self.queue.put(invocation)
+
+        task = asyncio.create_task(retry())
+        self._retry_tasks.add(task)
+        task.add_done_callback(self._retry_tasks.discard)
+
+    async def fail(
+        self,
+        invocation: AsyncInvocation,
+        condition: str,
+        error: Exception | None = None,
+    ) -> None:
+        self.metrics.failed += 1
+        LOGGER.error(
+            "Asynchronous invocation %s of %s failed: %s",
+            invocation.request_id,
+            self.handler_name,
+            condition,
+        )
+        if self.on_failure is None:
+            return
+        record = self.get_invocation_record(invocation, condition, error)
+        if self.on_failure.startswith("sqs:"):
+            assert self.sqs_queue is not None
+            self.sqs_queue.send(
+                self.on_failure.removeprefix("sqs:"), json.dumps(record)
+            )
+        else:
+            await run_in_threadpool(self.write_record, record)
+
+    def write_record(self, record: dict[str, Any]) -> None:
+        assert self.on_failure is not None
+        with Path(self.on_failure).open("a") as destination:
+            destination.write(json.dumps(record) + "\n")
+
+    def get_invocation_record(
+        self,
+        invocation: AsyncInvocation,
+        condition: str,
+        error: Exception | None = None,
+    ) -> dict[str, Any]:
+        """The record Lambda sends to on-failure destinations."""
+        record: dict[str, Any] = {
+            "version": "1.0",
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "requestContext": {
+                "requestId": invocation.request_id,
+                "functionArn": f"{self.function_arn}:$LATEST",
+                "condition": condition,
+                "approximateInvokeCount": invocation.attempts,
+            },
+            "requestPayload": invocation.event,
+        }
+        if error is not None:
+            record["responseContext"] = {
+                "statusCode": 200,
+                "executedVersion": "$LATEST",
+                "functionError": "Unhandled",
+            }
+            record["responsePayload"] = {
+                "errorMessage": str(error),
+                "errorType": type(error).__name__,
+            }
+        return record
@@ -0,0 +1,88 @@
+import asyncio
+from collections.abc import AsyncIterator, Iterator
+from contextlib import contextmanager
+from time import time
+from typing import Any
+
+# How many events a subscriber can fall behind before events are dropped
+DEFAULT_BUFFER_SIZE = 1000
+
+MonitorEvent = dict[str, Any]
+
+
+class Subscription:
+    """The events for one subscriber, buffered until it reads them.
+
+    The buffer is bounded, when the subscriber falls behind new events are
+    dropped (and counted) instead of slowing down the runners publishing
+    them. Events can be published from any thread, they are handed over to
+    the subscriber's event loop.
+    """
+
+    def __init__(self, buffer_size: int = DEFAULT_BUFFER_SIZE) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue[MonitorEvent] = asyncio.Queue(buffer_size)
+        self.dropped = 0
+
+    def put(self, event: MonitorEvent) -> None:
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self.loop:
+            self.put_nowait(event)
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.put_nowait, event)
+        except RuntimeError:
+            # The subscriber's loop is closed
+            pass
+
+    def put_nowait(self, event: MonitorEvent) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def get(self) -> MonitorEvent:
+        """The next event, or the count of the events dropped since the last
+        one that was read."""
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            return {"type": "monitor.dropped", "timestamp": time(), "count": dropped}
+        return await self.queue.get()
+
+    def __aiter__(self) -> AsyncIterator[MonitorEvent]:
+        return self
+
+    async def __anext__(self) -> MonitorEvent:
+        return await self.get()
+
+
+class RunnerMonitor:
+    """Publishes what happens to the runners - state transitions, invocations,
+    spawns and deaths - to the subscribers, e.g. the event stream endpoint.
+
+    Publishing costs next to nothing when there are no subscribers.
+    """
+
+    def __init__(self) -> None:
+        self.subscriptions: set[Subscription] = set()
+
+    def publish(self, event_type: str, **data: Any) -> None:
+        if not self.subscriptions:
+            return
+        event = {"type": event_type, "timestamp": time(), **data}
+        for subscription in list(self.subscriptions):
+            subscription.put(event)
+
+    @contextmanager
+    def subscribe(
+        self, buffer_size: int = DEFAULT_BUFFER_SIZE
+    ) -> Iterator[Subscription]:
+        subscription = Subscription(buffer_size)
+        self.subscriptions.add(subscription)
+        try:
+            yield subscription
+        finally:
+            self.subscriptions.discard(subscription)
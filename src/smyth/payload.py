@@ -0,0 +1,58 @@
+from starlette.requests import Request
+from starlette.types import Message
+
+from smyth.exceptions import PayloadTooLargeError
+
+# Lambda's invocation payload limits
+SYNC_PAYLOAD_LIMIT = 6 * 1024 * 1024
+ASYNC_PAYLOAD_LIMIT = 256 * 1024
+# Where the body read by `read_body` is kept in the request's scope
+BODY_SCOPE_KEY = "smyth.body"
+
+
+def check_payload_size(size: int, limit: int) -> None:
+    if size > limit:
+        raise PayloadTooLargeError(
+            f"Request must be smaller than {limit} bytes for the Invoke operation",
+            limit=limit,
+        )
+
+
+async def read_body(request: Request, limit: int) -> bytes:
+    """
+    Reads the request body, raising `PayloadTooLargeError` as soon as it's
+    known to be over `limit` bytes - from the `Content-Length` header or while
+    the body is read - instead of buffering all of it first.
+
+    The body is kept in the request's scope, so it's read from the client
+    once, the next `read_body`s return it. `request.body()` can't read it
+    again, use the request returned by `replay_body` for that.
+    """
+    body: bytes | None = request.scope.get(BODY_SCOPE_KEY)
+    if body is None:
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit():
+            check_payload_size(int(content_length), limit)
+        buffer = bytearray()
+        async for chunk in request.stream():
+            buffer += chunk
+            check_payload_size(len(buffer), limit)
+        body = request.scope[BODY_SCOPE_KEY] = bytes(buffer)
+    check_payload_size(len(body), limit)
+    return body
+
+
+def replay_body(request: Request, body: bytes) -> Request:
+    """The request, with a body that can be read again - by the event data
+    functions calling `request.body()` - once `read_body` read it."""
+    replayed = False
+
+    async def receive() -> Message:
+        nonlocal replayed
+        if replayed:
+            # Only the client disconnecting is left
+            return await request.receive()
+        replayed = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    return Request(request.scope, receive)
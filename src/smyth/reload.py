@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Any
+
+from starlette.concurrency import run_in_threadpool
+
+from smyth.smyth import Smyth
+
+LOGGER = logging.getLogger(__name__)
+
+
+def get_modification_times(files: set[str]) -> dict[str, float | None]:
+    """The modification times of the files, `None` for the missing ones."""
+    times: dict[str, float | None] = {}
+    for file in files:
+        try:
+            times[file] = os.stat(file).st_mtime
+        except OSError:
+            times[file] = None
+    return times
+
+
+class HandlerReloader:
+    """Restarts the runners of the handlers whose code changed.
+
+    The runners report the source files of the modules they import, and these
+    files are checked for changes every `interval` seconds. When one changes,
+    only the runners of the handlers that imported it are restarted (see
+    `Smyth.restart_runners`), the runners of other handlers stay warm.
+    """
+
+    def __init__(self, smyth: Smyth, interval: float = 1.0):
+        self.smyth = smyth
+        self.interval = interval
+        self.modification_times: dict[str, float | None] = {}
+        self.reloads = 0
+        self.last_reload: datetime | None = None
+        self._task: asyncio.Task[None] | None = None
+        self._restarting: set[str] = set()
+        self._restart_tasks: set[asyncio.Task[None]] = set()
+
+    @property
+    def name(self) -> str:
+        return "reload"
+
+    def start(self) -> None:
+        LOGGER.info("Starting event source %s", self.name)
+        self._task = asyncio.create_task(self.run(), name=self.name)
+
+    async def stop(self) -> None:
+        LOGGER.info("Stopping event source %s", self.name)
+        tasks = [*self._restart_tasks]
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_status(self) -> dict[str, Any]:
+        return {
+            "watched_files": len(self.modification_times),
+            "reloads": self.reloads,
+            "last_reload": self.last_reload.isoformat() if self.last_reload else None,
+            "restarting": sorted(self._restarting),
+        }
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as error:
+                LOGGER.exception("Error checking for code changes: %s", error)
+
+    async def check(self) -> None:
+        handler_files = {
+            handler_name: self.smyth.get_module_files(handler_name)
+            for handler_name in self.smyth.smyth_handlers
+        }
+        files = set().union(*handler_files.values())
+        modification_times = await run_in_threadpool(get_modification_times, files)
+        changed = {
+            file
+            for file, modified in modification_times.items()
+            if file in self.modification_times
+            and self.modification_times[file] != modified
+        }
+        self.modification_times = modification_times
+        if not changed:
+            return
+
+        LOGGER.info("Detected changes in %s", ", ".join(sorted(changed)))
+        for handler_name, files in handler_files.items():
+            if files & changed and handler_name not in self._restarting:
+                self.restart(handler_name)
+
+    def restart(self, handler_name: str) -> None:
+        self.reloads += 1
+        self.last_reload = datetime.now(timezone.utc)
+        self._restarting.add(handler_name)
+        task = asyncio.create_task(self.smyth.restart_runners(handler_name))
+        self._restart_tasks.add(task)
+
+        def done(task: asyncio.Task[None]) -> None:
+            self._restart_tasks.discard(task)
+            self._restarting.discard(handler_name)
+            if not task.cancelled() and (error := task.exception()) is not None:
+                LOGGER.error("Error restarting %s: %s", handler_name, error)
+
+        task.add_done_callback(done)
@@ -0,0 +1,199 @@
+import re
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from functools import lru_cache
+from heapq import merge
+from operator import itemgetter
+from re import Pattern
+
+from smyth.exceptions import ProcessDefinitionNotFoundError
+from smyth.types import SmythHandler
+
+REGEX_SPECIAL_CHARACTERS = frozenset(".^$*+?{}[]|()")
+REGEX_QUANTIFIERS = frozenset("*+?{")
+ROUTE_KEY_METHODS = frozenset(
+    ("ANY", "GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS")
+)
+GREEDY_PARAM_REGEX = re.compile(r"{([a-zA-Z_][a-zA-Z0-9_]*)\+}")
+STARLETTE_PARAM_REGEX = re.compile(
+    r"{([a-zA-Z_][a-zA-Z0-9_]*)(:[a-zA-Z_][a-zA-Z0-9_]*)?}"
+)
+
+
+@dataclass(frozen=True)
+class RouteMatch:
+    handler: SmythHandler
+    path_params: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def route_key(self) -> str | None:
+        return self.handler.route_key
+
+
+def parse_route_key(route_key: str) -> tuple[str | None, str, str]:
+    """Parses an API Gateway route key (`GET /items/{id}`, `ANY /{proxy+}`,
+    `$default`) or a plain Starlette path (`/items/{id:int}`).
+
+    Returns the HTTP method (`None` for any method), the Starlette path used
+    for matching and the API Gateway route key passed on in the event.
+    """
+    if route_key == "$default":
+        return None, "/{proxy:path}", route_key
+
+    method, _, path = route_key.strip().rpartition(" ")
+    method = method.strip().upper() or "ANY"
+    if method not in ROUTE_KEY_METHODS:
+        raise ValueError(f"Unsupported method {method} in route key {route_key}")
+
+    starlette_path = GREEDY_PARAM_REGEX.sub(r"{\1:path}", path)
+    api_gw_path = STARLETTE_PARAM_REGEX.sub(
+        lambda match: (
+            f"{{{match.group(1)}+}}"
+            if match.group(2) == ":path"
+            else f"{{{match.group(1)}}}"
+        ),
+        starlette_path,
+    )
+    return (
+        None if method == "ANY" else method,
+        starlette_path,
+        f"{method} {api_gw_path}",
+    )
+
+
+def get_static_prefix(url_path: Pattern[str]) -> str:
+    """Returns the literal part of the pattern every matching path starts with.
+
+    The prefix is cut at its last `/` so it can be looked up segment by
+    segment, unless the whole pattern is a literal path.
+    """
+    source = url_path.pattern.removeprefix("^")
+    if "|" in source:
+        return ""
+
+    prefix: list[str] = []
+    index = 0
+    while index < len(source):
+        character = source[index]
+        if character == "\\" and index + 1 < len(source):
+            if source[index + 1].isalnum():
+                # character classes like `\d` or `\w`
+                break
+            prefix.append(source[index + 1])
+            index += 2
+            continue
+        if character in REGEX_SPECIAL_CHARACTERS:
+            if character == "$" and index == len(source) - 1:
+                return "".join(prefix)
+            if character in REGEX_QUANTIFIERS and prefix:
+                prefix.pop()
+            break
+        prefix.append(character)
+        index += 1
+
+    static_prefix = "".join(prefix)
+    return static_prefix[: static_prefix.rfind("/") + 1]
+
+
+def get_route_priority(handler: SmythHandler) -> tuple[int, int]:
+    """Ranks a route the way API Gateway picks the most specific one - static
+    paths first, then paths with parameters, then greedy paths, and
+    `$default` last. Routes of the same kind with a longer static prefix come
+    first."""
+    pattern = handler.url_path.pattern
+    if handler.route_key == "$default":
+        kind = 3
+    elif ".*" in pattern:
+        # A `{proxy+}`, or Starlette `{path:path}`, parameter
+        kind = 2
+    elif "(?P<" in pattern:
+        kind = 1
+    else:
+        kind = 0
+    return kind, -len(get_static_prefix(handler.url_path))
+
+
+class Router:
+    """Resolves request paths to handlers without scanning all of them.
+
+    Handlers are indexed by the static prefix of their `url_path` pattern
+    (e.g. `/orders/` for `/orders/{order_id}`), so only the handlers whose
+    prefix is a segment-prefix of the requested path and whose method matches
+    the request are tried. Candidates are tried from the most specific route
+    (see `get_route_priority`), then in registration order. Resolved paths
+    are kept in a bounded LRU cache.
+    """
+
+    def __init__(self, cache_size: int = 1024) -> None:
+        self.cache_size = cache_size
+        self.handlers: dict[str, SmythHandler] = {}
+        self._index: dict[str, list[tuple[int, SmythHandler]]] | None = None
+        self._resolve_cached = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def add(self, handler: SmythHandler) -> None:
+        self.handlers[handler.name] = handler
+        self.invalidate()
+
+    def remove(self, handler_name: str) -> None:
+        self.handlers.pop(handler_name, None)
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        self._index = None
+        self._resolve_cached.cache_clear()
+
+    def compile(self) -> dict[str, list[tuple[int, SmythHandler]]]:
+        index: dict[str, list[tuple[int, SmythHandler]]] = {}
+        ranked = sorted(
+            enumerate(self.handlers.values()),
+            key=lambda item: (get_route_priority(item[1]), item[0]),
+        )
+        for position, (_, handler) in enumerate(ranked):
+            index.setdefault(get_static_prefix(handler.url_path), []).append(
+                (position, handler)
+            )
+        self._index = index
+        return index
+
+    def get_candidates(self, path: str) -> list[list[tuple[int, SmythHandler]]]:
+        index = self._index if self._index is not None else self.compile()
+        candidates = []
+        if "" in index:
+            candidates.append(index[""])
+        if path in index:
+            candidates.append(index[path])
+        slash = path.find("/")
+        while slash != -1:
+            prefix = path[: slash + 1]
+            if prefix != path and prefix in index:
+                candidates.append(index[prefix])
+            slash = path.find("/", slash + 1)
+        return candidates
+
+    def _resolve(self, path: str, method: str | None) -> RouteMatch | None:
+        candidates = self.get_candidates(path)
+        ordered_candidates: Iterator[tuple[int, SmythHandler]]
+        if len(candidates) > 1:
+            ordered_candidates = merge(*candidates, key=itemgetter(0))
+        else:
+            ordered_candidates = iter(candidates[0] if candidates else ())
+        for _, handler in ordered_candidates:
+            if method and handler.method and handler.method != method:
+                continue
+            if match := handler.url_path.match(path):
+                return RouteMatch(
+                    handler=handler,
+                    path_params={
+                        key: value
+                        for key, value in match.groupdict().items()
+                        if value is not None
+                    },
+                )
+        return None
+
+    def resolve(self, path: str, method: str | None = None) -> RouteMatch:
+        if (route_match := self._resolve_cached(path, method)) is None:
+            raise ProcessDefinitionNotFoundError(
+                f"No process definition found for {method or 'path'} {path}"
+            )
+        return route_match
@@ -0,0 +1,176 @@
+import json
+import pickle
+import zlib
+from abc import ABC, abstractmethod
+from base64 import b64decode, b64encode
+from typing import Any
+
+from pydantic import BaseModel, TypeAdapter
+
+from smyth.types import RunnerInputMessage, RunnerOutputMessage
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+# The first byte of an encoded message tells if the rest is compressed
+UNCOMPRESSED = b"\x00"
+COMPRESSED = b"\x01"
+COMPRESSION_LEVEL = 1
+# How bytes are tagged in JSON, which has no bytes type
+BYTES_KEY = "__smyth_bytes__"
+
+OUTPUT_MESSAGE_ADAPTER: TypeAdapter[RunnerOutputMessage] = TypeAdapter(
+    RunnerOutputMessage
+)
+
+
+class MessageCodec(ABC):
+    """Encodes the messages exchanged with the runner processes.
+
+    Messages are encoded to bytes before they are put in the queues, so the
+    queues only ever pickle bytes. Encoded messages of at least
+    `compression_threshold` bytes are compressed with zlib.
+    """
+
+    name = "base"
+
+    def __init__(self, compression_threshold: int | None = None) -> None:
+        self.compression_threshold = compression_threshold
+
+    @abstractmethod
+    def dumps(self, message: BaseModel) -> bytes: ...
+
+    @abstractmethod
+    def loads(self, data: bytes) -> Any: ...
+
+    def encode(self, message: BaseModel) -> bytes:
+        data = self.dumps(message)
+        if (
+            self.compression_threshold is not None
+            and len(data) >= self.compression_threshold
+        ):
+            return COMPRESSED + zlib.compress(data, COMPRESSION_LEVEL)
+        return UNCOMPRESSED + data
+
+    def decode_data(self, data: bytes) -> Any:
+        if data[:1] == COMPRESSED:
+            return self.loads(zlib.decompress(data[1:]))
+        return self.loads(data[1:])
+
+    def decode_input(self, data: bytes) -> RunnerInputMessage:
+        return RunnerInputMessage.model_validate(self.decode_data(data))
+
+    def decode_output(self, data: bytes) -> RunnerOutputMessage:
+        return OUTPUT_MESSAGE_ADAPTER.validate_python(self.decode_data(data))
+
+
+class PickleCodec(MessageCodec):
+    """Pickles the message models with protocol 5, they don't need to be
+    validated again when decoded."""
+
+    name = "pickle"
+
+    def dumps(self, message: BaseModel) -> bytes:
+        return pickle.dumps(message, protocol=5)
+
+    def loads(self, data: bytes) -> Any:
+        return pickle.loads(data)
+
+    def decode_input(self, data: bytes) -> RunnerInputMessage:
+        message: RunnerInputMessage = self.decode_data(data)
+        return message
+
+    def decode_output(self, data: bytes) -> RunnerOutputMessage:
+        message: RunnerOutputMessage = self.decode_data(data)
+        return message
+
+
+def encode_model(value: Any) -> Any:
+    """Messages are encoded from a shallow copy, copying the whole message
+    with `model_dump` costs more than encoding it. Nested models are encoded
+    when they are reached."""
+    if isinstance(value, BaseModel):
+        return dict(value)
+    raise TypeError(f"Type is not serializable: {type(value).__name__}")
+
+
+def encode_json_default(value: Any) -> Any:
+    if isinstance(value, bytes | bytearray | memoryview):
+        return {BYTES_KEY: b64encode(value).decode()}
+    return encode_model(value)
+
+
+def decode_json_bytes(value: Any) -> Any:
+    """Restores the bytes tagged by `encode_json_default`."""
+    if isinstance(value, dict):
+        if len(value) == 1 and BYTES_KEY in value:
+            return b64decode(value[BYTES_KEY])
+        return {key: decode_json_bytes(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode_json_bytes(item) for item in value]
+    return value
+
+
+class JSONCodec(MessageCodec):
+    """Encodes messages as JSON, with orjson when it's installed. Bytes are
+    sent base64 encoded."""
+
+    name = "json"
+
+    def dumps(self, message: BaseModel) -> bytes:
+        data = dict(message)
+        if orjson is not None:
+            encoded: bytes = orjson.dumps(data, default=encode_json_default)
+            return encoded
+        return json.dumps(data, default=encode_json_default).encode()
+
+    def loads(self, data: bytes) -> Any:
+        decoded = orjson.loads(data) if orjson is not None else json.loads(data)
+        # Most messages carry no bytes, skip walking them
+        if BYTES_KEY.encode() in data:
+            return decode_json_bytes(decoded)
+        return decoded
+
+
+class MsgpackCodec(MessageCodec):
+    """Encodes messages with MessagePack, which needs the `msgpack` package."""
+
+    name = "msgpack"
+
+    def __init__(self, compression_threshold: int | None = None) -> None:
+        if msgpack is None:
+            raise ValueError(
+                "The msgpack codec needs the msgpack package, install smyth[msgpack]"
+            )
+        super().__init__(compression_threshold)
+
+    def dumps(self, message: BaseModel) -> bytes:
+        encoded: bytes = msgpack.packb(
+            dict(message), default=encode_model, use_bin_type=True
+        )
+        return encoded
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False)
+
+
+CODECS: dict[str, type[MessageCodec]] = {
+    codec.name: codec for codec in (PickleCodec, JSONCodec, MsgpackCodec)
+}
+
+
+def get_codec(name: str, compression_threshold: int | None = None) -> MessageCodec:
+    try:
+        codec = CODECS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown runner codec {name}, choose one of {', '.join(CODECS)}"
+        )
+    return codec(compression_threshold=compression_threshold)
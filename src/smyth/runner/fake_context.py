@@ -6,6 +6,8 @@ from typing import Any
 
 from aws_lambda_powertools.utilities.typing import LambdaContext
 
+DEFAULT_TIMEOUT = 6
+
 
 class FakeLambdaContext(LambdaContext):
     def __init__(
@@ -13,6 +15,8 @@ class FakeLambdaContext(LambdaContext):
         name: str | None = None,
         version: str | None = None,
         timeout: int | None = None,
+        aws_request_id: str | None = None,
+        deadline_ms: int | None = None,
         **kwargs: Any,
     ):
         if name is None:
@@ -26,20 +30,22 @@ class FakeLambdaContext(LambdaContext):
         self._created = time()
 
         if timeout is None:
-            timeout = 6
+            timeout = DEFAULT_TIMEOUT
         self._timeout = timeout
 
+        if aws_request_id is None:
+            aws_request_id = "1234567890"
+        self._aws_request_id = aws_request_id
+
+        if deadline_ms is None:
+            deadline_ms = int(round((self._created + self._timeout) * 1000))
+        self._deadline_ms = deadline_ms
+
         for key, value in kwargs.items():
             setattr(self, key, value)
 
     def get_remaining_time_in_millis(self) -> int:  # type: ignore[override]
-        return int(
-            max(
-                (self._timeout * 1000)
-                - (int(round(time() * 1000)) - int(round(self._created * 1000))),
-                0,
-            )
-        )
+        return int(max(self._deadline_ms - int(round(time() * 1000)), 0))
 
     @property
     def function_name(self) -> str:
@@ -60,7 +66,7 @@ class FakeLambdaContext(LambdaContext):
 
     @property
     def aws_request_id(self) -> str:
-        return "1234567890"
+        return self._aws_request_id
 
     @property
     def log_group_name(self) -> str:
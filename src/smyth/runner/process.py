@@ -4,33 +4,45 @@ import logging.config
 import os
 import signal
 import sys
+import sysconfig
 import traceback
-from collections.abc import Generator
-from multiprocessing import Process, Queue, set_start_method
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Generator, Iterator
+from importlib.util import find_spec
+from multiprocessing import Queue, get_context, set_start_method
+from multiprocessing.context import ForkServerProcess, SpawnProcess
+from multiprocessing.process import BaseProcess
 from queue import Empty
-from time import time
+from time import monotonic, time
 from types import FrameType
+from typing import Any, cast
 
-from asgiref.sync import sync_to_async
 from setproctitle import setproctitle
 
+from smyth.context import merge_context_data
 from smyth.exceptions import (
     LambdaHandlerLoadError,
     LambdaInvocationError,
     LambdaTimeoutError,
     SubprocessError,
 )
+from smyth.runner.codec import MessageCodec, PickleCodec
 from smyth.runner.fake_context import FakeLambdaContext
 from smyth.types import (
+    ContextData,
     EventData,
     LambdaErrorResponse,
     LambdaHandler,
-    LambdaResponse,
+    LambdaStreamingResponse,
     RunnerErrorMessage,
     RunnerInputMessage,
+    RunnerModulesMessage,
     RunnerOutputMessage,
     RunnerResponseMessage,
     RunnerStatusMessage,
+    RunnerStreamChunkMessage,
+    RunnerStreamEndMessage,
+    RunnerStreamStartMessage,
     SmythHandlerState,
 )
 from smyth.utils import get_logging_config, import_attribute
@@ -38,12 +50,177 @@ from smyth.utils import get_logging_config, import_attribute
 set_start_method("spawn", force=True)
 LOGGER = logging.getLogger(__name__)
 
+# How often a runner that isn't ready yet is checked for being alive
+READY_POLL_INTERVAL = 0.1
+
+
+def configure_start_method(
+    start_method: str, preload_modules: list[str] | None = None
+) -> None:
+    """
+    Checks the start method of the runner processes. With `forkserver` the
+    runners are forked from a server process that imported the runner and the
+    `preload_modules` once, so they don't import them again and share their
+    memory until they change it.
+
+    The forkserver is started with the first runner, the modules to preload
+    must be set before.
+    """
+    if start_method not in START_METHODS:
+        raise ValueError(
+            f"Unknown runner start method {start_method}, "
+            f"choose one of {', '.join(START_METHODS)}"
+        )
+    if start_method != "forkserver":
+        if preload_modules:
+            raise ValueError("Preloading modules needs the forkserver start method")
+        return
+    for module_name in preload_modules or []:
+        # Only the top level package is looked for, not to import it here
+        if find_spec(module_name.partition(".")[0]) is None:
+            LOGGER.warning("Can't preload %s, module not found", module_name)
+    get_context("forkserver").set_forkserver_preload(
+        [__name__, *(preload_modules or [])]
+    )
+
+
+class RunnerClient(ABC):
+    """The main process' side of a runner - sends it invocations and turns the
+    messages it sends back into responses. Subclasses deliver the messages."""
+
+    name: str
+    task_counter: int
+    last_used_timestamp: float
+    # Gets the runner's events (see `smyth.monitor`), set once the runner is
+    # started so it's never sent to the runner process
+    on_event: Callable[..., None] | None = None
+    _state: SmythHandlerState | None = None
+
+    @property
+    def state(self) -> SmythHandlerState:
+        assert self._state is not None
+        return self._state
+
+    @state.setter
+    def state(self, state: SmythHandlerState) -> None:
+        previous, self._state = self._state, state
+        if previous is not None and state != previous:
+            self.emit("runner.state", state=state.value, previous=previous.value)
+
+    def emit(self, event_type: str, **data: Any) -> None:
+        if self.on_event is not None:
+            self.on_event(event_type, runner=self.name, **data)
+
+    def wait_ready(self, timeout: float) -> bool:
+        """Waits, for at most `timeout` seconds, until the runner can take an
+        invocation right away, returns whether it can."""
+        return True
+
+    @abstractmethod
+    def put_input(self, data: RunnerInputMessage) -> None: ...
+
+    @abstractmethod
+    def receive(self) -> RunnerOutputMessage | None:
+        """Waits for the next message of the invocation in flight."""
+
+    def send(self, data: RunnerInputMessage) -> Any:
+        LOGGER.debug("Sending data to process %s: %s", self.name, data)
+        self.task_counter += 1
+        self.last_used_timestamp = time()
+        self.state = SmythHandlerState.WORKING
+        self.put_input(data)
+        self.emit(
+            "invocation.start",
+            request_id=(data.context or {}).get("aws_request_id"),
+            cold_start=self.task_counter == 1,
+        )
+
+        outcome = "error"
+        try:
+            message = self.receive()
+            if message is None:
+                outcome = "none"
+                return None
+            if message.type == "smyth.lambda.stream.start":
+                outcome = "stream"
+                return LambdaStreamingResponse(
+                    chunks=self.stream_chunks(),
+                    status_code=message.status_code,
+                    headers=message.headers,
+                )
+            self.state = SmythHandlerState.WARM
+            if message.type == "smyth.lambda.response":
+                outcome = "response"
+                return message.response
+            if message.type == "smyth.lambda.error":
+                self.raise_error(message)
+            raise SubprocessError(f"Unexpected message type {message.type}")
+        finally:
+            # Streamed invocations end when the stream does
+            if outcome != "stream":
+                self.emit_invocation_end(outcome)
+
+    def emit_invocation_end(self, outcome: str) -> None:
+        self.emit(
+            "invocation.end",
+            outcome=outcome,
+            duration_ms=round((time() - self.last_used_timestamp) * 1000, 3),
+        )
+
+    def stream_chunks(self) -> Generator[bytes, None, None]:
+        """Yields the chunks of a streamed response. The output queue holds one
+        message at a time, so the handler is only ever one chunk ahead of the
+        client."""
+        finished = False
+        outcome = "error"
+        try:
+            while True:
+                message = self.receive()
+                if message is None or message.type != "smyth.lambda.stream.chunk":
+                    break
+                yield message.chunk
+            finished = True
+            if message is not None and message.type == "smyth.lambda.stream.end":
+                outcome = "stream"
+        finally:
+            if not finished:
+                # The client went away, let the handler finish so the next
+                # invocation doesn't get the rest of this stream
+                self.drain_stream()
+                outcome = "stream.closed"
+            self.state = SmythHandlerState.WARM
+            self.emit_invocation_end(outcome)
+        if message is not None and message.type == "smyth.lambda.error":
+            self.raise_error(message)
+
+    def drain_stream(self) -> None:
+        while True:
+            message = self.receive()
+            if message is None or message.type != "smyth.lambda.stream.chunk":
+                return
+
+    @staticmethod
+    def raise_error(message: RunnerErrorMessage) -> None:
+        if message.error.type == "LambdaTimeoutError":
+            raise LambdaTimeoutError(message.error.message)
+        raise LambdaInvocationError(message.error.message)
+
+    async def asend(self, data: RunnerInputMessage) -> Any:
+        # Imported here, runner processes unpickle this class and never send
+        from asgiref.sync import sync_to_async
+
+        return await sync_to_async(self.send, thread_sensitive=False)(data)
+
+
+class BaseRunnerProcess(RunnerClient, BaseProcess):
+    """A runner running the handler in a Python process, started the way
+    the process class it's mixed with starts its processes."""
 
-class RunnerProcess(Process):
     name: str
     task_counter: int
     last_used_timestamp: float
-    state: SmythHandlerState
+    # See `configure_start_method`
+    start_method: str
 
     def __init__(
         self,
@@ -51,12 +228,21 @@ class RunnerProcess(Process):
         lambda_handler_path: str,
         log_level: str = "INFO",
         environ_override: dict[str, str] | None = None,
+        static_context: ContextData | None = None,
+        codec: MessageCodec | None = None,
     ):
         self.name = name
         self.task_counter = 0
         self.last_used_timestamp = 0
         self.state = SmythHandlerState.COLD
         self.environ_override = environ_override
+        # Sent to the process once, when it's spawned, invocations only carry
+        # the context data that changes
+        self.static_context = static_context or {}
+        self.codec = codec or PickleCodec()
+        # The source files of the modules the process imported, reported with
+        # the invocations once new modules were imported
+        self.module_files: set[str] = set()
 
         self.environ: dict[str, str] = {
             "_HANDLER": lambda_handler_path,
@@ -65,8 +251,10 @@ class RunnerProcess(Process):
         if environ_override:
             self.environ.update(environ_override)
 
-        self.input_queue: Queue[RunnerInputMessage] = Queue(maxsize=1)
-        self.output_queue: Queue[RunnerOutputMessage] = Queue(maxsize=1)
+        context = get_context(self.start_method)
+        # Messages are encoded with the codec, the queues only carry bytes
+        self.input_queue: Queue[bytes] = context.Queue(maxsize=1)
+        self.output_queue: Queue[bytes] = context.Queue(maxsize=1)
 
         self.lambda_handler_path = lambda_handler_path
         self.log_level = log_level
@@ -75,19 +263,38 @@ class RunnerProcess(Process):
         )
 
     def stop(self) -> None:
-        self.input_queue.put(RunnerInputMessage(type="smyth.stop"))
+        self.input_queue.put(self.codec.encode(RunnerInputMessage(type="smyth.stop")))
         self.join()
         self.input_queue.close()
         self.output_queue.close()
         self.input_queue.join_thread()
         self.output_queue.join_thread()
 
-    def send(self, data: RunnerInputMessage) -> LambdaResponse | None:
-        LOGGER.debug("Sending data to process %s: %s", self.name, data)
-        self.task_counter += 1
-        self.last_used_timestamp = time()
-        self.input_queue.put(data)
+    def wait_ready(self, timeout: float) -> bool:
+        """The process reports its status once it waits for invocations, until
+        then it's importing Smyth."""
+        deadline = monotonic() + timeout
+        while self.is_alive():
+            remaining = max(deadline - monotonic(), 0)
+            try:
+                message = self.codec.decode_output(
+                    self.output_queue.get(
+                        block=True, timeout=min(remaining, READY_POLL_INTERVAL)
+                    )
+                )
+            except Empty:
+                if not remaining:
+                    return False
+                continue
+            if message.type == "smyth.lambda.status":
+                return True
+        return False
+
+    def put_input(self, data: RunnerInputMessage) -> None:
+        self.input_queue.put(self.codec.encode(data))
 
+    def receive(self) -> RunnerOutputMessage | None:
+        """Waits for the next message of the invocation in flight."""
         while True:
             if not self.is_alive():
                 LOGGER.error(
@@ -96,9 +303,12 @@ class RunnerProcess(Process):
                     "This often happens when the handler can't be loaded "
                     "(i.e. an exception is raised when importing the handler)."
                 )
+                self.emit("runner.death", exitcode=self.exitcode)
                 raise SubprocessError("Process is not alive")
             try:
-                message = self.output_queue.get(block=True, timeout=1)
+                message = self.codec.decode_output(
+                    self.output_queue.get(block=True, timeout=1)
+                )
             except Empty:
                 continue
             except Exception as error:
@@ -107,34 +317,35 @@ class RunnerProcess(Process):
 
             LOGGER.debug("Received message from process %s: %s", self.name, message)
 
-            if message.type == "smyth.lambda.status":
-                self.state = message.status
-            elif message.type == "smyth.lambda.response":
-                self.state = SmythHandlerState.WARM
-                return message.response
-            elif message.type == "smyth.lambda.error":
-                self.state = SmythHandlerState.WARM
-                if message.error.type == "LambdaTimeoutError":
-                    raise LambdaTimeoutError(message.error.message)
-                else:
-                    raise LambdaInvocationError(message.error.message)
-
-    @sync_to_async(thread_sensitive=False)
-    def asend(self, data: RunnerInputMessage) -> LambdaResponse | None:
-        return self.send(data)
+            if message.type == "smyth.lambda.modules":
+                self.module_files = set(message.files)
+                continue
+            # The process is working until it responds, the states it reports
+            # while the invocation is in flight (like the cold start) are stale
+            # by the time they are received
+            if message.type != "smyth.lambda.status":
+                return message
 
     # Backend
 
     def run(self) -> None:
         setproctitle(f"smyth:{self.name}")
-        logging.config.dictConfig(get_logging_config(self.log_level))
+        # Processes logging their cold starts import rich anyway, better before
+        # they are ready than in the first invocation
+        logging.config.dictConfig(
+            get_logging_config(
+                self.log_level, deferred=self.log_level not in ("DEBUG", "INFO")
+            )
+        )
         os.environ.update(self.environ)
         self.lambda_invoker__()
 
     def get_message__(self) -> Generator[RunnerInputMessage, None, None]:
         while True:
             try:
-                message = self.input_queue.get(block=True, timeout=1)
+                message = self.codec.decode_input(
+                    self.input_queue.get(block=True, timeout=1)
+                )
             except KeyboardInterrupt:
                 LOGGER.debug("Stopping process")
                 return
@@ -155,7 +366,9 @@ class RunnerProcess(Process):
     def get_context__(self, message: RunnerInputMessage) -> FakeLambdaContext:
         if message.context is None:
             raise LambdaInvocationError("No context data provided")
-        return FakeLambdaContext(**message.context)
+        return FakeLambdaContext(
+            **merge_context_data(self.static_context, message.context)
+        )
 
     def import_handler__(
         self, lambda_handler_path: str, event: EventData, context: FakeLambdaContext
@@ -182,11 +395,76 @@ class RunnerProcess(Process):
             )
         return handler
 
+    def put_output__(self, message: RunnerOutputMessage) -> None:
+        self.output_queue.put(self.codec.encode(message))
+
     def set_status__(self, status: SmythHandlerState) -> None:
-        self.output_queue.put(
+        self.put_output__(
             RunnerStatusMessage(type="smyth.lambda.status", status=status)
         )
 
+    @staticmethod
+    def get_module_files__() -> list[str]:
+        """The source files of the imported modules, except the standard
+        library and installed packages."""
+        excluded = tuple(
+            {
+                sysconfig.get_path(name)
+                for name in ("stdlib", "platstdlib", "purelib", "platlib")
+            }
+        )
+        files = set()
+        for module in list(sys.modules.values()):
+            path = getattr(module, "__file__", None)
+            if path and not path.startswith(excluded):
+                files.add(path)
+        return sorted(files)
+
+    def report_modules__(self) -> None:
+        self.put_output__(
+            RunnerModulesMessage(
+                type="smyth.lambda.modules", files=self.get_module_files__()
+            )
+        )
+
+    @staticmethod
+    def get_stream__(
+        response: Any,
+    ) -> tuple[int, dict[str, str], Iterator[str | bytes]] | None:
+        """Returns the status code, headers and chunks of a streamed response -
+        a generator, or a response dict with a generator `body` - or `None` when
+        the response isn't streamed."""
+        if inspect.isgenerator(response):
+            return 200, {}, cast(Iterator[str | bytes], response)
+        if isinstance(response, dict) and inspect.isgenerator(response.get("body")):
+            return (
+                response.get("statusCode", 200),
+                response.get("headers", {}),
+                response["body"],
+            )
+        return None
+
+    def stream_response__(
+        self, status_code: int, headers: dict[str, str], chunks: Iterator[str | bytes]
+    ) -> None:
+        self.put_output__(
+            RunnerStreamStartMessage(
+                type="smyth.lambda.stream.start",
+                status_code=status_code,
+                headers=headers,
+            )
+        )
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            if chunk:
+                self.put_output__(
+                    RunnerStreamChunkMessage(
+                        type="smyth.lambda.stream.chunk", chunk=chunk
+                    )
+                )
+        self.put_output__(RunnerStreamEndMessage(type="smyth.lambda.stream.end"))
+
     @staticmethod
     def timeout_handler__(signum: int, frame: FrameType | None) -> None:
         raise LambdaTimeoutError("Lambda timeout")
@@ -194,6 +472,7 @@ class RunnerProcess(Process):
     def lambda_invoker__(self) -> None:
         sys.stdin = open("/dev/stdin")
         lambda_handler: LambdaHandler | None = None
+        module_count = 0
         self.set_status__(SmythHandlerState.COLD)
 
         for message in self.get_message__():
@@ -212,18 +491,28 @@ class RunnerProcess(Process):
                 )
                 self.set_status__(SmythHandlerState.WARM)
 
+            # Reported before invoking, so a failing handler can be reloaded,
+            # modules imported by the invocations are reported by the next one
+            if len(sys.modules) != module_count:
+                module_count = len(sys.modules)
+                self.report_modules__()
+
             signal.signal(signal.SIGALRM, self.timeout_handler__)
             signal.alarm(int(context._timeout))
             self.set_status__(SmythHandlerState.WORKING)
             try:
                 response = lambda_handler(event, context)
+                if (stream := self.get_stream__(response)) is not None:
+                    # The timeout covers producing all the chunks
+                    self.stream_response__(*stream)
+                    continue
             except Exception as error:
                 LOGGER.exception(
                     "Error invoking lambda: %s",
                     error,
                     extra={"log_setting": "console_full_width"},
                 )
-                self.output_queue.put(
+                self.put_output__(
                     RunnerErrorMessage(
                         type="smyth.lambda.error",
                         error=LambdaErrorResponse(
@@ -234,11 +523,46 @@ class RunnerProcess(Process):
                     )
                 )
             else:
-                self.output_queue.put(
-                    RunnerResponseMessage(
-                        type="smyth.lambda.response",
-                        response=response,
-                    )
-                )
+                self.put_response__(response)
             finally:
                 signal.alarm(0)
+
+    def put_response__(self, response: Any) -> None:
+        """Sends the handler's response, or an error when the codec can't
+        encode it, like Lambda does with a response that isn't JSON."""
+        try:
+            output = self.codec.encode(
+                RunnerResponseMessage(type="smyth.lambda.response", response=response)
+            )
+        except Exception as error:
+            LOGGER.error("Unable to marshal the lambda response: %s", error)
+            self.put_output__(
+                RunnerErrorMessage(
+                    type="smyth.lambda.error",
+                    error=LambdaErrorResponse(
+                        type="Runtime.MarshalError",
+                        message=f"Unable to marshal response: {error}",
+                        stacktrace=traceback.format_exc(),
+                    ),
+                )
+            )
+        else:
+            self.output_queue.put(output)
+
+
+class RunnerProcess(SpawnProcess, BaseRunnerProcess):
+    start_method = "spawn"
+
+
+class ForkServerRunnerProcess(ForkServerProcess, BaseRunnerProcess):
+    """A runner forked from the forkserver, see `configure_start_method`."""
+
+    start_method = "forkserver"
+
+
+# How the runner processes can be started, see `configure_start_method`
+RUNNER_PROCESS_CLASSES: dict[str, type[BaseRunnerProcess]] = {
+    "spawn": RunnerProcess,
+    "forkserver": ForkServerRunnerProcess,
+}
+START_METHODS = tuple(RUNNER_PROCESS_CLASSES)
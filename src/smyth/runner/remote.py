@@ -0,0 +1,116 @@
+import logging
+import socket
+import struct
+from asyncio import IncompleteReadError, StreamReader, StreamWriter
+
+from smyth.exceptions import SubprocessError
+from smyth.runner.codec import MessageCodec, PickleCodec
+from smyth.runner.process import RunnerClient
+from smyth.types import RunnerInputMessage, RunnerOutputMessage, SmythHandlerState
+
+LOGGER = logging.getLogger(__name__)
+
+# Where the HTTP workers find the runner pool's socket
+RUNNER_POOL_ENVIRON = "__SMYTH_RUNNER_POOL"
+# Every frame is prefixed with its length
+FRAME_HEADER = struct.Struct("!I")
+
+
+def write_frame(connection: socket.socket, data: bytes) -> None:
+    connection.sendall(FRAME_HEADER.pack(len(data)) + data)
+
+
+def read_exactly(connection: socket.socket, size: int) -> bytes | None:
+    data = bytearray()
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            return None
+        data.extend(chunk)
+    return bytes(data)
+
+
+def read_frame(connection: socket.socket) -> bytes | None:
+    """Reads the next frame, `None` when the connection was closed."""
+    if (header := read_exactly(connection, FRAME_HEADER.size)) is None:
+        return None
+    (size,) = FRAME_HEADER.unpack(header)
+    return read_exactly(connection, size)
+
+
+async def aread_frame(reader: StreamReader) -> bytes | None:
+    try:
+        (size,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+        return await reader.readexactly(size)
+    except IncompleteReadError:
+        return None
+
+
+async def awrite_frame(writer: StreamWriter, data: bytes) -> None:
+    writer.write(FRAME_HEADER.pack(len(data)) + data)
+    await writer.drain()
+
+
+class RemoteRunnerProcess(RunnerClient):
+    """A runner of the runner pool shared by the HTTP workers (see
+    `smyth.supervisor`). Invocations are sent to the pool over a Unix socket
+    and run by whichever of the handler's runners is available there."""
+
+    def __init__(
+        self,
+        name: str,
+        handler_name: str,
+        socket_path: str,
+        codec: MessageCodec | None = None,
+    ):
+        self.name = name
+        self.handler_name = handler_name
+        self.socket_path = socket_path
+        self.codec = codec or PickleCodec()
+        self.task_counter = 0
+        self.last_used_timestamp = 0
+        self.state = SmythHandlerState.COLD
+        self.connection: socket.socket | None = None
+
+    def start(self) -> None:
+        self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.connection.connect(self.socket_path)
+        write_frame(self.connection, self.handler_name.encode())
+
+    def stop(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def is_alive(self) -> bool:
+        return self.connection is not None
+
+    def terminate(self) -> None:
+        self.stop()
+
+    def join(self) -> None:
+        pass
+
+    def put_input(self, data: RunnerInputMessage) -> None:
+        if self.connection is None:
+            raise SubprocessError("Not connected to the runner pool")
+        try:
+            write_frame(self.connection, self.codec.encode(data))
+        except OSError as error:
+            self.stop()
+            raise SubprocessError(f"Lost the runner pool connection: {error}")
+
+    def receive(self) -> RunnerOutputMessage | None:
+        if self.connection is None:
+            raise SubprocessError("Not connected to the runner pool")
+        try:
+            frame = read_frame(self.connection)
+        except OSError as error:
+            self.stop()
+            raise SubprocessError(f"Lost the runner pool connection: {error}")
+        if frame is None:
+            self.stop()
+            raise SubprocessError("The runner pool closed the connection")
+        message = self.codec.decode_output(frame)
+        LOGGER.debug("Received message from the pool for %s: %s", self.name, message)
+        return message
@@ -0,0 +1,411 @@
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from queue import Empty, Full, Queue
+from threading import Event, Lock, Thread
+from time import monotonic, time
+from typing import Any
+from uuid import uuid4
+
+from smyth.context import merge_context_data
+from smyth.exceptions import SubprocessError
+from smyth.runner.fake_context import DEFAULT_TIMEOUT
+from smyth.runner.process import READY_POLL_INTERVAL, RunnerClient
+from smyth.types import (
+    ContextData,
+    EventData,
+    LambdaErrorResponse,
+    RunnerErrorMessage,
+    RunnerInputMessage,
+    RunnerOutputMessage,
+    RunnerResponseMessage,
+    SmythHandlerState,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+RUNTIME_API_VERSION = "2018-06-01"
+INVOCATION_PATH = re.compile(
+    rf"^/{RUNTIME_API_VERSION}/runtime/invocation/(?P<request_id>[^/]+)"
+    r"/(?P<action>response|error)$"
+)
+NEXT_INVOCATION_PATH = f"/{RUNTIME_API_VERSION}/runtime/invocation/next"
+INIT_ERROR_PATH = f"/{RUNTIME_API_VERSION}/runtime/init/error"
+# How long the runtime gets to respond past the invocation's deadline before
+# it's killed
+TIMEOUT_GRACE = 1.0
+# How long a stopped runtime gets to exit before it's killed
+STOP_TIMEOUT = 5.0
+
+Invocation = tuple[str, int, str, EventData]
+
+
+def get_default_command(lambda_handler_path: str) -> list[str]:
+    """Runs the handler with the AWS Lambda Python runtime interface client."""
+    return [sys.executable, "-m", "awslambdaric", lambda_handler_path]
+
+
+def get_trace_id() -> str:
+    return f"Root=1-{int(time()):08x}-{uuid4().hex[:24]}"
+
+
+def read_chunked(request: BaseHTTPRequestHandler) -> bytes:
+    body = bytearray()
+    while size := int(request.rfile.readline().split(b";")[0], 16):
+        body.extend(request.rfile.read(size))
+        request.rfile.readline()
+    # The trailer, if any, ends with an empty line
+    while request.rfile.readline() not in (b"\r\n", b"\n", b""):
+        pass
+    return bytes(body)
+
+
+def get_error_response(body: bytes, error_type: str | None) -> LambdaErrorResponse:
+    """The error a runtime reports, `{"errorMessage", "errorType",
+    "stackTrace"}` by convention, anything else is passed on as the message."""
+    try:
+        error = json.loads(body)
+    except ValueError:
+        error = None
+    if not isinstance(error, dict):
+        return LambdaErrorResponse(
+            type=error_type or "Unhandled",
+            message=body.decode(errors="replace"),
+            stacktrace="",
+        )
+    stacktrace = error.get("stackTrace") or ""
+    if isinstance(stacktrace, list):
+        stacktrace = "".join(str(line) for line in stacktrace)
+    return LambdaErrorResponse(
+        type=str(error.get("errorType") or error_type or "Unhandled"),
+        message=str(error.get("errorMessage", "")),
+        stacktrace=str(stacktrace),
+    )
+
+
+class RuntimeAPIRequestHandler(BaseHTTPRequestHandler):
+    """Serves the Lambda Runtime API endpoints to one runtime."""
+
+    server: "RuntimeAPIServer"
+    protocol_version = "HTTP/1.1"
+    # The headers and the body are written separately, with Nagle's algorithm
+    # the body waits for the runtime to acknowledge the headers
+    disable_nagle_algorithm = True
+
+    def do_GET(self) -> None:
+        if self.path != NEXT_INVOCATION_PATH:
+            self.send_json(HTTPStatus.NOT_FOUND, {"errorType": "NotFound"})
+            return
+        invocation = self.server.runner.next_invocation()
+        if invocation is None:
+            # The runner is stopping, the runtime is about to be terminated
+            self.close_connection = True
+            return
+        request_id, deadline_ms, function_arn, event = invocation
+        self.send_json(
+            HTTPStatus.OK,
+            event,
+            {
+                "Lambda-Runtime-Aws-Request-Id": request_id,
+                "Lambda-Runtime-Deadline-Ms": str(deadline_ms),
+                "Lambda-Runtime-Invoked-Function-Arn": function_arn,
+                "Lambda-Runtime-Trace-Id": get_trace_id(),
+            },
+        )
+
+    def do_POST(self) -> None:
+        body = self.read_body()
+        error_type = self.headers.get("Lambda-Runtime-Function-Error-Type")
+        if self.path == INIT_ERROR_PATH:
+            self.server.runner.init_error(get_error_response(body, error_type))
+            self.send_json(HTTPStatus.ACCEPTED, {"status": "OK"})
+            return
+        if (match := INVOCATION_PATH.match(self.path)) is None:
+            self.send_json(HTTPStatus.NOT_FOUND, {"errorType": "NotFound"})
+            return
+        if match["action"] == "response":
+            accepted = self.server.runner.invocation_response(match["request_id"], body)
+        else:
+            accepted = self.server.runner.invocation_error(
+                match["request_id"], get_error_response(body, error_type)
+            )
+        if not accepted:
+            self.send_json(
+                HTTPStatus.BAD_REQUEST,
+                {
+                    "errorMessage": f"Invalid request ID: {match['request_id']}",
+                    "errorType": "InvalidRequestID",
+                },
+            )
+            return
+        self.send_json(HTTPStatus.ACCEPTED, {"status": "OK"})
+
+    def read_body(self) -> bytes:
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            return read_chunked(self)
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def send_json(
+        self,
+        status: HTTPStatus,
+        data: Any,
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        LOGGER.debug("%s: %s", self.server.runner.name, format % args)
+
+
+class RuntimeAPIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, runner: "RuntimeAPIRunnerProcess") -> None:
+        self.runner = runner
+        super().__init__(("127.0.0.1", 0), RuntimeAPIRequestHandler)
+
+    @property
+    def address(self) -> str:
+        host, port = self.server_address[:2]
+        return f"{host!s}:{port}"
+
+
+class RuntimeAPIRunnerProcess(RunnerClient):
+    """A runner driven over the Lambda Runtime API instead of Smyth's queues.
+
+    The runtime - the AWS runtime interface client by default, or any
+    `bootstrap` executable of a custom runtime - is started with
+    `AWS_LAMBDA_RUNTIME_API` pointing at a Runtime API server of its own,
+    polls it for the next invocation and posts back the response or error.
+    Like in Lambda, the runtime is killed when an invocation runs past its
+    deadline, and started again by the next invocation.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        lambda_handler_path: str,
+        command: list[str] | None = None,
+        environ_override: dict[str, str] | None = None,
+        static_context: ContextData | None = None,
+    ):
+        self.name = name
+        self.task_counter = 0
+        self.last_used_timestamp = 0
+        self.state = SmythHandlerState.COLD
+        self.lambda_handler_path = lambda_handler_path
+        self.command = command or get_default_command(lambda_handler_path)
+        self.static_context = static_context or {}
+        self.environ: dict[str, str] = {
+            "_HANDLER": lambda_handler_path,
+            "LAMBDA_TASK_ROOT": os.getcwd(),
+            **(environ_override or {}),
+        }
+        self.server: RuntimeAPIServer | None = None
+        self.runtime: subprocess.Popen[bytes] | None = None
+        # The invocation waiting for the runtime to poll, and its outcome
+        self.invocations: Queue[Invocation | None] = Queue(maxsize=1)
+        self.outputs: Queue[RunnerOutputMessage] = Queue()
+        self.request_id: str | None = None
+        self.deadline = 0.0
+        # Set once the runtime polls for its first invocation
+        self.ready = Event()
+        # Counts the runtimes started, a poll of a runtime that was replaced
+        # must not take the next runtime's invocation
+        self.generation = 0
+        self._lock = Lock()
+
+    def start(self) -> None:
+        self.server = RuntimeAPIServer(self)
+        Thread(
+            target=self.server.serve_forever,
+            name=f"smyth:{self.name}:runtime-api",
+            daemon=True,
+        ).start()
+        self.spawn()
+
+    def spawn(self) -> None:
+        assert self.server is not None
+        LOGGER.debug("Starting the runtime of %s: %s", self.name, self.command)
+        self.ready.clear()
+        self.generation += 1
+        self.runtime = subprocess.Popen(
+            self.command,
+            env={
+                **os.environ,
+                **self.environ,
+                "AWS_LAMBDA_RUNTIME_API": self.server.address,
+            },
+        )
+
+    def stop(self) -> None:
+        self.abandon_invocation()
+        self.stop_runtime()
+        # Releases the server's thread waiting for the next invocation
+        self.release_pollers()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def stop_runtime(self, timeout: float = STOP_TIMEOUT) -> None:
+        if self.runtime is None:
+            return
+        if self.runtime.poll() is None:
+            self.runtime.terminate()
+            try:
+                self.runtime.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.runtime.kill()
+                self.runtime.wait()
+
+    def wait_ready(self, timeout: float) -> bool:
+        """The runtime is ready once it initialized - imported the handler,
+        unlike the queue runners - and polls for the first invocation."""
+        deadline = monotonic() + timeout
+        while not self.ready.wait(
+            min(max(deadline - monotonic(), 0), READY_POLL_INTERVAL)
+        ):
+            if not self.is_alive() or monotonic() >= deadline:
+                return False
+        return True
+
+    def is_alive(self) -> bool:
+        return self.runtime is not None and self.runtime.poll() is None
+
+    def terminate(self) -> None:
+        self.stop()
+
+    def join(self) -> None:
+        if self.runtime is not None:
+            self.runtime.wait()
+
+    # Runtime API
+
+    def next_invocation(self) -> Invocation | None:
+        generation = self.generation
+        self.ready.set()
+        invocation = self.invocations.get()
+        if invocation is None:
+            # For the other pollers, if any
+            self.release_pollers()
+            return None
+        if generation != self.generation:
+            # The runtime polling exited while it waited, the invocation is
+            # for the runtime started since
+            self.invocations.put(invocation)
+            return None
+        return invocation
+
+    def release_pollers(self) -> None:
+        try:
+            self.invocations.put_nowait(None)
+        except Full:
+            pass
+
+    def invocation_response(self, request_id: str, body: bytes) -> bool:
+        try:
+            response: Any = json.loads(body)
+        except ValueError:
+            response = body.decode(errors="replace")
+        return self.finish(
+            request_id,
+            RunnerResponseMessage(type="smyth.lambda.response", response=response),
+        )
+
+    def invocation_error(self, request_id: str, error: LambdaErrorResponse) -> bool:
+        return self.finish(
+            request_id, RunnerErrorMessage(type="smyth.lambda.error", error=error)
+        )
+
+    def init_error(self, error: LambdaErrorResponse) -> None:
+        """The runtime failed to initialize and is about to exit, the
+        invocation in flight fails with its error."""
+        LOGGER.error("The runtime of %s failed to start: %s", self.name, error.message)
+        with self._lock:
+            if self.request_id is None:
+                return
+            self.request_id = None
+        self.outputs.put(RunnerErrorMessage(type="smyth.lambda.error", error=error))
+
+    def finish(self, request_id: str, message: RunnerOutputMessage) -> bool:
+        with self._lock:
+            if request_id != self.request_id:
+                return False
+            self.request_id = None
+        self.outputs.put(message)
+        return True
+
+    # Smyth
+
+    def put_input(self, data: RunnerInputMessage) -> None:
+        if self.server is None:
+            raise SubprocessError("The runner is not started")
+        if not self.is_alive():
+            # Like Lambda, a failed runtime is started again by the next
+            # invocation
+            self.spawn()
+        context = merge_context_data(self.static_context, data.context or {})
+        request_id = str(context.get("aws_request_id") or uuid4())
+        timeout = float(context.get("timeout") or DEFAULT_TIMEOUT)
+        deadline_ms = int(context.get("deadline_ms") or (time() + timeout) * 1000)
+        function_name = self.environ.get("AWS_LAMBDA_FUNCTION_NAME", self.name)
+        with self._lock:
+            self.request_id = request_id
+            self.deadline = deadline_ms / 1000 + TIMEOUT_GRACE
+        self.invocations.put(
+            (
+                request_id,
+                deadline_ms,
+                f"arn:aws:lambda:serverless:{function_name}",
+                data.event if data.event is not None else {},
+            )
+        )
+
+    def receive(self) -> RunnerOutputMessage | None:
+        """Waits for the runtime to respond to the invocation in flight."""
+        while True:
+            try:
+                return self.outputs.get(
+                    timeout=min(1.0, max(self.deadline - time(), 0))
+                )
+            except Empty:
+                pass
+            if not self.is_alive():
+                assert self.runtime is not None
+                self.emit("runner.death", exitcode=self.runtime.returncode)
+                self.abandon_invocation()
+                raise SubprocessError("Runtime is not alive")
+            if time() >= self.deadline:
+                LOGGER.error("%s timed out, restarting its runtime", self.name)
+                self.abandon_invocation()
+                self.stop_runtime(timeout=0)
+                return RunnerErrorMessage(
+                    type="smyth.lambda.error",
+                    error=LambdaErrorResponse(
+                        type="LambdaTimeoutError",
+                        message="Lambda timeout",
+                        stacktrace="",
+                    ),
+                )
+
+    def abandon_invocation(self) -> None:
+        with self._lock:
+            self.request_id = None
+        try:
+            # The runtime never polled for it
+            self.invocations.get_nowait()
+        except Empty:
+            pass
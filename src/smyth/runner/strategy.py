@@ -11,10 +11,17 @@ def round_robin(
     during development. It rotates among Lambda Processes for each request,
     given that concurrency is set higher than `1`. This approach encourages
     developers to avoid relying on global state across requests, promoting
-    best practices in serverless application design.
+    best practices in serverless application design. Working processes are
+    skipped.
     """
     while True:
-        yield from processes[handler_name]
+        available = False
+        for process in processes[handler_name]:
+            if process.state != SmythHandlerState.WORKING:
+                available = True
+                yield process
+        if not available:
+            raise NoAvailableProcessError("No process available")
 
 
 def first_warm(
@@ -0,0 +1,305 @@
+import asyncio
+import logging
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from time import monotonic
+from typing import Any, Protocol
+from uuid import uuid4
+
+from smyth.event import ACCOUNT_ID
+from smyth.exceptions import SmythRuntimeError
+from smyth.smyth import Smyth
+from smyth.types import EventData
+
+LOGGER = logging.getLogger(__name__)
+
+RATE_REGEX = re.compile(
+    r"^rate\(\s*(?P<value>\d+)\s+(?P<unit>second|minute|hour|day)s?\s*\)$"
+)
+CRON_REGEX = re.compile(r"^cron\((?P<fields>[^)]*)\)$")
+MONTH_NAMES = {
+    name: index
+    for index, name in enumerate(
+        "JAN FEB MAR APR MAY JUN JUL AUG SEP OCT NOV DEC".split(), start=1
+    )
+}
+DAY_OF_WEEK_NAMES = {
+    name: index
+    for index, name in enumerate("SUN MON TUE WED THU FRI SAT".split(), start=1)
+}
+# How far ahead to look for the next run of a cron expression
+CRON_SEARCH_YEARS = 5
+
+
+class Schedule(Protocol):
+    def next_after(self, moment: datetime) -> datetime: ...
+
+
+@dataclass
+class RateSchedule:
+    interval: timedelta
+
+    def next_after(self, moment: datetime) -> datetime:
+        return moment + self.interval
+
+
+def parse_cron_field(
+    field: str, minimum: int, maximum: int, names: dict[str, int] | None = None
+) -> frozenset[int] | None:
+    """Returns the values matching the field of a cron expression, `None` for
+    `?` (any value)."""
+    if field == "?":
+        return None
+    if any(character in field for character in "LW#"):
+        raise ValueError(f"Unsupported cron field {field}")
+
+    def parse_value(value: str) -> int:
+        if names and value.upper() in names:
+            return names[value.upper()]
+        number = int(value)
+        if not minimum <= number <= maximum:
+            raise ValueError(f"Cron value {value} out of range")
+        return number
+
+    values: set[int] = set()
+    for part in field.split(","):
+        value_range, _, step = part.partition("/")
+        if value_range == "*":
+            start, end = minimum, maximum
+        elif "-" in value_range:
+            start_value, end_value = value_range.split("-", 1)
+            start, end = parse_value(start_value), parse_value(end_value)
+        else:
+            start = parse_value(value_range)
+            end = maximum if step else start
+        values.update(range(start, end + 1, int(step) if step else 1))
+    return frozenset(values)
+
+
+@dataclass
+class CronSchedule:
+    """An EventBridge cron expression, evaluated in UTC:
+    `minutes hours day-of-month month day-of-week year`."""
+
+    minutes: frozenset[int]
+    hours: frozenset[int]
+    days_of_month: frozenset[int] | None
+    months: frozenset[int]
+    days_of_week: frozenset[int] | None
+    years: frozenset[int] | None
+
+    @classmethod
+    def from_fields(cls, fields: str) -> "CronSchedule":
+        parts = fields.split()
+        if len(parts) != 6:
+            raise ValueError(f"Cron expression must have 6 fields: {fields}")
+        minutes, hours, days_of_month, months, days_of_week, years = parts
+        if (days_of_month == "?") == (days_of_week == "?"):
+            raise ValueError("Exactly one of day-of-month and day-of-week must be '?'")
+        return cls(
+            minutes=parse_cron_field(minutes, 0, 59) or frozenset(range(60)),
+            hours=parse_cron_field(hours, 0, 23) or frozenset(range(24)),
+            days_of_month=parse_cron_field(days_of_month, 1, 31),
+            months=parse_cron_field(months, 1, 12, MONTH_NAMES)
+            or frozenset(range(1, 13)),
+            days_of_week=parse_cron_field(days_of_week, 1, 7, DAY_OF_WEEK_NAMES),
+            years=parse_cron_field(years, 1970, 2199),
+        )
+
+    def matches_day(self, moment: datetime) -> bool:
+        if self.days_of_month is not None:
+            return moment.day in self.days_of_month
+        # EventBridge counts days of the week from 1 (Sunday)
+        day_of_week = (moment.weekday() + 1) % 7 + 1
+        return self.days_of_week is None or day_of_week in self.days_of_week
+
+    def next_after(self, moment: datetime) -> datetime:
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        # Not `replace(year=...)`, there's no February 29 in most years
+        limit = moment + timedelta(days=366 * CRON_SEARCH_YEARS)
+        while candidate < limit:
+            if self.years is not None and candidate.year not in self.years:
+                candidate = candidate.replace(
+                    year=candidate.year + 1, month=1, day=1, hour=0, minute=0
+                )
+            elif candidate.month not in self.months:
+                candidate = (candidate.replace(day=1) + timedelta(days=32)).replace(
+                    day=1, hour=0, minute=0
+                )
+            elif not self.matches_day(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+            elif candidate.hour not in self.hours:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError("The cron expression never fires")
+
+
+def parse_schedule(expression: str) -> Schedule:
+    """Parses an EventBridge schedule expression - `rate(5 minutes)` or
+    `cron(0 12 * * ? *)`. Unlike EventBridge, rates can also be given in
+    seconds."""
+    expression = expression.strip()
+    if match := RATE_REGEX.match(expression):
+        value = int(match.group("value"))
+        if value < 1:
+            raise ValueError(f"Rate must be a positive number: {expression}")
+        return RateSchedule(timedelta(**{f"{match.group('unit')}s": value}))
+    if match := CRON_REGEX.match(expression):
+        return CronSchedule.from_fields(match.group("fields"))
+    raise ValueError(f"Invalid schedule expression: {expression}")
+
+
+@dataclass
+class ScheduleMetrics:
+    invocations: int = 0
+    failed: int = 0
+    skipped: int = 0
+    queued: int = 0
+    last_drift: float = 0
+    max_drift: float = 0
+    total_drift: float = 0
+    last_duration: float = 0
+    max_duration: float = 0
+    total_duration: float = 0
+
+
+class ScheduledEventSource:
+    """Invokes the handler with EventBridge Scheduled Events.
+
+    When a run is due while the previous one is still in progress, it's either
+    skipped (`overlap="skip"`) or started right after the previous one ends
+    (`overlap="queue"`). Drift is the delay between the scheduled time and the
+    actual start of the invocation.
+    """
+
+    def __init__(
+        self,
+        smyth: Smyth,
+        handler_name: str,
+        schedule_expression: str,
+        overlap: str = "skip",
+    ):
+        if overlap not in ("skip", "queue"):
+            raise ValueError(f"Invalid schedule overlap {overlap}")
+        self.smyth = smyth
+        self.handler_name = handler_name
+        self.schedule_expression = schedule_expression
+        self.schedule = parse_schedule(schedule_expression)
+        self.overlap = overlap
+        self.metrics = ScheduleMetrics()
+        self.next_run: datetime | None = None
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task[None] | None = None
+        self._run_tasks: set[asyncio.Task[None]] = set()
+
+    @property
+    def name(self) -> str:
+        return f"schedule:{self.handler_name}"
+
+    @property
+    def region(self) -> str:
+        handler = self.smyth.get_handler_for_name(self.handler_name)
+        return handler.get_environ()["AWS_REGION"]
+
+    def start(self) -> None:
+        LOGGER.info(
+            "Starting event source %s (%s)", self.name, self.schedule_expression
+        )
+        self._task = asyncio.create_task(self.run(), name=self.name)
+
+    async def stop(self) -> None:
+        LOGGER.info("Stopping event source %s", self.name)
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for task in self._run_tasks:
+            task.cancel()
+        await asyncio.gather(*self._run_tasks, return_exceptions=True)
+
+    def get_status(self) -> dict[str, Any]:
+        invocations = self.metrics.invocations or 1
+        return {
+            "handler": self.handler_name,
+            "schedule": self.schedule_expression,
+            "next_run": self.next_run.isoformat() if self.next_run else None,
+            "running": self._lock.locked(),
+            "invocations": self.metrics.invocations,
+            "failed": self.metrics.failed,
+            "skipped": self.metrics.skipped,
+            "queued": self.metrics.queued,
+            "drift": {
+                "last": self.metrics.last_drift,
+                "max": self.metrics.max_drift,
+                "mean": self.metrics.total_drift / invocations,
+            },
+            "duration": {
+                "last": self.metrics.last_duration,
+                "max": self.metrics.max_duration,
+                "mean": self.metrics.total_duration / invocations,
+            },
+        }
+
+    async def run(self) -> None:
+        self.next_run = self.schedule.next_after(datetime.now(timezone.utc))
+        while True:
+            delay = (self.next_run - datetime.now(timezone.utc)).total_seconds()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            scheduled_time = self.next_run
+            self.next_run = self.schedule.next_after(scheduled_time)
+            self.trigger(scheduled_time)
+
+    def trigger(self, scheduled_time: datetime) -> None:
+        if self._lock.locked():
+            if self.overlap == "skip":
+                LOGGER.warning(
+                    "Skipping %s run of %s, the previous one is still running",
+                    scheduled_time.isoformat(),
+                    self.handler_name,
+                )
+                self.metrics.skipped += 1
+                return
+            self.metrics.queued += 1
+        task = asyncio.create_task(self.invoke(scheduled_time))
+        self._run_tasks.add(task)
+        task.add_done_callback(self._run_tasks.discard)
+
+    async def invoke(self, scheduled_time: datetime) -> None:
+        async with self._lock:
+            handler = self.smyth.get_handler_for_name(self.handler_name)
+            drift = (datetime.now(timezone.utc) - scheduled_time).total_seconds()
+            self.metrics.invocations += 1
+            self.metrics.last_drift = drift
+            self.metrics.max_drift = max(self.metrics.max_drift, drift)
+            self.metrics.total_drift += drift
+            started = monotonic()
+            try:
+                await self.smyth.invoke(handler, self.get_event_data(scheduled_time))
+            except SmythRuntimeError as error:
+                LOGGER.error("Scheduled run of %s failed: %s", self.handler_name, error)
+                self.metrics.failed += 1
+            finally:
+                duration = monotonic() - started
+                self.metrics.last_duration = duration
+                self.metrics.max_duration = max(self.metrics.max_duration, duration)
+                self.metrics.total_duration += duration
+
+    def get_event_data(self, scheduled_time: datetime) -> EventData:
+        return {
+            "version": "0",
+            "id": str(uuid4()),
+            "detail-type": "Scheduled Event",
+            "source": "aws.events",
+            "account": ACCOUNT_ID,
+            "time": scheduled_time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "region": self.region,
+            "resources": [
+                f"arn:aws:events:{self.region}:{ACCOUNT_ID}:rule/{self.handler_name}"
+            ],
+            "detail": {},
+        }
@@ -1,18 +1,46 @@
+import asyncio
 import logging
-from collections.abc import AsyncGenerator
+import os
+import signal
+from collections.abc import AsyncGenerator, Iterable
 from contextlib import asynccontextmanager
+from dataclasses import asdict
 from multiprocessing import set_start_method
 from typing import Any
 
 from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
 
-from smyth.config import get_config, get_config_dict
+from smyth.cache import ResponseCache
+from smyth.capture import TrafficRecorder
+from smyth.concurrency import ConcurrencyLimiter
+from smyth.config import (
+    Config,
+    HandlerChanges,
+    HandlerConfig,
+    diff_handlers,
+    get_config,
+    get_config_dict,
+    read_config,
+)
+from smyth.exceptions import ConfigReloadError, SmythRuntimeError
+from smyth.invocation import AsyncInvocationQueue
+from smyth.reload import HandlerReloader
+from smyth.runner.codec import get_codec
+from smyth.runner.remote import RUNNER_POOL_ENVIRON
+from smyth.schedule import ScheduledEventSource
 from smyth.server.endpoints import (
+    batch_invocation_endpoint,
+    config_reload_endpoint,
+    events_endpoint,
     invocation_endpoint,
     lambda_invoker_endpoint,
+    sqs_endpoint,
     status_endpoint,
 )
 from smyth.smyth import Smyth
+from smyth.sqs import LocalQueue, SQSEventSource
+from smyth.types import EventSourceProtocol
 from smyth.utils import import_attribute
 
 LOGGER = logging.getLogger(__name__)
@@ -22,24 +50,85 @@ set_start_method("spawn", force=True)
 @asynccontextmanager
 async def lifespan(app: "SmythStarlette") -> AsyncGenerator[None, None]:
     try:
-        app.smyth.start_runners()
+        # Serves once the runners are ready, or `startup_timeout` passed
+        await run_in_threadpool(app.smyth.start_runners)
     except Exception as error:
         LOGGER.error("Error starting runners: %s", error)
         raise
+    for event_source in app.event_sources:
+        event_source.start()
+    reload_on_sighup = add_sighup_handler(app)
     yield
-    app.smyth.stop_runners()
+    if reload_on_sighup:
+        asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+    for event_source in app.event_sources:
+        await event_source.stop()
+    await run_in_threadpool(app.smyth.stop_runners)
+
+
+def add_sighup_handler(app: "SmythStarlette") -> bool:
+    """Reloads the config on SIGHUP, when the app runs in the main thread."""
+    try:
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGHUP, app.request_config_reload
+        )
+    except (NotImplementedError, RuntimeError, ValueError):
+        return False
+    return True
 
 
 class SmythStarlette(Starlette):
     smyth: Smyth
+    smyth_path_prefix: str
+    sqs_queue: LocalQueue
+    event_sources: list[EventSourceProtocol]
+    async_invocations: dict[str, AsyncInvocationQueue]
+    config: Config | None
 
-    def __init__(self, smyth: Smyth, smyth_path_prefix: str, *args: Any, **kwargs: Any):
+    def __init__(
+        self,
+        smyth: Smyth,
+        smyth_path_prefix: str,
+        *args: Any,
+        sqs_queue: LocalQueue | None = None,
+        event_sources: list[EventSourceProtocol] | None = None,
+        async_invocations: dict[str, AsyncInvocationQueue] | None = None,
+        config: Config | None = None,
+        **kwargs: Any,
+    ):
         self.smyth = smyth
+        # The config the handlers were added from, to reload them
+        self.config = config
+        self._reload_lock = asyncio.Lock()
+        self._reload_tasks: set[asyncio.Task[HandlerChanges]] = set()
+        self.smyth_path_prefix = smyth_path_prefix
+        self.sqs_queue = sqs_queue or LocalQueue()
+        self.async_invocations = async_invocations or {}
+        self.event_sources = [
+            *(event_sources or []),
+            *self.async_invocations.values(),
+        ]
         kwargs["lifespan"] = lifespan
         super().__init__(*args, **kwargs)
         self.add_route(
             f"{smyth_path_prefix}/api/status", status_endpoint, methods=["GET"]
         )
+        self.add_route(
+            f"{smyth_path_prefix}/api/events", events_endpoint, methods=["GET"]
+        )
+        self.add_route(
+            f"{smyth_path_prefix}/api/config/reload",
+            config_reload_endpoint,
+            methods=["POST"],
+        )
+        self.add_route(
+            f"{smyth_path_prefix}/sqs{{path:path}}", sqs_endpoint, methods=["POST"]
+        )
+        self.add_route(
+            f"{smyth_path_prefix}/api/functions/{{function:str}}/invocations",
+            batch_invocation_endpoint,
+            methods=["POST"],
+        )
         self.add_route(
             "/2015-03-31/functions/{function:str}/invocations",
             invocation_endpoint,
@@ -48,34 +137,262 @@ class SmythStarlette(Starlette):
         self.add_route(
             "/{path:path}",
             lambda_invoker_endpoint,
-            methods=["GET", "POST", "PUT", "DELETE"],
+            methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
         )
 
+    async def reload_config(self, config: Config | None = None) -> HandlerChanges:
+        """
+        Applies the handler changes of the config (read from the config file by
+        default) without restarting - new and changed handlers get new
+        runners, removed ones are retired once they finish the invocations in
+        flight, and the concurrency is adjusted in place. The other handlers
+        keep their warm runners. Settings other than the handlers' are not
+        reloaded. The new handlers are validated first, an invalid one leaves
+        the running handlers and the config as they were.
+        """
+        if self.config is None:
+            raise ConfigReloadError("The app wasn't created from a config")
+        if self.smyth.runner_pool_path is not None:
+            raise ConfigReloadError("The config can't be reloaded with HTTP workers")
+        async with self._reload_lock:
+            if config is None:
+                try:
+                    config = await run_in_threadpool(read_config)
+                except (
+                    SmythRuntimeError,
+                    OSError,
+                    KeyError,
+                    TypeError,
+                    ValueError,
+                ) as error:
+                    raise ConfigReloadError(f"Invalid config: {error}") from error
+            changes = diff_handlers(self.config, config)
+            replaced = [*changes.added, *changes.changed]
+            handler_arguments = self.validate_handlers(config, replaced)
+            LOGGER.info("Reloading the config: %s", changes)
+            await self.stop_event_sources({*changes.removed, *changes.changed})
+            await asyncio.gather(
+                *(self.smyth.remove_handler(name) for name in changes.removed)
+            )
 
-def create_app() -> SmythStarlette:
-    LOGGER.debug("Creating app")
-    config = get_config(get_config_dict())
+            # The reservations were validated together, they are only given
+            # back so that adding the handlers one by one doesn't exceed them
+            for handler_name in changes.changed:
+                self.smyth.concurrency_limiter.reserve(handler_name, None)
+            for handler_name in replaced:
+                self.smyth.add_handler(**handler_arguments[handler_name])
+            for handler_name in changes.resized:
+                self.smyth.smyth_handlers[handler_name].concurrency = config.handlers[
+                    handler_name
+                ].concurrency
+            await asyncio.gather(
+                *(self.smyth.restart_runners(name) for name in replaced),
+                *(self.smyth.resize_runners(name) for name in changes.resized),
+            )
+
+            async_invocations = create_async_invocations(
+                self.smyth, config, self.sqs_queue, replaced
+            )
+            self.async_invocations.update(async_invocations)
+            for event_source in [
+                *create_event_sources(self.smyth, config, self.sqs_queue, replaced),
+                *async_invocations.values(),
+            ]:
+                event_source.start()
+                self.event_sources.append(event_source)
+            self.config = config
+            return changes
+
+    def validate_handlers(
+        self, config: Config, handler_names: list[str]
+    ) -> dict[str, dict[str, Any]]:
+        """Resolves the arguments of the handlers and validates them, along
+        with the reservations of all the config's handlers, without adding
+        them. Raises `ConfigReloadError` when one is invalid."""
+        limiter = ConcurrencyLimiter(self.smyth.concurrency_limiter.max_concurrency)
+        handler_arguments = {}
+        try:
+            for handler_name, handler_config in config.handlers.items():
+                limiter.reserve(handler_name, handler_config.reserved_concurrency)
+            for handler_name in handler_names:
+                arguments = get_handler_arguments(
+                    handler_name, config.handlers[handler_name], config
+                )
+                self.smyth.create_handler(
+                    **{
+                        key: value
+                        for key, value in arguments.items()
+                        if key != "response_cache"
+                    }
+                )
+                handler_arguments[handler_name] = arguments
+        except (ImportError, AttributeError, TypeError, ValueError) as error:
+            raise ConfigReloadError(
+                f"Invalid handler {handler_name}: {error}"
+            ) from error
+        return handler_arguments
+
+    async def stop_event_sources(self, handler_names: set[str]) -> None:
+        for event_source in [
+            event_source
+            for event_source in self.event_sources
+            if getattr(event_source, "handler_name", None) in handler_names
+        ]:
+            await event_source.stop()
+            self.event_sources.remove(event_source)
+        for handler_name in handler_names:
+            self.async_invocations.pop(handler_name, None)
+
+    def request_config_reload(self) -> None:
+        """Reloads the config in the background, e.g. on SIGHUP."""
+        task = asyncio.create_task(self.reload_config())
+        self._reload_tasks.add(task)
+
+        def done(task: asyncio.Task[HandlerChanges]) -> None:
+            self._reload_tasks.discard(task)
+            if not task.cancelled() and (error := task.exception()) is not None:
+                LOGGER.error("Error reloading the config: %s", error)
 
-    smyth = Smyth()
+        task.add_done_callback(done)
+
+
+def add_handler(
+    smyth: Smyth, handler_name: str, handler_config: HandlerConfig, config: Config
+) -> None:
+    smyth.add_handler(**get_handler_arguments(handler_name, handler_config, config))
+
+
+def get_handler_arguments(
+    handler_name: str, handler_config: HandlerConfig, config: Config
+) -> dict[str, Any]:
+    """The arguments of `Smyth.add_handler`, with the functions imported."""
+    return dict(
+        name=handler_name,
+        path=handler_config.url_path,
+        lambda_handler_path=handler_config.handler_path,
+        timeout=handler_config.timeout,
+        event_data_function=import_attribute(handler_config.event_data_function_path),
+        context_data_function=import_attribute(
+            handler_config.context_data_function_path
+        ),
+        log_level=handler_config.log_level,
+        concurrency=handler_config.concurrency,
+        strategy_generator=import_attribute(handler_config.strategy_generator_path),
+        env_overrides=handler_config.get_env_overrides(config),
+        reserved_concurrency=handler_config.reserved_concurrency,
+        binary_media_types=handler_config.binary_media_types,
+        minimum_compression_size=handler_config.minimum_compression_size,
+        transport=handler_config.transport,
+        bootstrap=handler_config.bootstrap,
+        response_cache=(
+            ResponseCache(**asdict(handler_config.cache))
+            if handler_config.cache is not None
+            else None
+        ),
+    )
+
+
+def create_smyth(config: Config, runner_pool_path: str | None = None) -> Smyth:
+    """Creates Smyth with the configured handlers. With `runner_pool_path`
+    the handlers are invoked in the shared runner pool listening there,
+    instead of runners of its own."""
+    smyth = Smyth(
+        max_concurrency=config.max_concurrency,
+        codec=get_codec(config.runner_codec, config.runner_codec_compression_threshold),
+        runner_pool_path=runner_pool_path,
+        recorder=(
+            TrafficRecorder(config.capture_path) if config.capture_path else None
+        ),
+        startup_timeout=config.startup_timeout,
+        shutdown_timeout=config.shutdown_timeout,
+        start_method=config.runner_start_method,
+        preload_modules=config.preload_modules,
+    )
 
     for handler_name, handler_config in config.handlers.items():
-        smyth.add_handler(
-            name=handler_name,
-            path=handler_config.url_path,
-            lambda_handler_path=handler_config.handler_path,
-            timeout=handler_config.timeout,
-            event_data_function=import_attribute(
-                handler_config.event_data_function_path
-            ),
-            context_data_function=import_attribute(
-                handler_config.context_data_function_path
-            ),
-            log_level=handler_config.log_level,
-            concurrency=handler_config.concurrency,
-            strategy_generator=import_attribute(handler_config.strategy_generator_path),
-            env_overrides=handler_config.get_env_overrides(config),
+        add_handler(smyth, handler_name, handler_config, config)
+
+    return smyth
+
+
+def create_schedule_sources(smyth: Smyth, config: Config) -> list[ScheduledEventSource]:
+    return [
+        ScheduledEventSource(
+            smyth=smyth,
+            handler_name=handler_name,
+            schedule_expression=handler_config.schedule,
+            overlap=handler_config.schedule_overlap,
+        )
+        for handler_name, handler_config in config.handlers.items()
+        if handler_config.schedule is not None
+    ]
+
+
+def create_event_sources(
+    smyth: Smyth,
+    config: Config,
+    sqs_queue: LocalQueue,
+    handler_names: Iterable[str] | None = None,
+) -> list[EventSourceProtocol]:
+    """The SQS and schedule event sources of the handlers (by default all)."""
+    handler_names = set(config.handlers if handler_names is None else handler_names)
+    event_sources: list[EventSourceProtocol] = [
+        SQSEventSource(
+            smyth=smyth,
+            handler_name=handler_name,
+            queue=sqs_queue,
+            **asdict(handler_config.sqs),
         )
+        for handler_name, handler_config in config.handlers.items()
+        if handler_config.sqs is not None and handler_name in handler_names
+    ]
+    if smyth.runner_pool_path is None:
+        # The runner pool runs the schedules, once for all the workers
+        event_sources.extend(
+            schedule_source
+            for schedule_source in create_schedule_sources(smyth, config)
+            if schedule_source.handler_name in handler_names
+        )
+    return event_sources
+
+
+def create_async_invocations(
+    smyth: Smyth,
+    config: Config,
+    sqs_queue: LocalQueue,
+    handler_names: Iterable[str] | None = None,
+) -> dict[str, AsyncInvocationQueue]:
+    return {
+        handler_name: AsyncInvocationQueue(
+            smyth=smyth,
+            handler_name=handler_name,
+            sqs_queue=sqs_queue,
+            **asdict(config.handlers[handler_name].async_invocation),
+        )
+        for handler_name in (
+            config.handlers if handler_names is None else handler_names
+        )
+    }
+
+
+def create_app() -> SmythStarlette:
+    LOGGER.debug("Creating app")
+    config = get_config(get_config_dict())
+    smyth = create_smyth(config, os.environ.get(RUNNER_POOL_ENVIRON))
+
+    sqs_queue = LocalQueue(config.sqs_database_path)
+    event_sources = create_event_sources(smyth, config, sqs_queue)
+    if config.hot_reload and smyth.runner_pool_path is None:
+        # The runner pool runs the reloader, once for all the workers
+        event_sources.append(HandlerReloader(smyth, config.hot_reload_interval))
 
-    app = SmythStarlette(smyth=smyth, smyth_path_prefix=config.smyth_path_prefix)
+    app = SmythStarlette(
+        smyth=smyth,
+        smyth_path_prefix=config.smyth_path_prefix,
+        sqs_queue=sqs_queue,
+        event_sources=event_sources,
+        async_invocations=create_async_invocations(smyth, config, sqs_queue),
+        config=config,
+    )
 
     return app
@@ -1,17 +1,53 @@
+import asyncio
+import json
 import logging
+from collections.abc import AsyncIterator
+from dataclasses import asdict
 from typing import Any
 
 from starlette import status
 from starlette.requests import Request
-from starlette.responses import JSONResponse, Response
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
 
+from smyth.cache import requests_invalidation
+from smyth.compression import compress_response
 from smyth.event import generate_lambda_invocation_event_data
-from smyth.exceptions import LambdaInvocationError, LambdaTimeoutError, SubprocessError
+from smyth.exceptions import (
+    ConcurrencyLimitExceededError,
+    ConfigReloadError,
+    LambdaInvocationError,
+    LambdaTimeoutError,
+    NoAvailableProcessError,
+    PayloadTooLargeError,
+    ProcessDefinitionNotFoundError,
+    QueueFullError,
+    SubprocessError,
+)
+from smyth.invocation import AsyncInvocationQueue
+from smyth.monitor import DEFAULT_BUFFER_SIZE
+from smyth.payload import (
+    ASYNC_PAYLOAD_LIMIT,
+    SYNC_PAYLOAD_LIMIT,
+    read_body,
+    replay_body,
+)
 from smyth.smyth import Smyth
-from smyth.types import EventDataCallable, SmythHandler
+from smyth.sqs import LocalQueue
+from smyth.types import (
+    EventData,
+    EventDataCallable,
+    InvocationResult,
+    LambdaResponse,
+    LambdaStreamingResponse,
+    SmythHandler,
+)
 
 LOGGER = logging.getLogger(__name__)
 
+# How often an idle event stream sends a comment, so it isn't closed as dead
+EVENT_STREAM_KEEPALIVE = 15
+
 
 async def dispatch(
     smyth: Smyth,
@@ -24,9 +60,15 @@ async def dispatch(
     response to a Starlette response.
     """
     try:
-        result = await smyth.dispatch(
-            smyth_handler, request, event_data_function=event_data_function
+        result = await dispatch_cached(
+            smyth, smyth_handler, request, event_data_function=event_data_function
         )
+    except ConcurrencyLimitExceededError as error:
+        return too_many_requests_response(error.reason)
+    except NoAvailableProcessError:
+        return too_many_requests_response("ConcurrentInvocationLimitExceeded")
+    except PayloadTooLargeError:
+        return payload_too_large_response()
     except LambdaInvocationError as error:
         return Response(str(error), status_code=status.HTTP_502_BAD_GATEWAY)
     except LambdaTimeoutError:
@@ -39,17 +81,117 @@ async def dispatch(
             "No response", status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+    if isinstance(result, LambdaStreamingResponse):
+        return LambdaStreamingHTTPResponse(result)
+
     return Response(
-        content=result.body,
+        content=result.get_content(),
         status_code=result.status_code,
         headers=result.headers,
     )
 
 
+def too_many_requests_response(reason: str) -> Response:
+    return JSONResponse(
+        {"Reason": reason, "Type": "User", "message": "Rate Exceeded."},
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={"x-amzn-ErrorType": "TooManyRequestsException"},
+    )
+
+
+class LambdaStreamingHTTPResponse(StreamingResponse):
+    """
+    Streams a handler's response, which is closed even when the client went
+    away before it was read, so that the runner is released.
+    """
+
+    def __init__(self, result: LambdaStreamingResponse) -> None:
+        super().__init__(
+            content=result.iterate(),
+            status_code=result.status_code,
+            headers=result.headers,
+        )
+        self.result = result
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.result.aclose()
+
+
+def payload_too_large_response() -> Response:
+    return JSONResponse(
+        {"message": "Request Entity Too Large"},
+        status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+        headers={"x-amzn-ErrorType": "RequestEntityTooLargeException"},
+    )
+
+
+async def read_sync_payload(request: Request) -> Request | Response:
+    """Reads the body before the invocation, so a runner isn't held while it's
+    uploaded. Returns the request to invoke the handler with, or 413 when the
+    body is over the payload limit."""
+    try:
+        body = await read_body(request, SYNC_PAYLOAD_LIMIT)
+    except PayloadTooLargeError:
+        return payload_too_large_response()
+    return replay_body(request, body)
+
+
+async def dispatch_cached(
+    smyth: Smyth,
+    smyth_handler: SmythHandler,
+    request: Request,
+    event_data_function: EventDataCallable | None = None,
+) -> LambdaResponse | LambdaStreamingResponse | None:
+    """
+    Serves the response from the handler's response cache when it has one,
+    only invoking the handler on cache misses.
+    """
+    cache = smyth.response_caches.get(smyth_handler.name)
+    cache_key = cache.get_key(request) if cache is not None else None
+    if cache is None or cache_key is None:
+        return await smyth.dispatch(
+            smyth_handler, request, event_data_function=event_data_function
+        )
+
+    if requests_invalidation(request):
+        cache.invalidate(cache_key)
+    elif (cached_result := cache.get(cache_key)) is not None:
+        return cached_result
+
+    result = await smyth.dispatch(
+        smyth_handler, request, event_data_function=event_data_function
+    )
+    if isinstance(result, LambdaResponse):
+        cache.put(cache_key, result)
+    return result
+
+
 async def lambda_invoker_endpoint(request: Request) -> Response:
     smyth: Smyth = request.app.smyth
-    smyth_handler = smyth.get_handler_for_request(request.url.path)
-    return await dispatch(smyth, smyth_handler, request)
+    try:
+        route_match = smyth.resolve_route(request.url.path, request.method)
+    except ProcessDefinitionNotFoundError:
+        return JSONResponse(
+            {"message": "Not Found"}, status_code=status.HTTP_404_NOT_FOUND
+        )
+    request.scope["path_params"] = route_match.path_params
+    payload = await read_sync_payload(request)
+    if isinstance(payload, Response):
+        return payload
+    response = await dispatch(smyth, route_match.handler, payload)
+    minimum_compression_size = route_match.handler.minimum_compression_size
+    if minimum_compression_size is not None and not isinstance(
+        response, StreamingResponse
+    ):
+        await compress_response(
+            response,
+            accept_encoding=request.headers.get("accept-encoding", ""),
+            minimum_compression_size=minimum_compression_size,
+        )
+    return response
 
 
 async def invocation_endpoint(request: Request) -> Response:
@@ -61,15 +203,251 @@ async def invocation_endpoint(request: Request) -> Response:
         return Response(
             f"Function {function} not found", status_code=status.HTTP_404_NOT_FOUND
         )
+    invocation_type = request.headers.get("x-amz-invocation-type", "RequestResponse")
+    if invocation_type == "Event":
+        return await enqueue_invocation(request, function)
+    if invocation_type == "DryRun":
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    payload = await read_sync_payload(request)
+    if isinstance(payload, Response):
+        return payload
     smyth_handler.event_data_function = generate_lambda_invocation_event_data
     return await dispatch(
         smyth,
         smyth_handler,
-        request,
+        payload,
         event_data_function=generate_lambda_invocation_event_data,
     )
 
 
+def lambda_error_response(error_type: str, message: str, status_code: int) -> Response:
+    return JSONResponse(
+        {"Type": "User", "message": message},
+        status_code=status_code,
+        headers={"x-amzn-ErrorType": error_type},
+    )
+
+
+async def enqueue_invocation(request: Request, function: str) -> Response:
+    """
+    Queues an asynchronous invocation and responds with 202 right away,
+    like Lambda does for the `Event` invocation type.
+    """
+    async_invocation_queue: AsyncInvocationQueue | None = (
+        request.app.async_invocations.get(function)
+    )
+    if async_invocation_queue is None:
+        return lambda_error_response(
+            "InvalidParameterValueException",
+            f"Asynchronous invocation of {function} is not enabled.",
+            status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        body = await read_body(request, ASYNC_PAYLOAD_LIMIT)
+    except PayloadTooLargeError as error:
+        return lambda_error_response(
+            "RequestEntityTooLargeException",
+            str(error),
+            status.HTTP_413_CONTENT_TOO_LARGE,
+        )
+    try:
+        event = json.loads(body) if body else {}
+    except ValueError:
+        return lambda_error_response(
+            "InvalidRequestContentException",
+            "Could not parse request body into json.",
+            status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        request_id = async_invocation_queue.enqueue(event)
+    except QueueFullError:
+        return lambda_error_response(
+            "TooManyRequestsException",
+            "Rate Exceeded.",
+            status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+    return Response(
+        status_code=status.HTTP_202_ACCEPTED,
+        headers={"x-amzn-RequestId": request_id},
+    )
+
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/jsonl")
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    A streaming response that doesn't listen for the client disconnecting,
+    which would consume the request body, so that the body can still be read
+    while the response is streamed.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def read_ndjson_events(request: Request) -> AsyncIterator[EventData]:
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if buffer.strip():
+        yield json.loads(buffer)
+
+
+def serialize_invocation_result(result: InvocationResult) -> str:
+    data: dict[str, Any] = {"index": result.index}
+    if result.error is not None:
+        data["error"] = {
+            "errorType": type(result.error).__name__,
+            "errorMessage": str(result.error),
+        }
+    elif isinstance(result.response, bytes):
+        data["payload"] = result.response.decode(errors="replace")
+    else:
+        data["payload"] = result.response
+    return json.dumps(data) + "\n"
+
+
+async def batch_invocation_endpoint(request: Request) -> Response:
+    """
+    Invokes the function with each event of a JSON array or an NDJSON stream,
+    across its runners. Streams the results back as NDJSON, in the order of
+    the events or, with `?ordered=false`, as soon as they are ready.
+    """
+    smyth: Smyth = request.app.smyth
+    function = request.path_params["function"]
+    try:
+        smyth_handler = smyth.get_handler_for_name(function)
+    except KeyError:
+        return Response(
+            f"Function {function} not found", status_code=status.HTTP_404_NOT_FOUND
+        )
+    try:
+        parallelism = int(request.query_params.get("parallelism", 0)) or None
+    except ValueError:
+        return lambda_error_response(
+            "InvalidParameterValueException",
+            "parallelism must be a number.",
+            status.HTTP_400_BAD_REQUEST,
+        )
+    ordered = request.query_params.get("ordered", "true").lower() != "false"
+
+    events: Any
+    response_class = StreamingResponse
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in NDJSON_MEDIA_TYPES:
+        events = read_ndjson_events(request)
+        response_class = DuplexStreamingResponse
+    else:
+        try:
+            events = json.loads(await read_body(request, SYNC_PAYLOAD_LIMIT))
+        except PayloadTooLargeError:
+            return payload_too_large_response()
+        except ValueError:
+            events = None
+        if not isinstance(events, list):
+            return lambda_error_response(
+                "InvalidRequestContentException",
+                "The request body must be a JSON array of events.",
+                status.HTTP_400_BAD_REQUEST,
+            )
+
+    async def stream_results() -> AsyncIterator[str]:
+        try:
+            async for result in smyth.invoke_many(
+                smyth_handler, events, parallelism=parallelism, ordered=ordered
+            ):
+                yield serialize_invocation_result(result)
+        except ValueError as error:
+            yield (
+                json.dumps(
+                    {
+                        "error": {
+                            "errorType": "InvalidRequestContentException",
+                            "errorMessage": str(error),
+                        }
+                    }
+                )
+                + "\n"
+            )
+
+    return response_class(stream_results(), media_type="application/x-ndjson")
+
+
+async def config_reload_endpoint(request: Request) -> Response:
+    """Reloads the handlers from the config file, see
+    `SmythStarlette.reload_config`."""
+    try:
+        changes = await request.app.reload_config()
+    except ConfigReloadError as error:
+        return JSONResponse(
+            content={"message": str(error)},
+            status_code=status.HTTP_409_CONFLICT,
+        )
+    return JSONResponse(content=asdict(changes), status_code=status.HTTP_200_OK)
+
+
+async def events_endpoint(request: Request) -> Response:
+    """Streams the runners' events (see `smyth.monitor`) as server-sent events,
+    starting with a snapshot of the runners. A subscriber that falls behind by
+    more than `buffer_size` events misses the next ones, and gets a
+    `monitor.dropped` event with their count instead."""
+    smyth: Smyth = request.app.smyth
+    try:
+        buffer_size = int(request.query_params.get("buffer_size", DEFAULT_BUFFER_SIZE))
+    except ValueError:
+        buffer_size = 0
+    if buffer_size < 1:
+        return JSONResponse(
+            content={"message": "buffer_size must be a positive integer"},
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
+    async def stream() -> AsyncIterator[str]:
+        with smyth.monitor.subscribe(buffer_size) as subscription:
+            yield format_server_sent_event(
+                {
+                    "type": "runner.snapshot",
+                    "runners": {
+                        handler_name: [
+                            {
+                                "runner": process.name,
+                                "state": process.state,
+                                "task_counter": process.task_counter,
+                            }
+                            for process in processes
+                        ]
+                        for handler_name, processes in smyth.processes.items()
+                    },
+                }
+            )
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.get(), EVENT_STREAM_KEEPALIVE
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_server_sent_event(event)
+
+    return StreamingResponse(
+        content=stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+def format_server_sent_event(event: dict[str, Any]) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
 async def status_endpoint(request: Request) -> Response:
     smyth: Smyth = request.app.smyth
 
@@ -81,6 +459,10 @@ async def status_endpoint(request: Request) -> Response:
         response_data["lambda handlers"][process_group_name] = {
             "processes": [],
         }
+        if (cache := smyth.response_caches.get(process_group_name)) is not None:
+            response_data["lambda handlers"][process_group_name]["cache"] = (
+                cache.get_status()
+            )
         for process in process_group:
             response_data["lambda handlers"][process_group_name]["processes"].append(
                 {
@@ -88,7 +470,92 @@ async def status_endpoint(request: Request) -> Response:
                     "task_counter": process.task_counter,
                 }
             )
+    response_data["event sources"] = {
+        event_source.name: event_source.get_status()
+        for event_source in request.app.event_sources
+    }
     return JSONResponse(
         content=response_data,
         status_code=status.HTTP_200_OK,
     )
+
+
+def sqs_response(content: dict[str, Any], status_code: int = 200) -> Response:
+    return JSONResponse(
+        content, status_code=status_code, media_type="application/x-amz-json-1.0"
+    )
+
+
+async def sqs_endpoint(request: Request) -> Response:
+    """
+    Implements the part of the SQS JSON protocol needed to send messages
+    to Smyth's local queues, e.g. with `boto3`.
+    """
+    queue: LocalQueue = request.app.sqs_queue
+    action = request.headers.get("x-amz-target", "").removeprefix("AmazonSQS.")
+    if action not in ("GetQueueUrl", "SendMessage", "SendMessageBatch"):
+        return sqs_response(
+            {
+                "__type": "com.amazonaws.sqs#UnsupportedOperation",
+                "message": f"Smyth does not support the {action or 'unknown'} action.",
+            },
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        payload = await request.json()
+    except ValueError:
+        return sqs_response(
+            {
+                "__type": "com.amazonaws.sqs#InvalidParameterValue",
+                "message": "The request body is not valid JSON.",
+            },
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        if action == "GetQueueUrl":
+            queue_url = request.url.replace(
+                path=f"{request.app.smyth_path_prefix}/sqs/{payload['QueueName']}",
+                query="",
+            )
+            return sqs_response({"QueueUrl": str(queue_url)})
+
+        queue_name = payload["QueueUrl"].rstrip("/").rsplit("/", 1)[-1]
+        if action == "SendMessage":
+            message = queue.send(
+                queue_name,
+                payload["MessageBody"],
+                message_attributes=payload.get("MessageAttributes"),
+                delay_seconds=payload.get("DelaySeconds", 0),
+            )
+            return sqs_response(
+                {
+                    "MessageId": message.message_id,
+                    "MD5OfMessageBody": message.md5_of_body,
+                }
+            )
+        else:
+            successful = []
+            for entry in payload["Entries"]:
+                message = queue.send(
+                    queue_name,
+                    entry["MessageBody"],
+                    message_attributes=entry.get("MessageAttributes"),
+                    delay_seconds=entry.get("DelaySeconds", 0),
+                )
+                successful.append(
+                    {
+                        "Id": entry["Id"],
+                        "MessageId": message.message_id,
+                        "MD5OfMessageBody": message.md5_of_body,
+                    }
+                )
+            return sqs_response({"Successful": successful, "Failed": []})
+    except KeyError as error:
+        return sqs_response(
+            {
+                "__type": "com.amazonaws.sqs#MissingParameter",
+                "message": f"The request must contain the parameter {error.args[0]}.",
+            },
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
@@ -1,26 +1,58 @@
+import asyncio
 import logging
 import logging.config
-from collections.abc import Iterator
+from collections import deque
+from collections.abc import (
+    AsyncIterable,
+    AsyncIterator,
+    Iterable,
+    Iterator,
+)
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, suppress
+from functools import partial
+from time import monotonic, sleep, time
 from types import TracebackType
-from typing import TypeVar
+from typing import Any, TypeVar
 
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
 from starlette.requests import Request
 from starlette.routing import compile_path
 
-from smyth.context import generate_context_data
+from smyth.cache import ResponseCache
+from smyth.capture import TrafficRecorder
+from smyth.concurrency import ConcurrencyLimiter
+from smyth.context import generate_context_data, generate_static_context_data
 from smyth.event import generate_api_gw_v2_event_data
-from smyth.exceptions import ProcessDefinitionNotFoundError
-from smyth.runner.process import RunnerProcess
+from smyth.exceptions import (
+    LambdaInvocationError,
+    NoAvailableProcessError,
+    ProcessDefinitionNotFoundError,
+    SmythRuntimeError,
+)
+from smyth.monitor import RunnerMonitor
+from smyth.router import RouteMatch, Router, parse_route_key
+from smyth.runner.codec import MessageCodec, PickleCodec
+from smyth.runner.fake_context import DEFAULT_TIMEOUT
+from smyth.runner.process import RUNNER_PROCESS_CLASSES, configure_start_method
+from smyth.runner.remote import RemoteRunnerProcess
+from smyth.runner.runtime_api import RuntimeAPIRunnerProcess
 from smyth.runner.strategy import first_warm
 from smyth.types import (
+    DEFAULT_BINARY_MEDIA_TYPES,
+    ContextData,
     ContextDataCallable,
     Environ,
     EventData,
     EventDataCallable,
+    InvocationResult,
     LambdaResponse,
+    LambdaStreamingResponse,
     RunnerInputMessage,
     RunnerProcessProtocol,
     SmythHandler,
+    SmythHandlerState,
     StrategyGenerator,
 )
 
@@ -28,16 +60,60 @@ Self = TypeVar("Self", bound="Smyth")
 
 LOGGER = logging.getLogger(__name__)
 
+# How the runners can be driven, see `SmythHandler.transport`
+RUNNER_TRANSPORTS = ("queue", "runtime_api")
+# How often to check if the old runners are done when restarting a handler,
+# or if the runners are done when stopping
+DRAIN_INTERVAL = 0.1
+# How long, in seconds, the runners get to be ready when they are started, and
+# to finish the invocations in flight when they are stopped
+STARTUP_TIMEOUT = 30.0
+SHUTDOWN_TIMEOUT = 10.0
+# How many runners are started, or stopped, at once
+MAX_PARALLEL_RUNNERS = 32
+
 
 class Smyth:
     smyth_handlers: dict[str, SmythHandler]
     processes: dict[str, list[RunnerProcessProtocol]]
     strategy_generators: dict[str, Iterator["RunnerProcessProtocol"]]
+    process_released: dict[str, asyncio.Condition]
+    concurrency_limiter: ConcurrencyLimiter
+    router: Router
+    response_caches: dict[str, ResponseCache]
+    codec: MessageCodec
+    monitor: RunnerMonitor
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        max_concurrency: int | None = None,
+        codec: MessageCodec | None = None,
+        runner_pool_path: str | None = None,
+        recorder: TrafficRecorder | None = None,
+        startup_timeout: float = STARTUP_TIMEOUT,
+        shutdown_timeout: float = SHUTDOWN_TIMEOUT,
+        start_method: str = "spawn",
+        preload_modules: list[str] | None = None,
+    ) -> None:
         self.smyth_handlers = {}
         self.processes = {}
         self.strategy_generators = {}
+        self.process_released = {}
+        self.concurrency_limiter = ConcurrencyLimiter(max_concurrency)
+        self.router = Router()
+        self.response_caches = {}
+        self.codec = codec or PickleCodec()
+        self.monitor = RunnerMonitor()
+        # Invoke the handlers in a runner pool shared with other Smyths (see
+        # `smyth.supervisor`) instead of starting runners
+        self.runner_pool_path = runner_pool_path
+        # Records the invocations to replay them, see `smyth.capture`
+        self.recorder = recorder
+        self.startup_timeout = startup_timeout
+        self.shutdown_timeout = shutdown_timeout
+        # How the runners are started, see `configure_start_method`
+        configure_start_method(start_method, preload_modules)
+        self.start_method = start_method
 
     def add_handler(
         self,
@@ -51,18 +127,83 @@ class Smyth:
         concurrency: int = 1,
         strategy_generator: StrategyGenerator = first_warm,
         env_overrides: Environ | None = None,
+        reserved_concurrency: int | None = None,
+        binary_media_types: list[str] | None = None,
+        minimum_compression_size: int | None = None,
+        response_cache: ResponseCache | None = None,
+        transport: str = "queue",
+        bootstrap: list[str] | None = None,
     ) -> None:
-        self.smyth_handlers[name] = SmythHandler(
+        handler = self.create_handler(
+            name=name,
+            path=path,
+            lambda_handler_path=lambda_handler_path,
+            timeout=timeout,
+            event_data_function=event_data_function,
+            context_data_function=context_data_function,
+            log_level=log_level,
+            concurrency=concurrency,
+            strategy_generator=strategy_generator,
+            env_overrides=env_overrides,
+            reserved_concurrency=reserved_concurrency,
+            binary_media_types=binary_media_types,
+            minimum_compression_size=minimum_compression_size,
+            transport=transport,
+            bootstrap=bootstrap,
+        )
+        self.concurrency_limiter.reserve(name, reserved_concurrency)
+        self.smyth_handlers[name] = handler
+        self.router.add(handler)
+        if response_cache is not None:
+            self.response_caches[name] = response_cache
+        else:
+            self.response_caches.pop(name, None)
+
+    @staticmethod
+    def create_handler(
+        name: str,
+        path: str,
+        lambda_handler_path: str,
+        timeout: float | None = None,
+        event_data_function: EventDataCallable = generate_api_gw_v2_event_data,
+        context_data_function: ContextDataCallable = generate_context_data,
+        log_level: str = "INFO",
+        concurrency: int = 1,
+        strategy_generator: StrategyGenerator = first_warm,
+        env_overrides: Environ | None = None,
+        reserved_concurrency: int | None = None,
+        binary_media_types: list[str] | None = None,
+        minimum_compression_size: int | None = None,
+        transport: str = "queue",
+        bootstrap: list[str] | None = None,
+    ) -> SmythHandler:
+        """Validates the handler's settings and creates it, without adding it
+        (see `add_handler`)."""
+        if transport not in RUNNER_TRANSPORTS:
+            raise ValueError(f"Invalid runner transport {transport}")
+        method, path, route_key = parse_route_key(path)
+        return SmythHandler(
             name=name,
             url_path=compile_path(path)[0],
+            method=method,
+            route_key=route_key,
+            binary_media_types=(
+                list(DEFAULT_BINARY_MEDIA_TYPES)
+                if binary_media_types is None
+                else binary_media_types
+            ),
+            minimum_compression_size=minimum_compression_size,
             lambda_handler_path=lambda_handler_path,
             event_data_function=event_data_function,
             context_data_function=context_data_function,
             timeout=timeout,
             log_level=log_level,
             concurrency=concurrency,
+            reserved_concurrency=reserved_concurrency,
             strategy_generator=strategy_generator,
             env_overrides=env_overrides,
+            transport=transport,
+            bootstrap=bootstrap,
         )
 
     def __enter__(self: Self) -> Self:
@@ -77,100 +218,475 @@ class Smyth:
     ) -> None:
         self.stop_runners()
 
+    def create_process(
+        self,
+        handler_config: SmythHandler,
+        index: int,
+        static_context: ContextData | None = None,
+    ) -> RunnerProcessProtocol:
+        name = f"{handler_config.name}:{index}"
+        if self.runner_pool_path is not None:
+            return RemoteRunnerProcess(
+                name=name,
+                handler_name=handler_config.name,
+                socket_path=self.runner_pool_path,
+                codec=self.codec,
+            )
+        if handler_config.transport == "runtime_api":
+            return RuntimeAPIRunnerProcess(
+                name=name,
+                lambda_handler_path=handler_config.lambda_handler_path,
+                command=handler_config.bootstrap,
+                environ_override=handler_config.get_environ(),
+                static_context=static_context,
+            )
+        return RUNNER_PROCESS_CLASSES[self.start_method](
+            name=name,
+            lambda_handler_path=handler_config.lambda_handler_path,
+            log_level=handler_config.log_level,
+            environ_override=handler_config.get_environ(),
+            static_context=static_context,
+            codec=self.codec,
+        )
+
+    def create_processes(
+        self, handler_config: SmythHandler, start_index: int = 0
+    ) -> list[RunnerProcessProtocol]:
+        """The handler's runners, from `start_index` up to its concurrency."""
+        static_context = generate_static_context_data(handler_config)
+        return [
+            self.create_process(handler_config, index, static_context)
+            for index in range(start_index, handler_config.concurrency)
+        ]
+
+    def start_processes(
+        self, handler_config: SmythHandler
+    ) -> list[RunnerProcessProtocol]:
+        processes = self.create_processes(handler_config)
+        self.launch_processes([(handler_config, process) for process in processes])
+        return processes
+
+    def launch_processes(
+        self, processes: list[tuple[SmythHandler, RunnerProcessProtocol]]
+    ) -> None:
+        """
+        Starts the processes at once, and waits until they are ready - until
+        they can take invocations right away - for at most `startup_timeout`
+        seconds. The processes that aren't ready by then take the invocations
+        once they are.
+        """
+        if not processes:
+            return
+        with ThreadPoolExecutor(
+            max_workers=min(len(processes), MAX_PARALLEL_RUNNERS)
+        ) as executor:
+            list(executor.map(lambda item: self.start_process(*item), processes))
+        deadline = monotonic() + self.startup_timeout
+        not_ready = []
+        for _, process in processes:
+            if process.wait_ready(max(deadline - monotonic(), 0)):
+                process.emit("runner.ready")
+            else:
+                not_ready.append(process.name)
+        if not_ready:
+            LOGGER.warning(
+                "Processes not ready after %ss: %s",
+                self.startup_timeout,
+                ", ".join(not_ready),
+            )
+
+    def start_process(
+        self, handler_config: SmythHandler, process: RunnerProcessProtocol
+    ) -> None:
+        process.start()
+        LOGGER.info("Started process %s", process.name)
+        # Only after the start, the monitor can't be sent to the process
+        process.on_event = partial(self.monitor.publish, handler=handler_config.name)
+        process.emit("runner.spawn")
+
     def start_runners(self) -> None:
+        """Starts the runners of all the handlers at once, returns once they
+        are ready (see `launch_processes`)."""
+        processes: list[tuple[SmythHandler, RunnerProcessProtocol]] = []
         for handler_name, handler_config in self.smyth_handlers.items():
-            self.processes[handler_name] = []
-            for index in range(handler_config.concurrency):
-                process = RunnerProcess(
-                    name=f"{handler_name}:{index}",
-                    lambda_handler_path=handler_config.lambda_handler_path,
-                    log_level=handler_config.log_level,
-                    environ_override=handler_config.get_environ(),
-                )
-                process.start()
-                LOGGER.info("Started process %s", process.name)
-                self.processes[handler_name].append(process)
+            self.processes[handler_name] = self.create_processes(handler_config)
             self.strategy_generators[handler_name] = handler_config.strategy_generator(
                 handler_name, self.processes
             )
+            processes.extend(
+                (handler_config, process) for process in self.processes[handler_name]
+            )
+        self.launch_processes(processes)
 
     def stop_runners(self) -> None:
-        for process_group in self.processes.values():
-            for process in process_group:
-                LOGGER.info("Stopping process %s", process.name)
-                process.stop()
-        for process_group in self.processes.values():
-            for process in process_group:
-                LOGGER.debug("Joining process %s", process.name)
-                if process.is_alive():
-                    process.terminate()
-                    process.join()
-
-    def get_handler_for_request(self, path: str) -> SmythHandler:
-        for handler_def in self.smyth_handlers.values():
-            if handler_def.url_path.match(path):
-                return handler_def
-        raise ProcessDefinitionNotFoundError(
-            f"No process definition found for path {path}"
+        """Stops all the runners at once, once they finish the invocations in
+        flight, terminating the ones still working after `shutdown_timeout`
+        seconds. Closes the capture file, if any, once they're done."""
+        processes = [
+            process
+            for process_group in self.processes.values()
+            for process in process_group
+        ]
+        if processes:
+            deadline = monotonic() + self.shutdown_timeout
+            while monotonic() < deadline and any(
+                process.state == SmythHandlerState.WORKING for process in processes
+            ):
+                sleep(DRAIN_INTERVAL)
+            with ThreadPoolExecutor(
+                max_workers=min(len(processes), MAX_PARALLEL_RUNNERS)
+            ) as executor:
+                list(executor.map(self.stop_process, processes))
+        if self.recorder is not None:
+            self.recorder.close()
+
+    async def restart_runners(self, handler_name: str) -> None:
+        """
+        Replaces the runners of the handler with new ones, without downtime -
+        the new runners take the invocations as soon as they are started, the
+        old ones are stopped once they finish the invocations in flight (or
+        after the handler's timeout).
+        """
+        handler_config = self.smyth_handlers[handler_name]
+        LOGGER.info("Restarting the runners of %s", handler_name)
+        old_processes = self.processes.get(handler_name, [])
+        self.processes[handler_name] = await run_in_threadpool(
+            self.start_processes, handler_config
+        )
+        self.strategy_generators[handler_name] = handler_config.strategy_generator(
+            handler_name, self.processes
         )
+        await self.release_process(handler_name)
+        await self.retire_processes(old_processes, handler_config.timeout)
+
+    async def resize_runners(self, handler_name: str) -> None:
+        """
+        Starts or stops runners until the handler has as many as its
+        `concurrency`, the other runners stay warm. Runners are stopped once
+        they finish the invocations in flight, like in `restart_runners`.
+        """
+        handler_config = self.smyth_handlers[handler_name]
+        processes = self.processes[handler_name]
+        if len(processes) < handler_config.concurrency:
+            new_processes = self.create_processes(handler_config, len(processes))
+            await run_in_threadpool(
+                self.launch_processes,
+                [(handler_config, process) for process in new_processes],
+            )
+            self.processes[handler_name] = [*processes, *new_processes]
+            old_processes = []
+        else:
+            self.processes[handler_name] = processes[: handler_config.concurrency]
+            old_processes = processes[handler_config.concurrency :]
+        self.strategy_generators[handler_name] = handler_config.strategy_generator(
+            handler_name, self.processes
+        )
+        await self.release_process(handler_name)
+        await self.retire_processes(old_processes, handler_config.timeout)
+
+    async def remove_handler(self, handler_name: str) -> None:
+        """Removes the handler, its runners are stopped once they finish the
+        invocations in flight."""
+        handler_config = self.smyth_handlers.pop(handler_name)
+        self.router.remove(handler_name)
+        self.concurrency_limiter.reserve(handler_name, None)
+        self.response_caches.pop(handler_name, None)
+        self.strategy_generators.pop(handler_name, None)
+        # The claims waiting for a process find that the handler is gone
+        await self.release_process(handler_name)
+        self.process_released.pop(handler_name, None)
+        await self.retire_processes(
+            self.processes.pop(handler_name, []), handler_config.timeout
+        )
+
+    async def retire_processes(
+        self, processes: list[RunnerProcessProtocol], timeout: float | None
+    ) -> None:
+        """Stops the processes, which no longer get invocations, once they
+        finish the ones in flight, terminating the ones still working after
+        the timeout."""
+        deadline = monotonic() + (timeout or DEFAULT_TIMEOUT)
+        while monotonic() < deadline and any(
+            process.state == SmythHandlerState.WORKING for process in processes
+        ):
+            await asyncio.sleep(DRAIN_INTERVAL)
+        for process in processes:
+            await run_in_threadpool(self.stop_process, process)
+
+    @staticmethod
+    def stop_process(process: RunnerProcessProtocol) -> None:
+        LOGGER.info("Stopping process %s", process.name)
+        terminated = process.state == SmythHandlerState.WORKING
+        if terminated:
+            process.terminate()
+        else:
+            process.stop()
+        process.join()
+        process.emit("runner.stop", terminated=terminated)
+
+    def get_module_files(self, handler_name: str) -> set[str]:
+        """The source files the handler's runners have imported."""
+        return {
+            file
+            for process in self.processes.get(handler_name, [])
+            for file in getattr(process, "module_files", ())
+        }
+
+    def get_handler_for_request(
+        self, path: str, method: str | None = None
+    ) -> SmythHandler:
+        return self.resolve_route(path, method).handler
+
+    def resolve_route(self, path: str, method: str | None = None) -> RouteMatch:
+        return self.router.resolve(path, method)
 
     def get_handler_for_name(self, name: str) -> SmythHandler:
         return self.smyth_handlers[name]
 
+    @asynccontextmanager
+    async def claim_process(
+        self, handler_name: str
+    ) -> AsyncIterator[RunnerProcessProtocol]:
+        """
+        Picks a process with the handler's strategy and marks it as working,
+        so that concurrent invocations don't pick the same one - processes only
+        report that they are working once they get the invocation. When all
+        the processes are working, waits for one to be released (see
+        `release_process`) for at most the handler's timeout, by when the
+        invocations in flight are over, and raises `NoAvailableProcessError`.
+
+        The body runs before the process is marked as working, while the other
+        claims of the handler wait, so the event and context see the state the
+        invocation starts in. The process isn't claimed if the body raises.
+        """
+        released = self.process_released.setdefault(handler_name, asyncio.Condition())
+        async with released:
+            process = await self.pick_process(handler_name, released)
+            yield process
+            process.state = SmythHandlerState.WORKING
+
+    async def pick_process(
+        self, handler_name: str, released: asyncio.Condition
+    ) -> RunnerProcessProtocol:
+        try:
+            handler_config = self.smyth_handlers[handler_name]
+        except KeyError:
+            raise ProcessDefinitionNotFoundError(
+                f"No process definition found for handler {handler_name}"
+            )
+        deadline = monotonic() + (handler_config.timeout or DEFAULT_TIMEOUT)
+        while True:
+            try:
+                return next(self.strategy_generators[handler_name])
+            except KeyError:
+                raise ProcessDefinitionNotFoundError(
+                    f"No process definition found for handler {handler_name}"
+                )
+            except NoAvailableProcessError:
+                # A generator is done once it raises, the next pick needs a
+                # new one
+                self.strategy_generators[handler_name] = (
+                    handler_config.strategy_generator(handler_name, self.processes)
+                )
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    raise
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(released.wait(), remaining)
+
+    async def release_process(self, handler_name: str) -> None:
+        """Wakes up the claims waiting for one of the handler's processes, once
+        an invocation is over or the processes changed."""
+        if (released := self.process_released.get(handler_name)) is not None:
+            async with released:
+                released.notify_all()
+
     async def dispatch(
         self,
         smyth_handler: SmythHandler,
         request: Request,
         event_data_function: EventDataCallable | None = None,
-    ) -> LambdaResponse | None:
+    ) -> LambdaResponse | LambdaStreamingResponse | None:
         """
         Smyth.dispatch is used upon a request that would normally be formed by an
         AWS trigger. It is responsible for finding the appropriate process
-        for the request, invoking the process, and translating the response
+        for the request, invoking the process, and translating the response.
+        Raises `ConcurrencyLimitExceededError` when the invocation is throttled,
+        and `NoAvailableProcessError` when no process was released in time.
+        Streamed responses count towards the concurrency until they are closed,
+        see `LambdaStreamingResponse.aclose`.
         """
+        self.concurrency_limiter.acquire(smyth_handler.name)
+        streaming = False
         try:
-            process = next(self.strategy_generators[smyth_handler.name])
-        except KeyError:
-            raise ProcessDefinitionNotFoundError(
-                f"No process definition found for handler {smyth_handler.name}"
-            )
+            if event_data_function is None:
+                event_data_function = smyth_handler.event_data_function
 
-        if event_data_function is None:
-            event_data_function = smyth_handler.event_data_function
-
-        event_data = await event_data_function(request, smyth_handler, process)
-        context_data = await smyth_handler.context_data_function(
-            request, smyth_handler, process
-        )
+            async with self.claim_process(smyth_handler.name) as process:
+                event_data = await event_data_function(request, smyth_handler, process)
+                context_data = await smyth_handler.context_data_function(
+                    request, smyth_handler, process
+                )
 
-        return await process.asend(
-            RunnerInputMessage(
-                type="smyth.lambda.invoke",
-                event=event_data,
-                context=context_data,
+            response = await self.send(
+                smyth_handler.name,
+                process,
+                RunnerInputMessage(
+                    type="smyth.lambda.invoke",
+                    event=event_data,
+                    context=context_data,
+                ),
             )
-        )
+            if isinstance(response, LambdaStreamingResponse):
+                response.on_close = partial(self._release, smyth_handler.name)
+                streaming = True
+                return response
+        finally:
+            if not streaming:
+                await self._release(smyth_handler.name)
+
+        if response is None:
+            return None
+        try:
+            return LambdaResponse.model_validate(response)
+        except ValidationError as error:
+            raise LambdaInvocationError(
+                f"Malformed Lambda response: {error}"
+            ) from error
 
-    async def invoke(
-        self, handler: SmythHandler, event_data: EventData
-    ) -> LambdaResponse | None:
+    async def invoke(self, handler: SmythHandler, event_data: EventData) -> Any:
         """
         Smyth.invoke is used to invoke a handler directly, without going through
         Starlette or when a direct invocation is needed (e.g., when invoking
         a lambda with boto3) - on direct invocation the event holds only the data
-        passed in the invokation. There's no Starlette request involved.
+        passed in the invokation. There's no Starlette request involved. Returns
+        whatever the handler returned.
         """
+        with self.concurrency_limiter.admit(handler.name):
+            try:
+                async with self.claim_process(handler.name) as process:
+                    context_data = await handler.context_data_function(
+                        None, handler, process
+                    )
+                response = await self.send(
+                    handler.name,
+                    process,
+                    RunnerInputMessage(
+                        type="smyth.lambda.invoke",
+                        event=event_data,
+                        context=context_data,
+                    ),
+                )
+                if isinstance(response, LambdaStreamingResponse):
+                    return await run_in_threadpool(response.read)
+                return response
+            finally:
+                await self.release_process(handler.name)
+
+    async def send(
+        self,
+        handler_name: str,
+        process: RunnerProcessProtocol,
+        message: RunnerInputMessage,
+    ) -> Any:
+        """Sends the invocation to the process, and records it when the traffic
+        is captured - in a thread, encoding and writing the invocation would
+        block the event loop."""
+        if self.recorder is None:
+            return await process.asend(message)
+        cold_start = process.task_counter == 0
+        timestamp, started = time(), monotonic()
         try:
-            process = next(self.strategy_generators[handler.name])
-        except KeyError:
-            raise ProcessDefinitionNotFoundError(
-                f"No process definition found for handler {handler.name}"
-            )
-        context_data = await handler.context_data_function(None, handler, process)
-        return await process.asend(
-            RunnerInputMessage(
-                type="smyth.lambda.invoke",
-                event=event_data,
-                context=context_data,
+            response = await process.asend(message)
+        except SmythRuntimeError as error:
+            await run_in_threadpool(
+                self.recorder.record,
+                handler_name,
+                process.name,
+                message,
+                timestamp,
+                monotonic() - started,
+                cold_start,
+                error=error,
             )
+            raise
+        await run_in_threadpool(
+            self.recorder.record,
+            handler_name,
+            process.name,
+            message,
+            timestamp,
+            monotonic() - started,
+            cold_start,
+            response=response,
         )
+        return response
+
+    async def invoke_many(
+        self,
+        handler: SmythHandler,
+        events: Iterable[EventData] | AsyncIterable[EventData],
+        parallelism: int | None = None,
+        ordered: bool = True,
+    ) -> AsyncIterator[InvocationResult]:
+        """
+        Invokes the handler with each of the events, at most `parallelism` at a
+        time (by default, and at most, as many as the handler has runners).
+        Events are read lazily, so they can come from a stream. Yields the
+        results in the order of the events or, when not `ordered`, as soon as
+        they are ready. Invocation errors are returned in the results.
+        """
+        parallelism = min(parallelism or handler.concurrency, handler.concurrency)
+        if parallelism < 1:
+            raise ValueError("parallelism must be positive")
+
+        async def invoke(index: int, event_data: EventData) -> InvocationResult:
+            try:
+                response = await self.invoke(handler, event_data)
+            except SmythRuntimeError as error:
+                return InvocationResult(index=index, error=error)
+            return InvocationResult(index=index, response=response)
+
+        pending: deque[asyncio.Task[InvocationResult]] = deque()
+        try:
+            index = 0
+            async for event_data in _iterate(events):
+                if len(pending) >= parallelism:
+                    for result in await _next_results(pending, ordered):
+                        yield result
+                pending.append(asyncio.create_task(invoke(index, event_data)))
+                index += 1
+            while pending:
+                for result in await _next_results(pending, ordered):
+                    yield result
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _release(self, handler_name: str) -> None:
+        self.concurrency_limiter.release(handler_name)
+        await self.release_process(handler_name)
+
+
+async def _iterate(
+    events: Iterable[EventData] | AsyncIterable[EventData],
+) -> AsyncIterator[EventData]:
+    if isinstance(events, AsyncIterable):
+        async for event_data in events:
+            yield event_data
+    else:
+        for event_data in events:
+            yield event_data
+
+
+async def _next_results(
+    pending: deque[asyncio.Task[InvocationResult]], ordered: bool
+) -> list[InvocationResult]:
+    """Waits for the oldest pending invocation when the results are ordered,
+    for any of them otherwise, and removes the finished ones."""
+    if ordered:
+        return [await pending.popleft()]
+    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    for task in done:
+        pending.remove(task)
+    return sorted((task.result() for task in done), key=lambda result: result.index)
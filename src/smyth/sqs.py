@@ -0,0 +1,405 @@
+import asyncio
+import json
+import logging
+import sqlite3
+from dataclasses import dataclass
+from hashlib import md5
+from threading import Lock
+from time import time
+from typing import Any
+from uuid import uuid4
+
+from smyth.event import ACCOUNT_ID
+from smyth.exceptions import SmythRuntimeError
+from smyth.smyth import Smyth
+from smyth.types import EventData
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class QueueMessage:
+    message_id: str
+    queue_name: str
+    body: str
+    message_attributes: dict[str, Any]
+    sent_timestamp: int
+    receive_count: int = 0
+    first_receive_timestamp: int | None = None
+    receipt_handle: str | None = None
+
+    @property
+    def md5_of_body(self) -> str:
+        return md5(self.body.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class SQSEventSourceMetrics:
+    batches: int = 0
+    received: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    moved_to_dead_letter_queue: int = 0
+    invocation_time: float = 0
+
+
+class LocalQueue:
+    """An SQLite backed store of SQS-like queues.
+
+    Queues are created on first use. Received messages stay invisible for
+    the visibility timeout and reappear unless they are deleted before it
+    expires. Pass a file path to keep the messages between Smyth restarts.
+    """
+
+    def __init__(self, database_path: str = ":memory:") -> None:
+        self.database_path = database_path
+        self.lock = Lock()
+        self.connection = sqlite3.connect(
+            database_path, check_same_thread=False, isolation_level=None
+        )
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS messages (
+                message_id TEXT PRIMARY KEY,
+                queue_name TEXT NOT NULL,
+                body TEXT NOT NULL,
+                message_attributes TEXT NOT NULL,
+                sent_timestamp INTEGER NOT NULL,
+                visible_at REAL NOT NULL,
+                receive_count INTEGER NOT NULL DEFAULT 0,
+                first_receive_timestamp INTEGER,
+                receipt_handle TEXT
+            )
+            """
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS messages_visible_at "
+            "ON messages (queue_name, visible_at)"
+        )
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def send(
+        self,
+        queue_name: str,
+        body: str,
+        message_attributes: dict[str, Any] | None = None,
+        delay_seconds: float = 0,
+    ) -> QueueMessage:
+        now = time()
+        message = QueueMessage(
+            message_id=str(uuid4()),
+            queue_name=queue_name,
+            body=body,
+            message_attributes=message_attributes or {},
+            sent_timestamp=int(now * 1000),
+        )
+        with self.lock:
+            self.connection.execute(
+                "INSERT INTO messages (message_id, queue_name, body, "
+                "message_attributes, sent_timestamp, visible_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    message.message_id,
+                    queue_name,
+                    body,
+                    json.dumps(message.message_attributes),
+                    message.sent_timestamp,
+                    now + delay_seconds,
+                ),
+            )
+        return message
+
+    def receive(
+        self, queue_name: str, max_messages: int, visibility_timeout: float
+    ) -> list[QueueMessage]:
+        now = time()
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.connection.execute(
+                    "SELECT message_id, body, message_attributes, sent_timestamp, "
+                    "receive_count, first_receive_timestamp FROM messages "
+                    "WHERE queue_name = ? AND visible_at <= ? "
+                    "ORDER BY sent_timestamp, rowid LIMIT ?",
+                    (queue_name, now, max_messages),
+                ).fetchall()
+                messages = []
+                for row in rows:
+                    message = QueueMessage(
+                        message_id=row[0],
+                        queue_name=queue_name,
+                        body=row[1],
+                        message_attributes=json.loads(row[2]),
+                        sent_timestamp=row[3],
+                        receive_count=row[4] + 1,
+                        first_receive_timestamp=row[5] or int(now * 1000),
+                        receipt_handle=str(uuid4()),
+                    )
+                    self.connection.execute(
+                        "UPDATE messages SET visible_at = ?, receive_count = ?, "
+                        "first_receive_timestamp = ?, receipt_handle = ? "
+                        "WHERE message_id = ?",
+                        (
+                            now + visibility_timeout,
+                            message.receive_count,
+                            message.first_receive_timestamp,
+                            message.receipt_handle,
+                            message.message_id,
+                        ),
+                    )
+                    messages.append(message)
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+        return messages
+
+    def delete(self, queue_name: str, receipt_handles: list[str]) -> None:
+        with self.lock:
+            self.connection.executemany(
+                "DELETE FROM messages WHERE queue_name = ? AND receipt_handle = ?",
+                [(queue_name, receipt_handle) for receipt_handle in receipt_handles],
+            )
+
+    def move(self, message: QueueMessage, queue_name: str) -> None:
+        """Moves the message to another queue (i.e. a dead-letter queue),
+        keeping its ID and making it visible right away."""
+        with self.lock:
+            self.connection.execute(
+                "UPDATE messages SET queue_name = ?, visible_at = ?, "
+                "receipt_handle = NULL WHERE message_id = ?",
+                (queue_name, time(), message.message_id),
+            )
+
+    def count(self, queue_name: str) -> int:
+        with self.lock:
+            (count,) = self.connection.execute(
+                "SELECT COUNT(*) FROM messages WHERE queue_name = ?", (queue_name,)
+            ).fetchone()
+        return int(count)
+
+
+class SQSEventSource:
+    """Polls a `LocalQueue` and invokes the handler with batches of messages,
+    like an SQS event source mapping of AWS Lambda.
+
+    Up to `handler.concurrency` batches are processed at once. A batch is
+    invoked once it has `batch_size` messages or `maximum_batching_window`
+    seconds after its first message was received. Messages are deleted when
+    the invocation succeeds, apart from the ones reported back in
+    `batchItemFailures`. Messages received more than `max_receive_count`
+    times are moved to the `dead_letter_queue_name` queue.
+    """
+
+    def __init__(
+        self,
+        smyth: Smyth,
+        handler_name: str,
+        queue: LocalQueue,
+        queue_name: str,
+        batch_size: int = 10,
+        maximum_batching_window: float = 0,
+        visibility_timeout: float = 30,
+        max_receive_count: int | None = None,
+        dead_letter_queue_name: str | None = None,
+        report_batch_item_failures: bool = True,
+        poll_interval: float = 0.1,
+    ):
+        self.smyth = smyth
+        self.handler_name = handler_name
+        self.queue = queue
+        self.queue_name = queue_name
+        self.batch_size = batch_size
+        self.maximum_batching_window = maximum_batching_window
+        self.visibility_timeout = visibility_timeout
+        self.max_receive_count = max_receive_count
+        self.dead_letter_queue_name = dead_letter_queue_name
+        self.report_batch_item_failures = report_batch_item_failures
+        self.poll_interval = poll_interval
+        self.metrics = SQSEventSourceMetrics()
+        self._task: asyncio.Task[None] | None = None
+        self._batch_tasks: set[asyncio.Task[None]] = set()
+
+    @property
+    def name(self) -> str:
+        return f"sqs:{self.queue_name}:{self.handler_name}"
+
+    @property
+    def queue_arn(self) -> str:
+        return f"arn:aws:sqs:{self.region}:{ACCOUNT_ID}:{self.queue_name}"
+
+    @property
+    def region(self) -> str:
+        handler = self.smyth.get_handler_for_name(self.handler_name)
+        return handler.get_environ()["AWS_REGION"]
+
+    def start(self) -> None:
+        LOGGER.info("Starting event source %s", self.name)
+        self._task = asyncio.create_task(self.run(), name=self.name)
+
+    async def stop(self) -> None:
+        LOGGER.info("Stopping event source %s", self.name)
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+
+    def get_status(self) -> dict[str, Any]:
+        status: dict[str, Any] = {
+            "handler": self.handler_name,
+            "queue": self.queue_name,
+            "messages": self.queue.count(self.queue_name),
+            "in_flight_batches": len(self._batch_tasks),
+            "batches": self.metrics.batches,
+            "received": self.metrics.received,
+            "succeeded": self.metrics.succeeded,
+            "failed": self.metrics.failed,
+            "moved_to_dead_letter_queue": self.metrics.moved_to_dead_letter_queue,
+            "invocation_time": self.metrics.invocation_time,
+        }
+        if self.dead_letter_queue_name:
+            status["dead_letter_queue_messages"] = self.queue.count(
+                self.dead_letter_queue_name
+            )
+        return status
+
+    async def run(self) -> None:
+        handler = self.smyth.get_handler_for_name(self.handler_name)
+        semaphore = asyncio.Semaphore(handler.concurrency)
+        while True:
+            await semaphore.acquire()
+            try:
+                messages = await self.receive_batch()
+            except BaseException:
+                semaphore.release()
+                raise
+            task = asyncio.create_task(self.process_batch(messages))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+            task.add_done_callback(lambda _: semaphore.release())
+
+    async def receive_batch(self) -> list[QueueMessage]:
+        loop = asyncio.get_running_loop()
+        messages: list[QueueMessage] = []
+        deadline: float | None = None
+        while len(messages) < self.batch_size:
+            messages.extend(self.receive_messages(self.batch_size - len(messages)))
+            if messages and deadline is None:
+                deadline = loop.time() + self.maximum_batching_window
+            if deadline is not None and loop.time() >= deadline:
+                break
+            if len(messages) < self.batch_size:
+                timeout = self.poll_interval
+                if deadline is not None:
+                    timeout = min(timeout, deadline - loop.time())
+                await asyncio.sleep(timeout)
+        return messages
+
+    def receive_messages(self, max_messages: int) -> list[QueueMessage]:
+        messages = []
+        for message in self.queue.receive(
+            self.queue_name, max_messages, self.visibility_timeout
+        ):
+            if (
+                self.max_receive_count is not None
+                and self.dead_letter_queue_name is not None
+                and message.receive_count > self.max_receive_count
+            ):
+                LOGGER.warning(
+                    "Moving message %s to %s",
+                    message.message_id,
+                    self.dead_letter_queue_name,
+                )
+                self.queue.move(message, self.dead_letter_queue_name)
+                self.metrics.moved_to_dead_letter_queue += 1
+                continue
+            messages.append(message)
+        return messages
+
+    async def process_batch(self, messages: list[QueueMessage]) -> None:
+        handler = self.smyth.get_handler_for_name(self.handler_name)
+        self.metrics.batches += 1
+        self.metrics.received += len(messages)
+        started = time()
+        try:
+            response = await self.smyth.invoke(handler, self.get_event_data(messages))
+        except SmythRuntimeError as error:
+            LOGGER.error(
+                "Batch of %s messages from %s failed: %s",
+                len(messages),
+                self.queue_name,
+                error,
+            )
+            self.metrics.failed += len(messages)
+            return
+        finally:
+            self.metrics.invocation_time += time() - started
+
+        failed_message_ids = self.get_failed_message_ids(response, messages)
+        succeeded = [
+            message
+            for message in messages
+            if message.message_id not in failed_message_ids
+        ]
+        self.queue.delete(
+            self.queue_name,
+            [message.receipt_handle for message in succeeded if message.receipt_handle],
+        )
+        self.metrics.succeeded += len(succeeded)
+        self.metrics.failed += len(messages) - len(succeeded)
+
+    def get_failed_message_ids(
+        self, response: Any, messages: list[QueueMessage]
+    ) -> set[str]:
+        """Reads the partial batch response, an invalid one fails the whole
+        batch, the same as on AWS."""
+        if not self.report_batch_item_failures or not isinstance(response, dict):
+            return set()
+        message_ids = {message.message_id for message in messages}
+        failed_message_ids = set()
+        for failure in response.get("batchItemFailures") or []:
+            item_identifier = (
+                failure.get("itemIdentifier") if isinstance(failure, dict) else None
+            )
+            if item_identifier not in message_ids:
+                LOGGER.error(
+                    "Invalid batchItemFailures item %s, failing the whole batch",
+                    failure,
+                )
+                return message_ids
+            failed_message_ids.add(item_identifier)
+        return failed_message_ids
+
+    def get_event_data(self, messages: list[QueueMessage]) -> EventData:
+        return {
+            "Records": [
+                {
+                    "messageId": message.message_id,
+                    "receiptHandle": message.receipt_handle,
+                    "body": message.body,
+                    "attributes": {
+                        "ApproximateReceiveCount": str(message.receive_count),
+                        "SentTimestamp": str(message.sent_timestamp),
+                        "SenderId": ACCOUNT_ID,
+                        "ApproximateFirstReceiveTimestamp": str(
+                            message.first_receive_timestamp
+                        ),
+                    },
+                    "messageAttributes": {
+                        name: {
+                            key[0].lower() + key[1:]: value
+                            for key, value in attribute.items()
+                        }
+                        for name, attribute in message.message_attributes.items()
+                    },
+                    "md5OfBody": message.md5_of_body,
+                    "eventSource": "aws:sqs",
+                    "eventSourceARN": self.queue_arn,
+                    "awsRegion": self.region,
+                }
+                for message in messages
+            ]
+        }
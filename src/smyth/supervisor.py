@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import logging.config
+import os
+import signal
+import tempfile
+import time
+from asyncio import StreamReader, StreamWriter
+from multiprocessing import Process
+
+from setproctitle import setproctitle
+
+from smyth.config import Config, get_config, get_config_dict
+from smyth.exceptions import SmythRuntimeError, SubprocessError
+from smyth.reload import HandlerReloader
+from smyth.runner.remote import aread_frame, awrite_frame
+from smyth.server.app import create_schedule_sources, create_smyth
+from smyth.smyth import Smyth
+from smyth.types import (
+    EventSourceProtocol,
+    LambdaErrorResponse,
+    LambdaStreamingResponse,
+    RunnerErrorMessage,
+    RunnerInputMessage,
+    RunnerOutputMessage,
+    RunnerResponseMessage,
+    RunnerStreamChunkMessage,
+    RunnerStreamEndMessage,
+    RunnerStreamStartMessage,
+)
+from smyth.utils import get_logging_config
+
+LOGGER = logging.getLogger(__name__)
+
+# How long to wait for the runner pool to start its runners
+RUNNER_POOL_START_TIMEOUT = 60
+
+
+def get_error_message(error: Exception) -> RunnerErrorMessage:
+    return RunnerErrorMessage(
+        type="smyth.lambda.error",
+        error=LambdaErrorResponse(
+            type=type(error).__name__, message=str(error), stacktrace=""
+        ),
+    )
+
+
+class RunnerPool:
+    """Serves the runners of one Smyth to the HTTP workers over a Unix socket.
+
+    Every `smyth.runner.remote.RemoteRunnerProcess` of the workers connects
+    once and sends its invocations. Each invocation waits for one of the
+    handler's runners to be free, so the workers together never run more
+    invocations of a handler than it has runners.
+    """
+
+    def __init__(self, smyth: Smyth, socket_path: str):
+        self.smyth = smyth
+        self.socket_path = socket_path
+        self.runners = {
+            handler_name: asyncio.Semaphore(handler.concurrency)
+            for handler_name, handler in smyth.smyth_handlers.items()
+        }
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_unix_server(
+            self.handle_connection, path=self.socket_path
+        )
+        LOGGER.info("Runner pool listening on %s", self.socket_path)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def handle_connection(
+        self, reader: StreamReader, writer: StreamWriter
+    ) -> None:
+        try:
+            if (hello := await aread_frame(reader)) is None:
+                return
+            handler_name = hello.decode()
+            if handler_name not in self.runners:
+                LOGGER.error("Unknown handler %s in the runner pool", handler_name)
+                return
+            while (frame := await aread_frame(reader)) is not None:
+                await self.invoke(
+                    handler_name, self.smyth.codec.decode_input(frame), writer
+                )
+        except ConnectionError:
+            LOGGER.debug("Worker disconnected from the runner pool")
+        finally:
+            writer.close()
+
+    async def invoke(
+        self, handler_name: str, message: RunnerInputMessage, writer: StreamWriter
+    ) -> None:
+        async with self.runners[handler_name]:
+            try:
+                await self.send(handler_name, message, writer)
+            finally:
+                await self.smyth.release_process(handler_name)
+
+    async def send(
+        self, handler_name: str, message: RunnerInputMessage, writer: StreamWriter
+    ) -> None:
+        try:
+            async with self.smyth.claim_process(handler_name) as process:
+                pass
+            response = await process.asend(message)
+        except SmythRuntimeError as error:
+            await self.write(writer, get_error_message(error))
+            return
+        if isinstance(response, LambdaStreamingResponse):
+            await self.stream(writer, response)
+        else:
+            await self.write(
+                writer,
+                RunnerResponseMessage(type="smyth.lambda.response", response=response),
+            )
+
+    async def stream(
+        self, writer: StreamWriter, response: LambdaStreamingResponse
+    ) -> None:
+        await self.write(
+            writer,
+            RunnerStreamStartMessage(
+                type="smyth.lambda.stream.start",
+                status_code=response.status_code,
+                headers=response.headers,
+            ),
+        )
+        try:
+            async for chunk in response.iterate():
+                await self.write(
+                    writer,
+                    RunnerStreamChunkMessage(
+                        type="smyth.lambda.stream.chunk", chunk=chunk
+                    ),
+                )
+        except SmythRuntimeError as error:
+            await self.write(writer, get_error_message(error))
+            return
+        finally:
+            # Drains the rest of the stream when the worker went away
+            await response.aclose()
+        await self.write(writer, RunnerStreamEndMessage(type="smyth.lambda.stream.end"))
+
+    async def write(self, writer: StreamWriter, message: RunnerOutputMessage) -> None:
+        await awrite_frame(writer, self.smyth.codec.encode(message))
+
+
+async def run_runner_pool(config: Config, socket_path: str) -> None:
+    smyth = create_smyth(config)
+    pool = RunnerPool(smyth, socket_path)
+    event_sources: list[EventSourceProtocol] = [*create_schedule_sources(smyth, config)]
+    if config.hot_reload:
+        event_sources.append(HandlerReloader(smyth, config.hot_reload_interval))
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signal_number, stopping.set)
+
+    with smyth:
+        await pool.start()
+        for event_source in event_sources:
+            event_source.start()
+        await stopping.wait()
+        LOGGER.info("Stopping the runner pool")
+        for event_source in event_sources:
+            await event_source.stop()
+        await pool.stop()
+
+
+def serve_runner_pool(socket_path: str) -> None:
+    """The runner pool process."""
+    setproctitle("smyth:pool")
+    config = get_config(get_config_dict())
+    logging.config.dictConfig(get_logging_config(config.log_level))
+    asyncio.run(run_runner_pool(config, socket_path))
+
+
+def start_runner_pool() -> tuple[Process, str]:
+    """Starts the runner pool process and waits until its runners are started,
+    returns the process and the path of its socket."""
+    socket_path = os.path.join(tempfile.mkdtemp(prefix="smyth-"), "runners.sock")
+    process = Process(target=serve_runner_pool, args=(socket_path,), name="smyth:pool")
+    process.start()
+    started = time.monotonic()
+    while not os.path.exists(socket_path):
+        if not process.is_alive():
+            raise SubprocessError("The runner pool failed to start")
+        if time.monotonic() - started > RUNNER_POOL_START_TIMEOUT:
+            process.terminate()
+            raise SubprocessError("The runner pool didn't start in time")
+        time.sleep(0.1)
+    return process, socket_path
+
+
+def stop_runner_pool(process: Process, socket_path: str) -> None:
+    if process.is_alive():
+        process.terminate()
+    process.join()
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    os.rmdir(os.path.dirname(socket_path))
@@ -1,24 +1,39 @@
 import os
 import sys
-from collections.abc import Awaitable, Callable, Iterator, MutableMapping
-from dataclasses import dataclass
+from binascii import a2b_base64
+from collections.abc import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterator,
+    MutableMapping,
+)
+from contextlib import suppress
+from dataclasses import dataclass, field
 from enum import Enum
 from re import Pattern
 from time import strftime
-from typing import Annotated, Any, Literal, Protocol, TypeAlias
+from typing import TYPE_CHECKING, Annotated, Any, Literal, Protocol, TypeAlias
 
 from aws_lambda_powertools.utilities.typing import LambdaContext
 from pydantic import BaseModel, Field
-from starlette.requests import Request
+
+from smyth.exceptions import SmythRuntimeError
+
+if TYPE_CHECKING:
+    # Only for the annotations, runner processes import this module and don't
+    # need starlette
+    from starlette.requests import Request
 
 LambdaEvent: TypeAlias = MutableMapping[str, Any]
 EventData: TypeAlias = dict[str, Any]
 EventDataCallable: TypeAlias = Callable[
-    [Request, "SmythHandler", "RunnerProcessProtocol"], Awaitable[EventData]
+    ["Request", "SmythHandler", "RunnerProcessProtocol"], Awaitable[EventData]
 ]
 ContextData: TypeAlias = dict[str, Any]
 ContextDataCallable: TypeAlias = Callable[
-    [Request | None, "SmythHandler", "RunnerProcessProtocol"], Awaitable[ContextData]
+    ["Request | None", "SmythHandler", "RunnerProcessProtocol"],
+    Awaitable[ContextData],
 ]
 StrategyGenerator: TypeAlias = Callable[
     [str, dict[str, list["RunnerProcessProtocol"]]],
@@ -26,6 +41,18 @@ StrategyGenerator: TypeAlias = Callable[
 ]
 Environ: TypeAlias = dict[str, str]
 
+DEFAULT_BINARY_MEDIA_TYPES = [
+    "application/octet-stream",
+    "application/pdf",
+    "application/zip",
+    "application/gzip",
+    "multipart/form-data",
+    "image/*",
+    "audio/*",
+    "video/*",
+    "font/*",
+]
+
 
 class SmythHandlerState(str, Enum):
     COLD = "cold"
@@ -42,7 +69,15 @@ class RunnerInputMessage(BaseModel):
 class LambdaResponse(BaseModel):
     status_code: int = Field(200, alias="statusCode")
     headers: dict[str, str] = {}
-    body: str
+    body: str | bytes
+    is_base64_encoded: bool = Field(False, alias="isBase64Encoded")
+
+    def get_content(self) -> str | bytes:
+        """The response body, decoded when the handler returned it base64
+        encoded."""
+        if self.is_base64_encoded:
+            return a2b_base64(self.body)
+        return self.body
 
 
 class LambdaErrorResponse(BaseModel):
@@ -58,7 +93,9 @@ class RunnerStatusMessage(BaseModel):
 
 class RunnerResponseMessage(BaseModel):
     type: Literal["smyth.lambda.response"]
-    response: LambdaResponse
+    # Whatever the handler returned, HTTP responses are validated as
+    # `LambdaResponse` in `Smyth.dispatch`
+    response: Any
 
 
 class RunnerErrorMessage(BaseModel):
@@ -66,13 +103,111 @@ class RunnerErrorMessage(BaseModel):
     error: LambdaErrorResponse
 
 
+class RunnerStreamStartMessage(BaseModel):
+    type: Literal["smyth.lambda.stream.start"]
+    status_code: int = 200
+    headers: dict[str, str] = {}
+
+
+class RunnerStreamChunkMessage(BaseModel):
+    type: Literal["smyth.lambda.stream.chunk"]
+    chunk: bytes
+
+
+class RunnerStreamEndMessage(BaseModel):
+    type: Literal["smyth.lambda.stream.end"]
+
+
+class RunnerModulesMessage(BaseModel):
+    """The source files of the modules the runner has imported, so the runners
+    of a handler can be restarted when its code changes."""
+
+    type: Literal["smyth.lambda.modules"]
+    files: list[str]
+
+
 RunnerOutputMessage = Annotated[
-    RunnerStatusMessage | RunnerResponseMessage | RunnerErrorMessage,
+    RunnerStatusMessage
+    | RunnerModulesMessage
+    | RunnerResponseMessage
+    | RunnerErrorMessage
+    | RunnerStreamStartMessage
+    | RunnerStreamChunkMessage
+    | RunnerStreamEndMessage,
     Field(discriminator="type"),
 ]
 
 
-LambdaHandler: TypeAlias = Callable[[LambdaEvent, LambdaContext], LambdaResponse]
+@dataclass
+class InvocationResult:
+    """The outcome of one of the invocations of `Smyth.invoke_many`."""
+
+    index: int
+    response: Any = None
+    error: Exception | None = None
+
+
+@dataclass
+class LambdaStreamingResponse:
+    """A response streamed by a generator handler, chunks are read from the
+    runner process as they are iterated over."""
+
+    chunks: Iterator[bytes]
+    status_code: int = 200
+    headers: dict[str, str] = field(default_factory=dict)
+    # Called once the response is closed, see `Smyth.dispatch`
+    on_close: Callable[[], Awaitable[None]] | None = None
+    started: bool = field(default=False, init=False, repr=False)
+    closed: bool = field(default=False, init=False, repr=False)
+
+    def read(self) -> bytes:
+        return b"".join(self.chunks)
+
+    async def iterate(self) -> AsyncIterator[bytes]:
+        """Reads the chunks in a thread, so waiting for the runner doesn't
+        block the event loop, and closes the response once they are read or
+        the iteration is interrupted."""
+        # Imported here, runner processes import this module and don't need
+        # starlette
+        from starlette.concurrency import run_in_threadpool
+
+        try:
+            while (
+                chunk := await run_in_threadpool(next, self.chunks, None)
+            ) is not None:
+                self.started = True
+                yield chunk
+        finally:
+            await self.aclose()
+
+    async def aclose(self) -> None:
+        """Closes the chunks in a thread and calls `on_close`, even when the
+        task is cancelled - the runner is only free once the rest of the
+        stream was drained."""
+        if self.closed:
+            return
+        self.closed = True
+        from anyio import CancelScope
+        from starlette.concurrency import run_in_threadpool
+
+        with CancelScope(shield=True):
+            await run_in_threadpool(self.close)
+            if self.on_close is not None:
+                await self.on_close()
+
+    def close(self) -> None:
+        if not self.started:
+            # A generator that was never started doesn't clean up when it's
+            # closed, the chunks are read instead
+            self.started = True
+            with suppress(SmythRuntimeError):
+                for _ in self.chunks:
+                    pass
+        elif (close := getattr(self.chunks, "close", None)) is not None:
+            close()
+
+
+LambdaHandler: TypeAlias = Callable[[LambdaEvent, LambdaContext], Any]
 
 
 class RunnerProcessProtocol(Protocol):
@@ -80,14 +215,19 @@ class RunnerProcessProtocol(Protocol):
     task_counter: int
     last_used_timestamp: float
     state: SmythHandlerState
+    on_event: Callable[..., None] | None
+
+    def emit(self, event_type: str, **data: Any) -> None: ...
 
-    async def asend(self, data: RunnerInputMessage) -> LambdaResponse | None: ...
+    async def asend(self, data: RunnerInputMessage) -> Any: ...
 
     def start(self) -> None: ...
 
+    def wait_ready(self, timeout: float) -> bool: ...
+
     def stop(self) -> None: ...
 
-    def send(self, data: RunnerInputMessage) -> LambdaResponse | None: ...
+    def send(self, data: RunnerInputMessage) -> Any: ...
 
     def is_alive(self) -> bool: ...
 
@@ -96,6 +236,17 @@ class RunnerProcessProtocol(Protocol):
     def join(self) -> None: ...
 
 
+class EventSourceProtocol(Protocol):
+    @property
+    def name(self) -> str: ...
+
+    def start(self) -> None: ...
+
+    async def stop(self) -> None: ...
+
+    def get_status(self) -> dict[str, Any]: ...
+
+
 @dataclass
 class SmythHandler:
     name: str
@@ -107,7 +258,18 @@ class SmythHandler:
     timeout: float | None = None
     log_level: str = "INFO"
     concurrency: int = 1
+    reserved_concurrency: int | None = None
     env_overrides: Environ | None = None
+    method: str | None = None
+    route_key: str | None = None
+    binary_media_types: list[str] = field(
+        default_factory=lambda: list(DEFAULT_BINARY_MEDIA_TYPES)
+    )
+    minimum_compression_size: int | None = None
+    # How the runners are driven, Smyth's queues or the Lambda Runtime API
+    transport: str = "queue"
+    # The runtime command of the `runtime_api` transport
+    bootstrap: list[str] | None = None
 
     def _get_env_value(self, key: str, default: str) -> str:
         """
@@ -0,0 +1,124 @@
+import pytest
+
+from smyth.runner import codec as codec_module
+from smyth.runner.codec import (
+    COMPRESSED,
+    UNCOMPRESSED,
+    JSONCodec,
+    MessageCodec,
+    MsgpackCodec,
+    PickleCodec,
+    get_codec,
+)
+from smyth.types import (
+    LambdaErrorResponse,
+    RunnerErrorMessage,
+    RunnerInputMessage,
+    RunnerResponseMessage,
+    RunnerStatusMessage,
+    RunnerStreamChunkMessage,
+    SmythHandlerState,
+)
+
+requires_msgpack = pytest.mark.skipif(
+    codec_module.msgpack is None, reason="msgpack is not installed"
+)
+
+CODECS = [
+    PickleCodec,
+    JSONCodec,
+    pytest.param(MsgpackCodec, marks=requires_msgpack),
+]
+
+OUTPUT_MESSAGES = [
+    RunnerStatusMessage(type="smyth.lambda.status", status=SmythHandlerState.WARM),
+    RunnerResponseMessage(
+        type="smyth.lambda.response",
+        response={"statusCode": 200, "body": b"\x00\xff", "items": [1, "a", None]},
+    ),
+    RunnerErrorMessage(
+        type="smyth.lambda.error",
+        error=LambdaErrorResponse(type="ValueError", message="boom", stacktrace=""),
+    ),
+    RunnerStreamChunkMessage(type="smyth.lambda.stream.chunk", chunk=b"chunk"),
+]
+
+
+@pytest.mark.parametrize("codec_class", CODECS)
+def test_input_round_trip(codec_class):
+    codec = codec_class()
+    message = RunnerInputMessage(
+        type="smyth.lambda.invoke",
+        event={"body": "Hello", "nested": {"list": [1, 2.5, True]}},
+        context={"aws_request_id": "1", "smyth": {"process": {"state": "warm"}}},
+    )
+
+    decoded = codec.decode_input(codec.encode(message))
+
+    assert decoded == message
+
+
+@pytest.mark.parametrize("codec_class", CODECS)
+@pytest.mark.parametrize("message", OUTPUT_MESSAGES)
+def test_output_round_trip(codec_class, message):
+    codec = codec_class()
+
+    decoded = codec.decode_output(codec.encode(message))
+
+    assert type(decoded) is type(message)
+    assert decoded == message
+
+
+@pytest.mark.parametrize("codec_class", CODECS)
+def test_compression_threshold(codec_class):
+    codec = codec_class(compression_threshold=500)
+    small = RunnerInputMessage(type="smyth.stop")
+    large = RunnerInputMessage(type="smyth.lambda.invoke", event={"body": "a" * 1000})
+
+    assert codec.encode(small)[:1] == UNCOMPRESSED
+    encoded = codec.encode(large)
+    assert encoded[:1] == COMPRESSED
+    assert len(encoded) < 1000
+    assert codec.decode_input(encoded) == large
+
+
+def test_json_codec_without_orjson(mocker):
+    mocker.patch.object(codec_module, "orjson", None)
+    codec = JSONCodec()
+    message = RunnerStreamChunkMessage(type="smyth.lambda.stream.chunk", chunk=b"a")
+
+    assert codec.decode_output(codec.encode(message)) == message
+
+
+def test_json_codec_unserializable():
+    with pytest.raises(TypeError):
+        JSONCodec().encode(
+            RunnerResponseMessage(type="smyth.lambda.response", response=object())
+        )
+
+
+def test_msgpack_codec_not_installed(mocker):
+    mocker.patch.object(codec_module, "msgpack", None)
+
+    with pytest.raises(ValueError, match="msgpack"):
+        MsgpackCodec()
+
+
+def test_incomplete_codec():
+    class IncompleteCodec(MessageCodec):
+        def dumps(self, message):
+            return b""
+
+    with pytest.raises(TypeError):
+        IncompleteCodec()
+
+
+def test_get_codec():
+    codec = get_codec("json", compression_threshold=1024)
+
+    assert isinstance(codec, JSONCodec)
+    assert codec.compression_threshold == 1024
+    assert isinstance(get_codec("pickle"), PickleCodec)
+
+    with pytest.raises(ValueError, match="Unknown runner codec"):
+        get_codec("xml")
@@ -65,3 +65,14 @@ def test_fake_lambda_context_with_params(
     assert context.log_stream_name == (
         f"2024/12/20/[{expected_version}]smyth_aws_lambda_log_stream_name"
     )
+
+
+def test_fake_lambda_context_invocation(freezer: FrozenDateTimeFactory):
+    freezer.move_to("2024-12-20 00:00:00")
+    context = FakeLambdaContext(
+        timeout=60, aws_request_id="request-id", deadline_ms=1734652802500
+    )
+    assert context.aws_request_id == "request-id"
+    assert context.get_remaining_time_in_millis() == 2500
+    freezer.tick(5)
+    assert context.get_remaining_time_in_millis() == 0
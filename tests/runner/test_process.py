@@ -1,12 +1,38 @@
+import json
+import os
+import subprocess
+import sys
+from decimal import Decimal
+from multiprocessing import forkserver
 from queue import Empty
 
 import pytest
+from pydantic import BaseModel
 
-from smyth.exceptions import LambdaHandlerLoadError, LambdaTimeoutError
+from smyth.exceptions import (
+    LambdaHandlerLoadError,
+    LambdaInvocationError,
+    LambdaTimeoutError,
+)
+from smyth.runner.codec import JSONCodec
 from smyth.runner.fake_context import FakeLambdaContext
-from smyth.runner.process import RunnerProcess
+from smyth.runner.process import (
+    ForkServerRunnerProcess,
+    RunnerClient,
+    RunnerProcess,
+    configure_start_method,
+)
 from smyth.types import (
+    LambdaErrorResponse,
+    LambdaStreamingResponse,
+    RunnerErrorMessage,
     RunnerInputMessage,
+    RunnerModulesMessage,
+    RunnerResponseMessage,
+    RunnerStatusMessage,
+    RunnerStreamChunkMessage,
+    RunnerStreamEndMessage,
+    RunnerStreamStartMessage,
     SmythHandlerState,
 )
 
@@ -44,11 +70,367 @@ def test_stop_process(runner_process):
     assert runner_process.is_alive() is False
 
 
+def test_wait_ready(runner_process):
+    assert runner_process.wait_ready(0) is False
+
+    runner_process.start()
+    try:
+        assert runner_process.wait_ready(10) is True
+        assert runner_process.state == SmythHandlerState.COLD
+    finally:
+        runner_process.stop()
+
+
+def test_incomplete_runner_client():
+    class IncompleteRunnerClient(RunnerClient):
+        def put_input(self, data):
+            pass
+
+    with pytest.raises(TypeError):
+        IncompleteRunnerClient()
+
+
+def test_send_with_codec():
+    runner_process = RunnerProcess(
+        "test_process", "tests.conftest.example_handler", codec=JSONCodec()
+    )
+    runner_process.start()
+    try:
+        response = runner_process.send(
+            RunnerInputMessage(type="smyth.lambda.invoke", event={}, context={})
+        )
+    finally:
+        runner_process.stop()
+
+    assert response == {"statusCode": 200, "body": "Hello, World!"}
+
+
+def test_configure_start_method(mocker, caplog):
+    mock_get_context = mocker.patch("smyth.runner.process.get_context")
+
+    configure_start_method("spawn")
+    mock_get_context.assert_not_called()
+
+    configure_start_method("forkserver", ["json", "not_a_module.client"])
+    mock_get_context.return_value.set_forkserver_preload.assert_called_once_with(
+        ["smyth.runner.process", "json", "not_a_module.client"]
+    )
+    assert "Can't preload not_a_module.client" in caplog.text
+
+    with pytest.raises(ValueError, match="Unknown runner start method"):
+        configure_start_method("fork")
+    with pytest.raises(ValueError, match="needs the forkserver"):
+        configure_start_method("spawn", ["json"])
+
+
+def preload_handler(event, context):
+    # Nothing else imports `colorsys`, only the forkserver
+    return {"preloaded": "colorsys" in sys.modules, "parent": os.getppid()}
+
+
+def decimal_handler(event, context):
+    if event.get("decimal"):
+        return {"price": Decimal("9.99")}
+    return {"ok": True}
+
+
+def test_send_unserializable_response():
+    runner_process = RunnerProcess(
+        "test_process",
+        "tests.runner.test_process.decimal_handler",
+        codec=JSONCodec(),
+    )
+    runner_process.start()
+    try:
+        with pytest.raises(LambdaInvocationError, match="Unable to marshal"):
+            runner_process.send(
+                RunnerInputMessage(
+                    type="smyth.lambda.invoke", event={"decimal": True}, context={}
+                )
+            )
+        # the runner is still alive
+        response = runner_process.send(
+            RunnerInputMessage(type="smyth.lambda.invoke", event={}, context={})
+        )
+    finally:
+        runner_process.stop()
+
+    assert response == {"ok": True}
+
+
+@pytest.fixture
+def reset_forkserver():
+    yield
+    # The forkserver and its preloaded modules outlive the runners
+    forkserver._forkserver._stop()
+    forkserver.set_forkserver_preload(["__main__"])
+
+
+def test_send_with_forkserver(reset_forkserver):
+    configure_start_method("forkserver", ["colorsys"])
+    runner_process = ForkServerRunnerProcess(
+        "test_process", "tests.runner.test_process.preload_handler"
+    )
+    runner_process.start()
+    try:
+        response = runner_process.send(
+            RunnerInputMessage(type="smyth.lambda.invoke", event={}, context={})
+        )
+    finally:
+        runner_process.stop()
+
+    assert response["preloaded"] is True
+    assert response["parent"] != os.getpid()
+
+
 @pytest.mark.skip(reason="This needs more thought")
 def test_send_process(runner_process):
     pass
 
 
+@pytest.fixture
+def mock_output_queue(mocker, runner_process):
+    mocker.patch.object(runner_process, "input_queue", autospec=True)
+    mocker.patch.object(runner_process, "is_alive", return_value=True)
+    return mocker.patch.object(runner_process, "output_queue", autospec=True)
+
+
+def encode_messages(runner_process, messages):
+    return [
+        runner_process.codec.encode(message)
+        if isinstance(message, BaseModel)
+        else message
+        for message in messages
+    ]
+
+
+def chunk_message(chunk):
+    return RunnerStreamChunkMessage(type="smyth.lambda.stream.chunk", chunk=chunk)
+
+
+def test_send_response(runner_process, mock_output_queue):
+    mock_output_queue.get.side_effect = encode_messages(
+        runner_process,
+        [
+            RunnerStatusMessage(
+                type="smyth.lambda.status", status=SmythHandlerState.WORKING
+            ),
+            Empty,
+            RunnerResponseMessage(type="smyth.lambda.response", response={"a": 1}),
+        ],
+    )
+
+    assert runner_process.send(RunnerInputMessage(type="smyth.lambda.invoke")) == {
+        "a": 1
+    }
+    assert runner_process.state == SmythHandlerState.WARM
+
+
+def test_send_emits_events(mocker, runner_process, mock_output_queue):
+    mock_output_queue.get.side_effect = encode_messages(
+        runner_process,
+        [
+            RunnerResponseMessage(type="smyth.lambda.response", response={"a": 1}),
+            RunnerErrorMessage(
+                type="smyth.lambda.error",
+                error=LambdaErrorResponse(type="Error", message="", stacktrace=""),
+            ),
+        ],
+    )
+    runner_process.on_event = mocker.Mock()
+
+    runner_process.send(
+        RunnerInputMessage(
+            type="smyth.lambda.invoke", context={"aws_request_id": "request-1"}
+        )
+    )
+    with pytest.raises(LambdaInvocationError):
+        runner_process.send(RunnerInputMessage(type="smyth.lambda.invoke"))
+
+    events = [
+        (call.args[0], call.kwargs) for call in runner_process.on_event.call_args_list
+    ]
+    assert [event_type for event_type, _ in events] == [
+        "runner.state",
+        "invocation.start",
+        "runner.state",
+        "invocation.end",
+        "runner.state",
+        "invocation.start",
+        "runner.state",
+        "invocation.end",
+    ]
+    assert events[0][1] == {
+        "runner": "test_process",
+        "state": "working",
+        "previous": "cold",
+    }
+    assert events[1][1] == {
+        "runner": "test_process",
+        "request_id": "request-1",
+        "cold_start": True,
+    }
+    assert events[3][1]["outcome"] == "response"
+    assert events[3][1]["duration_ms"] >= 0
+    assert events[5][1]["cold_start"] is False
+    assert events[7][1]["outcome"] == "error"
+
+
+def test_send_stream_emits_end_event(mocker, runner_process, mock_output_queue):
+    mock_output_queue.get.side_effect = encode_messages(
+        runner_process,
+        [
+            RunnerStreamStartMessage(
+                type="smyth.lambda.stream.start", status_code=200, headers={}
+            ),
+            chunk_message(b"a"),
+            RunnerStreamEndMessage(type="smyth.lambda.stream.end"),
+        ],
+    )
+    runner_process.on_event = mocker.Mock()
+
+    response = runner_process.send(RunnerInputMessage(type="smyth.lambda.invoke"))
+    assert "invocation.end" not in [
+        call.args[0] for call in runner_process.on_event.call_args_list
+    ]
+    assert response.read() == b"a"
+
+    runner_process.on_event.assert_called_with(
+        "invocation.end",
+        runner="test_process",
+        outcome="stream",
+        duration_ms=mocker.ANY,
+    )
+
+
+def test_send_module_files(runner_process, mock_output_queue):
+    mock_output_queue.get.side_effect = encode_messages(
+        runner_process,
+        [
+            RunnerModulesMessage(
+                type="smyth.lambda.modules", files=["/app/handler.py"]
+            ),
+            RunnerResponseMessage(type="smyth.lambda.response", response={"a": 1}),
+        ],
+    )
+
+    assert runner_process.send(RunnerInputMessage(type="smyth.lambda.invoke")) == {
+        "a": 1
+    }
+    assert runner_process.module_files == {"/app/handler.py"}
+
+
+def test_get_module_files():
+    files = RunnerProcess.get_module_files__()
+
+    assert __file__ in files
+    assert json.__file__ not in files
+    assert pytest.__file__ not in files
+
+
+def test_send_stream(runner_process, mock_output_queue):
+    mock_output_queue.get.side_effect = encode_messages(
+        runner_process,
+        [
+            RunnerStatusMessage(
+                type="smyth.lambda.status", status=SmythHandlerState.WORKING
+            ),
+            RunnerStreamStartMessage(
+                type="smyth.lambda.stream.start",
+                status_code=201,
+                headers={"content-type": "text/csv"},
+            ),
+            chunk_message(b"a,b\n"),
+            chunk_message(b"1,2\n"),
+            RunnerStreamEndMessage(type="smyth.lambda.stream.end"),
+        ],
+    )
+
+    response = runner_process.send(RunnerInputMessage(type="smyth.lambda.invoke"))
+
+    assert isinstance(response, LambdaStreamingResponse)
+    assert response.status_code == 201
+    assert response.headers == {"content-type": "text/csv"}
+    assert runner_process.state == SmythHandlerState.WORKING
+    assert list(response.chunks) == [b"a,b\n", b"1,2\n"]
+    assert runner_process.state == SmythHandlerState.WARM
+
+
+def test_send_stream_error(runner_process, mock_output_queue):
+    mock_output_queue.get.side_effect = encode_messages(
+        runner_process,
+        [
+            RunnerStreamStartMessage(type="smyth.lambda.stream.start"),
+            chunk_message(b"a,b\n"),
+            RunnerErrorMessage(
+                type="smyth.lambda.error",
+                error=LambdaErrorResponse(
+                    type="ValueError", message="boom", stacktrace=""
+                ),
+            ),
+        ],
+    )
+
+    response = runner_process.send(RunnerInputMessage(type="smyth.lambda.invoke"))
+
+    with pytest.raises(LambdaInvocationError):
+        list(response.chunks)
+    assert runner_process.state == SmythHandlerState.WARM
+
+
+def test_send_stream_closed_early(runner_process, mock_output_queue):
+    mock_output_queue.get.side_effect = encode_messages(
+        runner_process,
+        [
+            RunnerStreamStartMessage(type="smyth.lambda.stream.start"),
+            chunk_message(b"1"),
+            chunk_message(b"2"),
+            chunk_message(b"3"),
+            RunnerStreamEndMessage(type="smyth.lambda.stream.end"),
+        ],
+    )
+
+    response = runner_process.send(RunnerInputMessage(type="smyth.lambda.invoke"))
+    assert next(response.chunks) == b"1"
+    response.chunks.close()
+
+    # the rest of the stream is consumed so it doesn't leak into the next invocation
+    assert mock_output_queue.get.call_count == 5
+    assert runner_process.state == SmythHandlerState.WARM
+
+
+def test_get_stream():
+    def generator():
+        yield "chunk"
+
+    chunks = generator()
+    assert RunnerProcess.get_stream__({"statusCode": 200, "body": "a"}) is None
+    assert RunnerProcess.get_stream__(chunks) == (200, {}, chunks)
+    assert RunnerProcess.get_stream__(
+        {"statusCode": 201, "headers": {"a": "b"}, "body": chunks}
+    ) == (201, {"a": "b"}, chunks)
+
+
+def test_stream_response(mocker, runner_process):
+    mock_output_queue = mocker.patch.object(
+        runner_process, "output_queue", autospec=True
+    )
+
+    runner_process.stream_response__(201, {"a": "b"}, iter(["a", b"", b"b"]))
+
+    assert [
+        runner_process.codec.decode_output(call.args[0])
+        for call in mock_output_queue.put.call_args_list
+    ] == [
+        RunnerStreamStartMessage(
+            type="smyth.lambda.stream.start", status_code=201, headers={"a": "b"}
+        ),
+        chunk_message(b"a"),
+        chunk_message(b"b"),
+        RunnerStreamEndMessage(type="smyth.lambda.stream.end"),
+    ]
+
+
 def test_run(mocker, mock_setproctitle, mock_logging_dictconfig, runner_process):
     mock_lambda_invoker__ = mocker.patch.object(
         runner_process, "lambda_invoker__", autospec=True
@@ -58,20 +440,53 @@ def test_run(mocker, mock_setproctitle, mock_logging_dictconfig, runner_process)
     )
     runner_process.run()
     mock_setproctitle.assert_called_once_with(f"smyth:{runner_process.name}")
+    mock_get_logging_config.assert_called_once_with(
+        runner_process.log_level, deferred=False
+    )
     mock_logging_dictconfig.assert_called_once_with(
         mock_get_logging_config.return_value
     )
     mock_lambda_invoker__.assert_called_once()
 
 
+# Runner processes import `smyth.runner.process` and configure logging before
+# they import the handler, the server's dependencies would slow down every
+# cold start
+RUNNER_EXCLUDED_PACKAGES = {"anyio", "asgiref", "rich", "starlette", "uvicorn"}
+RUNNER_IMPORTS = """
+import json, logging.config, sys
+import smyth.runner.process
+from smyth.utils import get_logging_config
+
+logging.config.dictConfig(get_logging_config("INFO", deferred=True))
+logging.getLogger("smyth").debug("Not logged")
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def test_runner_import_budget():
+    output = subprocess.run(
+        [sys.executable, "-c", RUNNER_IMPORTS],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+
+    packages = {module.split(".")[0] for module in json.loads(output)}
+    assert packages & RUNNER_EXCLUDED_PACKAGES == set()
+
+
 def test_get_message(mocker, runner_process):
     mock_input_queue = mocker.patch.object(runner_process, "input_queue", autospec=True)
-    mock_input_queue.get.side_effect = [
-        RunnerInputMessage(type="smyth.lambda.invoke", event={}, context={}),
-        Empty,
-        RunnerInputMessage(type="smyth.lambda.invoke", event={}, context={}),
-        RunnerInputMessage(type="smyth.stop"),
-    ]
+    mock_input_queue.get.side_effect = encode_messages(
+        runner_process,
+        [
+            RunnerInputMessage(type="smyth.lambda.invoke", event={}, context={}),
+            Empty,
+            RunnerInputMessage(type="smyth.lambda.invoke", event={}, context={}),
+            RunnerInputMessage(type="smyth.stop"),
+        ],
+    )
 
     messages = list(runner_process.get_message__())
 
@@ -105,6 +520,30 @@ def test_get_context(mocker, runner_process):
     )
 
 
+def test_get_context_merges_static_context():
+    runner_process = RunnerProcess(
+        "test_process",
+        "tests.conftest.example_handler",
+        static_context={"timeout": 30, "smyth": {"handler": {"name": "test"}}},
+    )
+    context = runner_process.get_context__(
+        RunnerInputMessage(
+            type="smyth.lambda.invoke",
+            event={},
+            context={
+                "aws_request_id": "request-id",
+                "smyth": {"process": {"name": "test_process"}},
+            },
+        )
+    )
+    assert context._timeout == 30
+    assert context.aws_request_id == "request-id"
+    assert context.smyth == {  # type: ignore[attr-defined]
+        "handler": {"name": "test"},
+        "process": {"name": "test_process"},
+    }
+
+
 def test_import_handler(mocker, runner_process):
     mock_import_attribute = mocker.patch(
         "smyth.runner.process.import_attribute", autospec=True
@@ -177,9 +616,14 @@ def test_lambda_invoker(mocker, runner_process):
     mock_set_status__ = mocker.patch.object(
         runner_process, "set_status__", autospec=True
     )
+    mock_report_modules__ = mocker.patch.object(
+        runner_process, "report_modules__", autospec=True
+    )
 
     runner_process.lambda_invoker__()
     assert mock_import_attribute.call_count == 1
+    # Reported with the first invocation, again only if modules were imported
+    assert mock_report_modules__.call_count >= 1
 
     mock_set_status__.assert_has_calls(
         [
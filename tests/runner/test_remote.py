@@ -0,0 +1,55 @@
+import socket
+
+import pytest
+
+from smyth.exceptions import SubprocessError
+from smyth.runner.remote import RemoteRunnerProcess, read_frame, write_frame
+from smyth.types import RunnerInputMessage, SmythHandlerState
+
+
+@pytest.fixture
+def socket_pair():
+    left, right = socket.socketpair()
+    yield left, right
+    left.close()
+    right.close()
+
+
+def test_frames(socket_pair):
+    left, right = socket_pair
+
+    write_frame(left, b"first")
+    write_frame(left, b"")
+    write_frame(left, b"x" * 100_000)
+    left.close()
+
+    assert read_frame(right) == b"first"
+    assert read_frame(right) == b""
+    assert read_frame(right) == b"x" * 100_000
+    assert read_frame(right) is None
+
+
+def test_remote_runner_process(socket_pair):
+    left, right = socket_pair
+    process = RemoteRunnerProcess("test_handler:0", "test_handler", "unused")
+    process.connection = left
+    assert process.state == SmythHandlerState.COLD
+    assert process.is_alive()
+
+    process.put_input(RunnerInputMessage(type="smyth.lambda.invoke", event={"a": 1}))
+
+    assert process.codec.decode_input(read_frame(right)).event == {"a": 1}
+
+    right.close()
+    with pytest.raises(SubprocessError):
+        process.receive()
+    assert not process.is_alive()
+
+
+def test_remote_runner_process_not_connected():
+    process = RemoteRunnerProcess("test_handler:0", "test_handler", "unused")
+
+    with pytest.raises(SubprocessError):
+        process.put_input(RunnerInputMessage(type="smyth.lambda.invoke"))
+    with pytest.raises(SubprocessError):
+        process.receive()
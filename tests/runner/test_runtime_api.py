@@ -0,0 +1,244 @@
+import io
+import json
+import sys
+import urllib.request
+from time import time
+from urllib.error import HTTPError
+
+import pytest
+
+from smyth.exceptions import LambdaInvocationError, LambdaTimeoutError, SubprocessError
+from smyth.runner.runtime_api import (
+    RuntimeAPIRunnerProcess,
+    get_default_command,
+    get_error_response,
+    read_chunked,
+)
+from smyth.types import RunnerInputMessage, SmythHandlerState
+
+# A minimal custom runtime, polls for invocations and echoes them
+BOOTSTRAP = """
+import json, os, time, urllib.request
+
+api = "http://" + os.environ["AWS_LAMBDA_RUNTIME_API"] + "/2018-06-01/runtime"
+while True:
+    with urllib.request.urlopen(api + "/invocation/next") as response:
+        request_id = response.headers["Lambda-Runtime-Aws-Request-Id"]
+        deadline_ms = response.headers["Lambda-Runtime-Deadline-Ms"]
+        event = json.load(response)
+    time.sleep(event.get("sleep", 0))
+    if event.get("fail"):
+        action = "error"
+        body = {"errorMessage": "failed", "errorType": "ValueError"}
+    else:
+        action = "response"
+        body = {
+            "event": event,
+            "request_id": request_id,
+            "deadline_ms": deadline_ms,
+            "handler": os.environ["_HANDLER"],
+        }
+    request = urllib.request.Request(
+        api + "/invocation/" + request_id + "/" + action,
+        data=json.dumps(body).encode(),
+        method="POST",
+    )
+    urllib.request.urlopen(request).close()
+"""
+
+
+@pytest.fixture
+def runner():
+    runner = RuntimeAPIRunnerProcess(
+        name="test_handler:0",
+        lambda_handler_path="tests.conftest.example_handler",
+        command=[sys.executable, "-c", BOOTSTRAP],
+        static_context={"timeout": 5},
+    )
+    runner.start()
+    yield runner
+    runner.stop()
+
+
+@pytest.fixture
+def server_only(mocker):
+    """A runner serving the Runtime API without a runtime, the tests play it."""
+    mocker.patch.object(RuntimeAPIRunnerProcess, "spawn")
+    runner = RuntimeAPIRunnerProcess(
+        name="test_handler:0", lambda_handler_path="tests.conftest.example_handler"
+    )
+    runner.start()
+    yield runner
+    runner.stop()
+
+
+def post(runner, path, data):
+    request = urllib.request.Request(
+        f"http://{runner.server.address}/2018-06-01/runtime/{path}",
+        data=json.dumps(data).encode(),
+        method="POST",
+    )
+    with urllib.request.urlopen(request) as response:
+        return response.status, json.load(response)
+
+
+def invoke(event, request_id="request-id", deadline_ms=None):
+    context = {"aws_request_id": request_id}
+    if deadline_ms is not None:
+        context["deadline_ms"] = deadline_ms
+    return RunnerInputMessage(type="smyth.lambda.invoke", event=event, context=context)
+
+
+def test_get_default_command():
+    assert get_default_command("app.handler") == [
+        sys.executable,
+        "-m",
+        "awslambdaric",
+        "app.handler",
+    ]
+
+
+def test_runtime_api_runner(runner):
+    deadline_ms = int((time() + 5) * 1000)
+
+    response = runner.send(invoke({"a": 1}, deadline_ms=deadline_ms))
+
+    assert response == {
+        "event": {"a": 1},
+        "request_id": "request-id",
+        "deadline_ms": str(deadline_ms),
+        "handler": "tests.conftest.example_handler",
+    }
+    assert runner.state == SmythHandlerState.WARM
+    assert runner.send(invoke({"b": 2}, "other-id"))["request_id"] == "other-id"
+
+
+def test_runtime_api_runner_error(runner):
+    with pytest.raises(LambdaInvocationError, match="failed"):
+        runner.send(invoke({"fail": True}))
+
+    assert runner.send(invoke({}))["event"] == {}
+
+
+def test_runtime_api_runner_timeout(runner, mocker):
+    mocker.patch("smyth.runner.runtime_api.TIMEOUT_GRACE", 0)
+
+    with pytest.raises(LambdaTimeoutError):
+        runner.send(invoke({"sleep": 10}, deadline_ms=int((time() + 0.2) * 1000)))
+
+    assert not runner.is_alive()
+    # The next invocation starts the runtime again
+    assert runner.send(invoke({"a": 1}))["event"] == {"a": 1}
+
+
+def test_runtime_api_runner_idle_runtime_killed(runner):
+    runner.send(invoke({}))
+    # Killed while it polls for the next invocation
+    runner.ready.clear()
+    assert runner.wait_ready(5)
+    runner.runtime.kill()
+    runner.runtime.wait()
+
+    started = time()
+    assert runner.send(invoke({"a": 1}))["event"] == {"a": 1}
+    assert time() - started < 2
+
+
+def test_runtime_api_runner_dead_runtime():
+    runner = RuntimeAPIRunnerProcess(
+        name="test_handler:0",
+        lambda_handler_path="tests.conftest.example_handler",
+        command=[sys.executable, "-c", "raise SystemExit(3)"],
+    )
+    events = []
+    runner.on_event = lambda event_type, **data: events.append((event_type, data))
+    runner.start()
+    try:
+        with pytest.raises(SubprocessError):
+            runner.send(invoke({}))
+    finally:
+        runner.stop()
+
+    assert ("runner.death", {"runner": "test_handler:0", "exitcode": 3}) in events
+
+
+def test_runtime_api_wait_ready(runner, server_only):
+    assert runner.wait_ready(10) is True
+    # Without a runtime polling for invocations
+    assert server_only.wait_ready(0.1) is False
+
+
+def test_runtime_api_invalid_request_id(server_only):
+    with pytest.raises(HTTPError) as error:
+        post(server_only, "invocation/unknown/response", {})
+
+    assert error.value.code == 400
+    assert json.load(error.value)["errorType"] == "InvalidRequestID"
+
+
+def test_runtime_api_next_invocation(server_only):
+    server_only.put_input(invoke({"a": 1}, deadline_ms=1234))
+
+    with urllib.request.urlopen(
+        f"http://{server_only.server.address}/2018-06-01/runtime/invocation/next"
+    ) as response:
+        assert json.load(response) == {"a": 1}
+        assert response.headers["Lambda-Runtime-Aws-Request-Id"] == "request-id"
+        assert response.headers["Lambda-Runtime-Deadline-Ms"] == "1234"
+        assert response.headers["Lambda-Runtime-Invoked-Function-Arn"] == (
+            "arn:aws:lambda:serverless:test_handler:0"
+        )
+        assert response.headers["Lambda-Runtime-Trace-Id"].startswith("Root=1-")
+
+    assert post(server_only, "invocation/request-id/response", [1, 2]) == (
+        202,
+        {"status": "OK"},
+    )
+    assert server_only.receive().response == [1, 2]
+    # Only one response per invocation
+    with pytest.raises(HTTPError):
+        post(server_only, "invocation/request-id/response", [1, 2])
+
+
+def test_runtime_api_init_error(server_only):
+    server_only.put_input(invoke({}))
+
+    status, _ = post(
+        server_only,
+        "init/error",
+        {"errorMessage": "No module named 'app'", "errorType": "ImportModuleError"},
+    )
+
+    assert status == 202
+    message = server_only.receive()
+    assert message.type == "smyth.lambda.error"
+    assert message.error.type == "ImportModuleError"
+    assert message.error.message == "No module named 'app'"
+
+
+def test_get_error_response():
+    error = get_error_response(
+        json.dumps(
+            {
+                "errorMessage": "boom",
+                "errorType": "ValueError",
+                "stackTrace": ["  File a.py\n", "  File b.py\n"],
+            }
+        ).encode(),
+        None,
+    )
+    assert error.type == "ValueError"
+    assert error.message == "boom"
+    assert error.stacktrace == "  File a.py\n  File b.py\n"
+
+    error = get_error_response(b"not json", "Runtime.Crash")
+    assert error.type == "Runtime.Crash"
+    assert error.message == "not json"
+
+
+def test_read_chunked(mocker):
+    request = mocker.Mock(
+        rfile=io.BytesIO(b"5\r\nhello\r\n6;ext=1\r\n world\r\n0\r\n\r\n")
+    )
+
+    assert read_chunked(request) == b"hello world"
@@ -5,13 +5,28 @@ from smyth.runner.strategy import first_warm, round_robin
 from smyth.types import SmythHandlerState
 
 
-def test_round_robin():
-    strat = round_robin("test_handler", {"test_handler": [1, 2, 3]})
-    assert next(strat) == 1
-    assert next(strat) == 2
-    assert next(strat) == 3
-    assert next(strat) == 1
-    assert next(strat) == 2
+def test_round_robin(mocker):
+    first, second, third = (mocker.Mock(state=SmythHandlerState.WARM) for _ in range(3))
+    strat = round_robin("test_handler", {"test_handler": [first, second, third]})
+    assert next(strat) == first
+    assert next(strat) == second
+    assert next(strat) == third
+    assert next(strat) == first
+    assert next(strat) == second
+
+
+def test_round_robin_skips_working(mocker):
+    first, second, third = (mocker.Mock(state=SmythHandlerState.WARM) for _ in range(3))
+    second.state = SmythHandlerState.WORKING
+    strat = round_robin("test_handler", {"test_handler": [first, second, third]})
+    assert next(strat) == first
+    assert next(strat) == third
+    assert next(strat) == first
+
+    for process in (first, second, third):
+        process.state = SmythHandlerState.WORKING
+    with pytest.raises(NoAvailableProcessError):
+        next(strat)
 
 
 def test_first_warm(mocker):
@@ -1,15 +1,36 @@
+import asyncio
+import os
+import signal
+from copy import deepcopy
+
 import pytest
 from starlette.routing import Route
 
+from smyth.config import (
+    AsyncInvocationConfig,
+    HandlerChanges,
+    HandlerConfig,
+    SQSEventSourceConfig,
+)
 from smyth.context import generate_context_data
 from smyth.event import generate_api_gw_v2_event_data
+from smyth.exceptions import ConfigReloadError
+from smyth.reload import HandlerReloader
+from smyth.runner.remote import RUNNER_POOL_ENVIRON
 from smyth.runner.strategy import first_warm
+from smyth.schedule import ScheduledEventSource
 from smyth.server.app import SmythStarlette, create_app, lifespan
 from smyth.server.endpoints import (
+    batch_invocation_endpoint,
+    config_reload_endpoint,
+    events_endpoint,
     invocation_endpoint,
     lambda_invoker_endpoint,
+    sqs_endpoint,
     status_endpoint,
 )
+from smyth.sqs import SQSEventSource
+from smyth.types import DEFAULT_BINARY_MEDIA_TYPES
 
 pytestmark = pytest.mark.anyio
 
@@ -39,6 +60,12 @@ def test_create_app(mocker, mock_get_config):
                 concurrency=1,
                 strategy_generator=first_warm,
                 env_overrides={"TEST_ENV": "child", "ROOT_ENV": "root"},
+                reserved_concurrency=None,
+                binary_media_types=DEFAULT_BINARY_MEDIA_TYPES,
+                minimum_compression_size=None,
+                transport="queue",
+                bootstrap=None,
+                response_cache=None,
             ),
             mocker.call(
                 name="product_handler",
@@ -51,11 +78,99 @@ def test_create_app(mocker, mock_get_config):
                 concurrency=1,
                 strategy_generator=first_warm,
                 env_overrides={"TEST_ENV": "root", "ROOT_ENV": "root"},
+                reserved_concurrency=None,
+                binary_media_types=DEFAULT_BINARY_MEDIA_TYPES,
+                minimum_compression_size=None,
+                transport="queue",
+                bootstrap=None,
+                response_cache=None,
             ),
         ]
     )
 
 
+def test_create_app_event_sources(mocker, config):
+    config.handlers["order_handler"].sqs = SQSEventSourceConfig(
+        queue_name="orders", batch_size=5
+    )
+    mocker.patch("smyth.server.app.get_config", return_value=config)
+
+    app = create_app()
+
+    (event_source,) = [
+        event_source
+        for event_source in app.event_sources
+        if isinstance(event_source, SQSEventSource)
+    ]
+    assert event_source.name == "sqs:orders:order_handler"
+    assert event_source.batch_size == 5
+    assert event_source.queue is app.sqs_queue
+
+
+def test_create_app_scheduled_event_sources(mocker, config):
+    config.handlers["order_handler"].schedule = "rate(5 minutes)"
+    config.handlers["order_handler"].schedule_overlap = "queue"
+    mocker.patch("smyth.server.app.get_config", return_value=config)
+
+    app = create_app()
+
+    (event_source,) = [
+        event_source
+        for event_source in app.event_sources
+        if isinstance(event_source, ScheduledEventSource)
+    ]
+    assert event_source.name == "schedule:order_handler"
+    assert event_source.overlap == "queue"
+
+
+def test_create_app_hot_reload(mocker, config):
+    config.hot_reload = True
+    config.hot_reload_interval = 0.5
+    mocker.patch("smyth.server.app.get_config", return_value=config)
+
+    app = create_app()
+
+    (event_source,) = [
+        event_source
+        for event_source in app.event_sources
+        if isinstance(event_source, HandlerReloader)
+    ]
+    assert event_source.smyth is app.smyth
+    assert event_source.interval == 0.5
+
+
+def test_create_app_runner_pool(mocker, config):
+    config.handlers["order_handler"].schedule = "rate(5 minutes)"
+    config.hot_reload = True
+    mocker.patch("smyth.server.app.get_config", return_value=config)
+    mocker.patch.dict("os.environ", {RUNNER_POOL_ENVIRON: "/tmp/runners.sock"})
+
+    app = create_app()
+
+    assert app.smyth.runner_pool_path == "/tmp/runners.sock"
+    # the runner pool runs the schedules and the reloader
+    assert not [
+        event_source
+        for event_source in app.event_sources
+        if isinstance(event_source, ScheduledEventSource | HandlerReloader)
+    ]
+
+
+def test_create_app_async_invocations(mocker, config):
+    config.handlers["order_handler"].async_invocation = AsyncInvocationConfig(
+        maximum_retry_attempts=1, on_failure="sqs:failures"
+    )
+    mocker.patch("smyth.server.app.get_config", return_value=config)
+
+    app = create_app()
+
+    assert set(app.async_invocations) == set(config.handlers)
+    async_invocation_queue = app.async_invocations["order_handler"]
+    assert async_invocation_queue.maximum_retry_attempts == 1
+    assert async_invocation_queue.sqs_queue is app.sqs_queue
+    assert async_invocation_queue in app.event_sources
+
+
 def test_smyth_starlette(mocker):
     mock_smyth = mocker.Mock()
 
@@ -64,6 +179,14 @@ def test_smyth_starlette(mocker):
     assert app.smyth == mock_smyth
     assert app.routes == [
         Route("/smyth/api/status", status_endpoint, methods=["GET", "HEAD"]),
+        Route("/smyth/api/events", events_endpoint, methods=["GET", "HEAD"]),
+        Route("/smyth/api/config/reload", config_reload_endpoint, methods=["POST"]),
+        Route("/smyth/sqs{path:path}", sqs_endpoint, methods=["POST"]),
+        Route(
+            "/smyth/api/functions/{function:str}/invocations",
+            batch_invocation_endpoint,
+            methods=["POST"],
+        ),
         Route(
             "/2015-03-31/functions/{function:str}/invocations",
             invocation_endpoint,
@@ -72,17 +195,21 @@ def test_smyth_starlette(mocker):
         Route(
             "/{path:path}",
             lambda_invoker_endpoint,
-            methods=["DELETE", "GET", "HEAD", "POST", "PUT"],
+            methods=["DELETE", "GET", "HEAD", "OPTIONS", "PATCH", "POST", "PUT"],
         ),
     ]
 
 
 async def test_lifespan(mocker):
     mock_app = mocker.Mock()
+    mock_event_source = mocker.Mock(stop=mocker.AsyncMock())
+    mock_app.event_sources = [mock_event_source]
 
     async with lifespan(mock_app):
         mock_app.smyth.start_runners.assert_called_once_with()
+        mock_event_source.start.assert_called_once_with()
 
+    mock_event_source.stop.assert_awaited_once_with()
     mock_app.smyth.stop_runners.assert_called_once_with()
 
     mock_app = mocker.Mock()
@@ -91,3 +218,149 @@ async def test_lifespan(mocker):
     with pytest.raises(Exception):
         async with lifespan(mock_app):
             pass
+
+
+async def test_lifespan_reloads_config_on_sighup(mocker):
+    mock_app = mocker.Mock()
+    mock_app.event_sources = []
+    reloaded = asyncio.Event()
+    mock_app.request_config_reload.side_effect = reloaded.set
+
+    async with lifespan(mock_app):
+        os.kill(os.getpid(), signal.SIGHUP)
+        await asyncio.wait_for(reloaded.wait(), 1)
+
+    mock_app.request_config_reload.assert_called_once_with()
+
+
+@pytest.fixture
+def reloadable_app(mocker, config):
+    config.handlers["order_handler"].sqs = SQSEventSourceConfig(queue_name="orders")
+    mocker.patch("smyth.server.app.get_config", return_value=config)
+    app = create_app()
+    for method in ("restart_runners", "resize_runners", "remove_handler"):
+        mocker.patch.object(app.smyth, method, autospec=True)
+    return app
+
+
+async def test_reload_config(mocker, reloadable_app):
+    app = reloadable_app
+    (old_sqs_source,) = [
+        event_source
+        for event_source in app.event_sources
+        if isinstance(event_source, SQSEventSource)
+    ]
+    new_config = deepcopy(app.config)
+    new_config.handlers["order_handler"].timeout = 3
+    new_config.handlers["product_handler"].concurrency = 2
+    new_config.handlers["user_handler"] = HandlerConfig(
+        handler_path="tests.conftest.example_handler", url_path="/users"
+    )
+
+    changes = await app.reload_config(new_config)
+
+    assert changes == HandlerChanges(
+        added=["user_handler"], changed=["order_handler"], resized=["product_handler"]
+    )
+    assert app.config is new_config
+    assert app.smyth.get_handler_for_name("order_handler").timeout == 3
+    assert app.smyth.get_handler_for_name("product_handler").concurrency == 2
+    assert app.smyth.get_handler_for_request("/users").name == "user_handler"
+    app.smyth.restart_runners.assert_has_calls(
+        [
+            mocker.call("user_handler"),
+            mocker.call("order_handler"),
+        ]
+    )
+    app.smyth.resize_runners.assert_called_once_with("product_handler")
+    app.smyth.remove_handler.assert_not_called()
+
+    (new_sqs_source,) = [
+        event_source
+        for event_source in app.event_sources
+        if isinstance(event_source, SQSEventSource)
+    ]
+    assert new_sqs_source is not old_sqs_source
+    assert set(app.async_invocations) == {
+        "order_handler",
+        "product_handler",
+        "user_handler",
+    }
+    assert app.async_invocations["order_handler"] in app.event_sources
+
+    for event_source in app.event_sources:
+        await event_source.stop()
+
+
+async def test_reload_config_removed_handler(reloadable_app):
+    app = reloadable_app
+    new_config = deepcopy(app.config)
+    del new_config.handlers["order_handler"]
+
+    changes = await app.reload_config(new_config)
+
+    assert changes == HandlerChanges(removed=["order_handler"])
+    app.smyth.remove_handler.assert_called_once_with("order_handler")
+    assert "order_handler" not in app.async_invocations
+    assert not [
+        event_source
+        for event_source in app.event_sources
+        if getattr(event_source, "handler_name", None) == "order_handler"
+    ]
+
+
+@pytest.mark.parametrize(
+    "invalid",
+    [
+        {"event_data_function_path": "nope.missing"},
+        {"strategy_generator_path": "smyth.runner.strategy.missing"},
+        {"transport": "carrier_pigeon"},
+        {"url_path": "TRACE /users"},
+        {"reserved_concurrency": -1},
+    ],
+)
+async def test_reload_config_invalid_handler(reloadable_app, invalid):
+    app = reloadable_app
+    old_config = app.config
+    event_sources = list(app.event_sources)
+    new_config = deepcopy(app.config)
+    del new_config.handlers["product_handler"]
+    new_config.handlers["user_handler"] = HandlerConfig(
+        **{
+            "handler_path": "tests.conftest.example_handler",
+            "url_path": "/users",
+            **invalid,
+        }
+    )
+
+    with pytest.raises(ConfigReloadError, match="Invalid handler user_handler"):
+        await app.reload_config(new_config)
+
+    assert app.config is old_config
+    assert app.event_sources == event_sources
+    assert set(app.smyth.smyth_handlers) == set(old_config.handlers)
+    app.smyth.remove_handler.assert_not_called()
+    app.smyth.restart_runners.assert_not_called()
+
+
+async def test_reload_config_from_file(mocker, reloadable_app):
+    mock_read_config = mocker.patch(
+        "smyth.server.app.read_config", return_value=deepcopy(reloadable_app.config)
+    )
+
+    assert await reloadable_app.reload_config() == HandlerChanges()
+    mock_read_config.assert_called_once_with()
+
+    mock_read_config.side_effect = ValueError("Invalid TOML")
+    with pytest.raises(ConfigReloadError, match="Invalid TOML"):
+        await reloadable_app.reload_config()
+
+
+async def test_reload_config_not_supported(mocker, reloadable_app):
+    reloadable_app.smyth.runner_pool_path = "/tmp/runners.sock"
+    with pytest.raises(ConfigReloadError):
+        await reloadable_app.reload_config()
+
+    app = SmythStarlette(smyth=mocker.Mock(), smyth_path_prefix="/smyth")
+    with pytest.raises(ConfigReloadError):
+        await app.reload_config()
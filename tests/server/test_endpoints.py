@@ -1,10 +1,29 @@
+import json
+
 import pytest
 from starlette.testclient import TestClient
 
-from smyth.exceptions import LambdaInvocationError, LambdaTimeoutError, SubprocessError
+from smyth.cache import ResponseCache
+from smyth.config import HandlerChanges
+from smyth.exceptions import (
+    ConcurrencyLimitExceededError,
+    ConfigReloadError,
+    LambdaInvocationError,
+    LambdaTimeoutError,
+    NoAvailableProcessError,
+    ProcessDefinitionNotFoundError,
+    QueueFullError,
+    SubprocessError,
+)
+from smyth.monitor import RunnerMonitor
 from smyth.server.app import SmythStarlette
-from smyth.server.endpoints import dispatch
-from smyth.types import LambdaResponse
+from smyth.server.endpoints import dispatch, events_endpoint
+from smyth.types import (
+    InvocationResult,
+    LambdaResponse,
+    LambdaStreamingResponse,
+    SmythHandlerState,
+)
 
 pytestmark = pytest.mark.anyio
 
@@ -18,8 +37,12 @@ def mock_smyth_dispatch(mocker):
 def mock_smyth(mocker, mock_smyth_dispatch):
     smyth = mocker.Mock()
     smyth.handlers = {
-        "order_handler": mocker.Mock(name="order_handler"),
-        "product_handler": mocker.Mock(name="product_handler"),
+        "order_handler": mocker.Mock(
+            name="order_handler", minimum_compression_size=None
+        ),
+        "product_handler": mocker.Mock(
+            name="product_handler", minimum_compression_size=None
+        ),
     }
     smyth.processes = {
         "order_handler": [
@@ -31,6 +54,7 @@ def mock_smyth(mocker, mock_smyth_dispatch):
         ],
     }
     smyth.dispatch = mock_smyth_dispatch
+    smyth.response_caches = {}
     return smyth
 
 
@@ -79,6 +103,95 @@ async def test_dispatch(
     assert response.body == expected_body
 
 
+@pytest.mark.parametrize(
+    ("lambda_response", "expected_body"),
+    [
+        (LambdaResponse(body="aGVsbG8=", isBase64Encoded=True), b"hello"),
+        (LambdaResponse(body="aGVsbG8=", isBase64Encoded=False), b"aGVsbG8="),
+        (LambdaResponse(body=b"\x89PNG"), b"\x89PNG"),
+    ],
+)
+async def test_dispatch_binary(
+    mocker, mock_smyth, mock_smyth_dispatch, lambda_response, expected_body
+):
+    mock_smyth_dispatch.return_value = lambda_response
+    response = await dispatch(
+        smyth=mock_smyth,
+        smyth_handler=mock_smyth.handlers["order_handler"],
+        request=mocker.Mock(),
+    )
+    assert response.status_code == 200
+    assert response.body == expected_body
+
+
+async def test_dispatch_streaming(mocker, mock_smyth, mock_smyth_dispatch):
+    mock_smyth_dispatch.return_value = LambdaStreamingResponse(
+        chunks=iter([b"Hello, ", b"World!"]),
+        status_code=201,
+        headers={"content-type": "text/plain"},
+    )
+    response = await dispatch(
+        smyth=mock_smyth,
+        smyth_handler=mock_smyth.handlers["order_handler"],
+        request=mocker.Mock(),
+    )
+    assert response.status_code == 201
+    assert response.headers["content-type"] == "text/plain"
+    assert [chunk async for chunk in response.body_iterator] == [
+        b"Hello, ",
+        b"World!",
+    ]
+
+
+async def test_dispatch_streaming_disconnected(mocker, mock_smyth, mock_smyth_dispatch):
+    on_close = mocker.AsyncMock()
+    mock_smyth_dispatch.return_value = LambdaStreamingResponse(
+        chunks=iter([b"Hello, ", b"World!"]), on_close=on_close
+    )
+    response = await dispatch(
+        smyth=mock_smyth,
+        smyth_handler=mock_smyth.handlers["order_handler"],
+        request=mocker.Mock(),
+    )
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    await response({"type": "http"}, receive, mocker.AsyncMock())
+
+    on_close.assert_awaited_once()
+
+
+async def test_dispatch_throttled(mocker, mock_smyth, mock_smyth_dispatch):
+    mock_smyth_dispatch.side_effect = ConcurrencyLimitExceededError(
+        "Test error", reason="ReservedFunctionConcurrentInvocationLimitExceeded"
+    )
+    response = await dispatch(
+        smyth=mock_smyth,
+        smyth_handler=mock_smyth.handlers["order_handler"],
+        request=mocker.Mock(),
+    )
+    assert response.status_code == 429
+    assert response.headers["x-amzn-ErrorType"] == "TooManyRequestsException"
+    assert json.loads(response.body) == {
+        "Reason": "ReservedFunctionConcurrentInvocationLimitExceeded",
+        "Type": "User",
+        "message": "Rate Exceeded.",
+    }
+
+
+async def test_dispatch_no_available_process(mocker, mock_smyth, mock_smyth_dispatch):
+    mock_smyth_dispatch.side_effect = NoAvailableProcessError("No process available")
+    response = await dispatch(
+        smyth=mock_smyth,
+        smyth_handler=mock_smyth.handlers["order_handler"],
+        request=mocker.Mock(),
+    )
+    assert response.status_code == 429
+    assert response.headers["x-amzn-ErrorType"] == "TooManyRequestsException"
+    assert json.loads(response.body)["Reason"] == "ConcurrentInvocationLimitExceeded"
+
+
 def test_status_endpoint(test_client):
     response = test_client.get("/smyth/api/status")
     assert response.status_code == 200
@@ -105,9 +218,170 @@ def test_status_endpoint(test_client):
                 ]
             },
         },
+        "event sources": {},
     }
 
 
+async def test_events_endpoint(mocker, mock_smyth):
+    mock_smyth.monitor = RunnerMonitor()
+    request = mocker.Mock(query_params={"buffer_size": "10"})
+    request.app.smyth = mock_smyth
+    mock_smyth.processes = {
+        "order_handler": [
+            mocker.Mock(task_counter=0, state=SmythHandlerState.COLD),
+        ]
+    }
+    mock_smyth.processes["order_handler"][0].name = "order_handler:0"
+
+    response = await events_endpoint(request)
+    assert response.media_type == "text/event-stream"
+    events = response.body_iterator
+    snapshot = await events.__anext__()
+    assert snapshot.startswith("event: runner.snapshot\ndata: ")
+    assert json.loads(snapshot.split("data: ", 1)[1])["runners"]["order_handler"] == [
+        {"runner": "order_handler:0", "state": "cold", "task_counter": 0}
+    ]
+
+    mock_smyth.monitor.publish("runner.spawn", runner="order_handler:1")
+    event = await events.__anext__()
+    assert event.startswith("event: runner.spawn\n")
+    assert event.endswith("\n\n")
+    assert json.loads(event.split("data: ", 1)[1])["runner"] == "order_handler:1"
+
+    mocker.patch("smyth.server.endpoints.EVENT_STREAM_KEEPALIVE", 0.01)
+    assert await events.__anext__() == ": keepalive\n\n"
+
+    await events.aclose()
+    assert mock_smyth.monitor.subscriptions == set()
+
+
+def test_events_endpoint_bad_request(test_client):
+    response = test_client.get("/smyth/api/events?buffer_size=0")
+    assert response.status_code == 400
+
+
+def test_config_reload_endpoint(mocker, app, test_client):
+    mock_reload_config = mocker.patch.object(
+        app,
+        "reload_config",
+        return_value=HandlerChanges(added=["user_handler"], resized=["order_handler"]),
+    )
+
+    response = test_client.post("/smyth/api/config/reload")
+    assert response.status_code == 200
+    assert response.json() == {
+        "added": ["user_handler"],
+        "removed": [],
+        "changed": [],
+        "resized": ["order_handler"],
+    }
+    mock_reload_config.assert_awaited_once_with()
+
+    mock_reload_config.side_effect = ConfigReloadError("Invalid config")
+    response = test_client.post("/smyth/api/config/reload")
+    assert response.status_code == 409
+    assert response.json() == {"message": "Invalid config"}
+
+
+def test_lambda_invoker_endpoint(mocker, test_client, mock_smyth, mock_smyth_dispatch):
+    mock_smyth.resolve_route.return_value = mocker.Mock(
+        handler=mock_smyth.handlers["product_handler"],
+        path_params={"product_id": "1"},
+    )
+    mock_smyth_dispatch.return_value = LambdaResponse(
+        body="Hello, World!",
+        status_code=200,
+        headers={},
+    )
+    response = test_client.get("/products/1")
+
+    assert response.status_code == 200
+    mock_smyth.resolve_route.assert_called_once_with("/products/1", "GET")
+    handler, request = mock_smyth_dispatch.await_args[0]
+    assert handler == mock_smyth.handlers["product_handler"]
+    assert request.path_params == {"product_id": "1"}
+
+
+def test_lambda_invoker_endpoint_body(
+    mocker, test_client, mock_smyth, mock_smyth_dispatch
+):
+    mock_smyth.resolve_route.return_value = mocker.Mock(
+        handler=mock_smyth.handlers["product_handler"], path_params={}
+    )
+    bodies = []
+
+    async def dispatch(handler, request, event_data_function=None):
+        # The body was read before the dispatch, event functions read it again
+        bodies.append(await request.body())
+        return LambdaResponse(body="", status_code=200, headers={})
+
+    mock_smyth_dispatch.side_effect = dispatch
+
+    response = test_client.post("/products", content=iter([b"Hello, ", b"World!"]))
+
+    assert response.status_code == 200
+    assert bodies == [b"Hello, World!"]
+
+
+@pytest.mark.parametrize(
+    ("minimum_compression_size", "expected_encoding"),
+    [(None, None), (0, "gzip"), (1024, None)],
+)
+def test_lambda_invoker_endpoint_compression(
+    mocker,
+    test_client,
+    mock_smyth,
+    mock_smyth_dispatch,
+    minimum_compression_size,
+    expected_encoding,
+):
+    handler = mock_smyth.handlers["product_handler"]
+    handler.minimum_compression_size = minimum_compression_size
+    mock_smyth.resolve_route.return_value = mocker.Mock(handler=handler, path_params={})
+    mock_smyth_dispatch.return_value = LambdaResponse(body="Hello, World!")
+
+    response = test_client.get("/products/1", headers={"accept-encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers.get("content-encoding") == expected_encoding
+    assert response.text == "Hello, World!"
+
+
+def test_lambda_invoker_endpoint_cache(
+    mocker, test_client, mock_smyth, mock_smyth_dispatch
+):
+    handler = mock_smyth.handlers["product_handler"]
+    handler.name = "product_handler"
+    mock_smyth.response_caches = {"product_handler": ResponseCache()}
+    mock_smyth.resolve_route.return_value = mocker.Mock(handler=handler, path_params={})
+    mock_smyth_dispatch.return_value = LambdaResponse(body="Hello, World!")
+
+    assert test_client.get("/products/1").text == "Hello, World!"
+    assert test_client.get("/products/1").text == "Hello, World!"
+    assert mock_smyth_dispatch.await_count == 1
+
+    test_client.get("/products/1", headers={"cache-control": "max-age=0"})
+    test_client.post("/products/1")
+    assert mock_smyth_dispatch.await_count == 3
+
+    status = test_client.get("/smyth/api/status").json()
+    assert status["lambda handlers"]["product_handler"]["cache"]["hits"] == 1
+    assert status["lambda handlers"]["product_handler"]["cache"]["misses"] == 1
+    assert status["lambda handlers"]["product_handler"]["cache"]["invalidations"] == 1
+
+
+def test_lambda_invoker_endpoint_not_found(
+    test_client, mock_smyth, mock_smyth_dispatch
+):
+    mock_smyth.resolve_route.side_effect = ProcessDefinitionNotFoundError("Test")
+
+    response = test_client.delete("/products/1")
+
+    assert response.status_code == 404
+    assert response.json() == {"message": "Not Found"}
+    mock_smyth_dispatch.assert_not_awaited()
+
+
 def test_invocation_endpoint(test_client, mock_smyth, mock_smyth_dispatch):
     mock_smyth_dispatch.return_value = LambdaResponse(
         body="Hello, World!",
@@ -120,3 +394,282 @@ def test_invocation_endpoint(test_client, mock_smyth, mock_smyth_dispatch):
     )
     assert response.status_code == 200
     assert response.text == "Hello, World!"
+
+
+def test_invocation_endpoint_event(mocker, app, test_client, mock_smyth_dispatch):
+    mock_queue = app.async_invocations["order_handler"] = mocker.Mock()
+    mock_queue.enqueue.return_value = "request-id"
+
+    response = test_client.post(
+        "/2015-03-31/functions/order_handler/invocations",
+        json={"test": "test"},
+        headers={"X-Amz-Invocation-Type": "Event"},
+    )
+
+    assert response.status_code == 202
+    assert response.headers["x-amzn-RequestId"] == "request-id"
+    mock_queue.enqueue.assert_called_once_with({"test": "test"})
+    mock_smyth_dispatch.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    ("side_effect", "body", "expected_status_code", "expected_error_type"),
+    [
+        (None, b"{", 400, "InvalidRequestContentException"),
+        (QueueFullError("Full"), b"{}", 429, "TooManyRequestsException"),
+    ],
+)
+def test_invocation_endpoint_event_errors(
+    mocker,
+    app,
+    test_client,
+    side_effect,
+    body,
+    expected_status_code,
+    expected_error_type,
+):
+    app.async_invocations["order_handler"] = mocker.Mock()
+    app.async_invocations["order_handler"].enqueue.side_effect = side_effect
+
+    response = test_client.post(
+        "/2015-03-31/functions/order_handler/invocations",
+        content=body,
+        headers={"X-Amz-Invocation-Type": "Event"},
+    )
+
+    assert response.status_code == expected_status_code
+    assert response.headers["x-amzn-ErrorType"] == expected_error_type
+
+
+def test_payload_too_large(mocker, test_client, mock_smyth, mock_smyth_dispatch):
+    mocker.patch("smyth.server.endpoints.SYNC_PAYLOAD_LIMIT", 10)
+    mock_smyth.resolve_route.return_value = mocker.Mock(
+        handler=mock_smyth.handlers["order_handler"], path_params={}
+    )
+
+    response = test_client.post("/orders", content=b"a" * 11)
+    assert response.status_code == 413
+    assert response.headers["x-amzn-ErrorType"] == "RequestEntityTooLargeException"
+    assert response.json() == {"message": "Request Entity Too Large"}
+
+    response = test_client.post(
+        "/2015-03-31/functions/order_handler/invocations",
+        content=iter([b"a" * 6, b"a" * 6]),
+    )
+    assert response.status_code == 413
+    mock_smyth_dispatch.assert_not_called()
+
+
+def test_invocation_endpoint_event_payload_too_large(mocker, app, test_client):
+    app.async_invocations["order_handler"] = mocker.Mock()
+
+    response = test_client.post(
+        "/2015-03-31/functions/order_handler/invocations",
+        headers={"X-Amz-Invocation-Type": "Event"},
+        content=b"a" * (256 * 1024 + 1),
+    )
+
+    assert response.status_code == 413
+    assert response.headers["x-amzn-ErrorType"] == "RequestEntityTooLargeException"
+    app.async_invocations["order_handler"].enqueue.assert_not_called()
+
+
+def test_invocation_endpoint_event_not_enabled(test_client):
+    response = test_client.post(
+        "/2015-03-31/functions/order_handler/invocations",
+        json={},
+        headers={"X-Amz-Invocation-Type": "Event"},
+    )
+
+    assert response.status_code == 400
+    assert response.headers["x-amzn-ErrorType"] == "InvalidParameterValueException"
+
+
+def test_invocation_endpoint_dry_run(test_client, mock_smyth_dispatch):
+    response = test_client.post(
+        "/2015-03-31/functions/order_handler/invocations",
+        json={},
+        headers={"X-Amz-Invocation-Type": "DryRun"},
+    )
+
+    assert response.status_code == 204
+    mock_smyth_dispatch.assert_not_called()
+
+
+@pytest.fixture
+def mock_invoke_many(mocker, mock_smyth):
+    async def invoke_many(handler, events, parallelism=None, ordered=True):
+        if isinstance(events, list):
+            events = iter(events)
+        else:
+            events = [event async for event in events]
+        for index, event in enumerate(events):
+            if event.get("fail"):
+                yield InvocationResult(index=index, error=LambdaInvocationError("boom"))
+            else:
+                yield InvocationResult(index=index, response=event)
+
+    mock_smyth.get_handler_for_name.return_value = mock_smyth.handlers["order_handler"]
+    return mocker.patch.object(mock_smyth, "invoke_many", side_effect=invoke_many)
+
+
+def test_batch_invocation_endpoint(test_client, mock_smyth, mock_invoke_many):
+    response = test_client.post(
+        "/smyth/api/functions/order_handler/invocations?parallelism=2&ordered=false",
+        json=[{"a": 1}, {"fail": True}],
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {"index": 0, "payload": {"a": 1}},
+        {
+            "index": 1,
+            "error": {"errorType": "LambdaInvocationError", "errorMessage": "boom"},
+        },
+    ]
+    assert mock_invoke_many.call_args.kwargs == {"parallelism": 2, "ordered": False}
+
+
+def test_batch_invocation_endpoint_ndjson(test_client, mock_invoke_many):
+    response = test_client.post(
+        "/smyth/api/functions/order_handler/invocations",
+        content=b'{"a": 1}\n\n{"a": 2}\n{"a": 3}',
+        headers={"content-type": "application/x-ndjson"},
+    )
+
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {"index": 0, "payload": {"a": 1}},
+        {"index": 1, "payload": {"a": 2}},
+        {"index": 2, "payload": {"a": 3}},
+    ]
+    assert mock_invoke_many.call_args.kwargs == {"parallelism": None, "ordered": True}
+
+
+def test_batch_invocation_endpoint_invalid_ndjson(test_client, mock_invoke_many):
+    response = test_client.post(
+        "/smyth/api/functions/order_handler/invocations",
+        content=b'{"a": 1}\n{"a"',
+        headers={"content-type": "application/x-ndjson"},
+    )
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[-1]["error"]["errorType"] == "InvalidRequestContentException"
+
+
+@pytest.mark.parametrize(
+    ("url", "body"),
+    [
+        ("/smyth/api/functions/order_handler/invocations", b'{"a": 1}'),
+        ("/smyth/api/functions/order_handler/invocations", b"["),
+        ("/smyth/api/functions/order_handler/invocations?parallelism=a", b"[]"),
+    ],
+)
+def test_batch_invocation_endpoint_bad_request(
+    test_client, mock_invoke_many, url, body
+):
+    response = test_client.post(url, content=body)
+
+    assert response.status_code == 400
+    mock_invoke_many.assert_not_called()
+
+
+def test_batch_invocation_endpoint_payload_too_large(
+    mocker, test_client, mock_invoke_many
+):
+    mocker.patch("smyth.server.endpoints.SYNC_PAYLOAD_LIMIT", 10)
+
+    response = test_client.post(
+        "/smyth/api/functions/order_handler/invocations", json=[{"a": 1}] * 3
+    )
+
+    assert response.status_code == 413
+    assert response.headers["x-amzn-ErrorType"] == "RequestEntityTooLargeException"
+    mock_invoke_many.assert_not_called()
+
+
+def test_batch_invocation_endpoint_not_found(test_client, mock_smyth):
+    mock_smyth.get_handler_for_name.side_effect = KeyError
+
+    response = test_client.post("/smyth/api/functions/unknown/invocations", json=[])
+
+    assert response.status_code == 404
+
+
+def test_sqs_endpoint_send_message(app, test_client):
+    response = test_client.post(
+        "/smyth/sqs/",
+        json={
+            "QueueUrl": "http://testserver/smyth/sqs/orders",
+            "MessageBody": "Hello, World!",
+            "MessageAttributes": {"a": {"StringValue": "1", "DataType": "String"}},
+        },
+        headers={"X-Amz-Target": "AmazonSQS.SendMessage"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-amz-json-1.0"
+    assert response.json()["MD5OfMessageBody"] == "65a8e27d8879283831b664bd8b7f0ad4"
+    (message,) = app.sqs_queue.receive("orders", 10, visibility_timeout=30)
+    assert message.message_id == response.json()["MessageId"]
+    assert message.body == "Hello, World!"
+    assert message.message_attributes == {
+        "a": {"StringValue": "1", "DataType": "String"}
+    }
+
+
+def test_sqs_endpoint_send_message_batch(app, test_client):
+    response = test_client.post(
+        "/smyth/sqs",
+        json={
+            "QueueUrl": "http://testserver/smyth/sqs/orders",
+            "Entries": [
+                {"Id": "1", "MessageBody": "first"},
+                {"Id": "2", "MessageBody": "second"},
+            ],
+        },
+        headers={"X-Amz-Target": "AmazonSQS.SendMessageBatch"},
+    )
+
+    assert response.status_code == 200
+    assert [entry["Id"] for entry in response.json()["Successful"]] == ["1", "2"]
+    assert response.json()["Failed"] == []
+    assert app.sqs_queue.count("orders") == 2
+
+
+def test_sqs_endpoint_get_queue_url(test_client):
+    response = test_client.post(
+        "/smyth/sqs/",
+        json={"QueueName": "orders"},
+        headers={"X-Amz-Target": "AmazonSQS.GetQueueUrl"},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"QueueUrl": "http://testserver/smyth/sqs/orders"}
+
+
+@pytest.mark.parametrize(
+    ("target", "payload", "expected_type"),
+    [
+        ("AmazonSQS.PurgeQueue", {}, "com.amazonaws.sqs#UnsupportedOperation"),
+        ("AmazonSQS.SendMessage", {}, "com.amazonaws.sqs#MissingParameter"),
+    ],
+)
+def test_sqs_endpoint_errors(test_client, target, payload, expected_type):
+    response = test_client.post(
+        "/smyth/sqs/", json=payload, headers={"X-Amz-Target": target}
+    )
+
+    assert response.status_code == 400
+    assert response.json()["__type"] == expected_type
+
+
+def test_sqs_endpoint_malformed_body(test_client):
+    response = test_client.post(
+        "/smyth/sqs/",
+        content=b"{not json",
+        headers={"X-Amz-Target": "AmazonSQS.SendMessage"},
+    )
+
+    assert response.status_code == 400
+    assert response.json()["__type"] == "com.amazonaws.sqs#InvalidParameterValue"
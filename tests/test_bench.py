@@ -0,0 +1,290 @@
+import asyncio
+import json
+
+import pytest
+
+from smyth.bench import (
+    HTTPTarget,
+    InProcessTarget,
+    LoadReport,
+    ReplayReport,
+    compare_with_baseline,
+    count_cold_starts,
+    format_replay_summary,
+    format_summary,
+    generate_load,
+    percentile,
+    read_events,
+    replay,
+    run_benchmark,
+)
+from smyth.exceptions import LambdaTimeoutError
+
+pytestmark = pytest.mark.anyio
+
+
+def test_percentile():
+    samples = [float(value) for value in range(1, 101)]
+
+    assert percentile(samples, 50) == 50
+    assert percentile(samples, 99) == 99
+    assert percentile(samples, 100) == 100
+    assert percentile([7.0], 99) == 7
+    assert percentile([], 50) == 0
+
+
+def test_count_cold_starts():
+    assert count_cold_starts([0, 0, 0], [3, 1, 0]) == 2
+    assert count_cold_starts([5, 0], [9, 1]) == 1
+    assert count_cold_starts([], [1, 1]) == 2
+
+
+def test_load_report_summary():
+    report = LoadReport(duration=2, cold_starts=1)
+    for latency in (0.001, 0.002, 0.003):
+        report.record(latency)
+    report.record(0.1, "LambdaTimeoutError")
+
+    summary = report.get_summary()
+
+    assert summary == {
+        "invocations": 4,
+        "duration_s": 2,
+        "throughput_rps": 2,
+        # Only the invocations that ran
+        "latency_ms": {"p50": 2, "p90": 3, "p99": 3, "max": 3},
+        "cold_starts": 1,
+        "errors": {"LambdaTimeoutError": 1},
+        "error_rate": 0.25,
+    }
+    assert "LambdaTimeoutError: 1" in format_summary(summary)
+
+
+async def test_generate_load_concurrency():
+    in_flight = 0
+    max_in_flight = 0
+    events = []
+
+    async def invoke(event):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        events.append(event)
+        await asyncio.sleep(0.005)
+        in_flight -= 1
+        return "Error" if event["n"] == 2 else None
+
+    report = await generate_load(
+        invoke, [{"n": 1}, {"n": 2}], duration=0.1, concurrency=3
+    )
+
+    assert max_in_flight == 3
+    assert report.invocations == len(events) > 3
+    assert events[:2] == [{"n": 1}, {"n": 2}]
+    assert report.errors == {"Error": events.count({"n": 2})}
+    assert report.duration >= 0.1
+
+
+async def test_generate_load_rate():
+    async def invoke(event):
+        await asyncio.sleep(0.05)
+        return None
+
+    report = await generate_load(invoke, [{}], duration=0.2, rate=50)
+
+    # Started at the rate, not held back by the invocations in flight
+    assert report.invocations == 10
+
+
+def test_read_events(tmp_path):
+    event_file = tmp_path / "event.json"
+    event_file.write_text(json.dumps({"a": 1}, indent=2))
+    assert read_events(event_file) == [{"a": 1}]
+
+    events_file = tmp_path / "events.jsonl"
+    events_file.write_text('{"a": 1}\n\n{"a": 2}\n')
+    assert read_events(events_file) == [{"a": 1}, {"a": 2}]
+
+
+def test_compare_with_baseline():
+    baseline = {
+        "throughput_rps": 100,
+        "latency_ms": {"p50": 10, "p90": 20, "p99": 40, "max": 100},
+        "error_rate": 0.0,
+    }
+
+    assert compare_with_baseline(baseline, baseline) == []
+    assert compare_with_baseline(
+        {
+            "throughput_rps": 75,
+            "latency_ms": {"p50": 11, "p90": 20, "p99": 60, "max": 500},
+            "error_rate": 0.05,
+        },
+        baseline,
+    ) == [
+        "throughput 75 rps, baseline 100 rps",
+        "p99 latency 60 ms, baseline 40 ms",
+        "error rate 5.00%, baseline 0.00%",
+    ]
+
+
+async def test_in_process_target(mocker, config):
+    target = InProcessTarget(config, "order_handler")
+    assert list(target.smyth.smyth_handlers) == ["order_handler"]
+    mock_invoke = mocker.patch.object(
+        target.smyth, "invoke", side_effect=[{"ok": True}, LambdaTimeoutError()]
+    )
+
+    assert await target.invoke({"a": 1}) is None
+    assert await target.invoke({"a": 1}) == "LambdaTimeoutError"
+    mock_invoke.assert_called_with(target.handler, {"a": 1})
+
+    with pytest.raises(ValueError):
+        InProcessTarget(config, "unknown_handler")
+
+
+async def test_in_process_target_above_concurrency(config):
+    # One runner configured, two invocations in flight
+    with InProcessTarget(config, "order_handler") as target:
+        assert len(target.smyth.processes["order_handler"]) == 1
+        report = await run_benchmark(target, [{}], duration=0.2, concurrency=2)
+
+    assert report.errors == {}
+    assert len(report.latencies) == report.invocations > 0
+
+
+async def test_run_benchmark(mocker, config):
+    target = InProcessTarget(config, "order_handler")
+    process = mocker.Mock(task_counter=0)
+    target.smyth.processes["order_handler"] = [process, mocker.Mock(task_counter=0)]
+
+    async def invoke(handler, event):
+        process.task_counter += 1
+
+    mocker.patch.object(target.smyth, "invoke", side_effect=invoke)
+
+    report = await run_benchmark(target, [{}], duration=0.05)
+
+    assert report.invocations == process.task_counter > 0
+    assert report.cold_starts == 1
+
+
+async def test_http_target(mocker):
+    with HTTPTarget("http://localhost:8080/base", "order_handler") as target:
+        mock_request = mocker.patch.object(
+            target,
+            "send_request",
+            side_effect=[
+                ConnectionResetError(),
+                (200, None, b"{}"),
+                (429, "TooManyRequestsException", b"{}"),
+                (502, None, b"Bad Gateway"),
+                (
+                    200,
+                    None,
+                    json.dumps(
+                        {
+                            "lambda handlers": {
+                                "order_handler": {
+                                    "processes": [
+                                        {"state": "warm", "task_counter": 3},
+                                        {"state": "cold", "task_counter": 0},
+                                    ]
+                                }
+                            }
+                        }
+                    ).encode(),
+                ),
+            ],
+        )
+
+        # Retried once on a closed connection
+        assert await target.invoke({"a": 1}) is None
+        assert await target.invoke({"a": 1}) == "TooManyRequestsException"
+        assert await target.invoke({"a": 1}) == "HTTP 502"
+        assert await target.get_task_counters() == [3, 0]
+
+    mock_request.assert_any_call(
+        "POST", "/base/2015-03-31/functions/order_handler/invocations", b'{"a": 1}'
+    )
+    mock_request.assert_called_with("GET", "/base/smyth/api/status", None)
+
+
+def test_http_target_invalid_url():
+    with pytest.raises(ValueError):
+        HTTPTarget("localhost:8080", "order_handler")
+
+
+def make_invocation(timestamp, event, response=None, error=None, duration_ms=10):
+    return {
+        "timestamp": timestamp,
+        "handler": "order_handler",
+        "duration_ms": duration_ms,
+        "event": event,
+        "response": response,
+        "streamed": False,
+        "error": {"type": error, "message": ""} if error else None,
+    }
+
+
+def test_replay_report():
+    report = ReplayReport()
+    report.record(0, make_invocation(0, {}, {"body": b"ok"}), 0.01, {"body": b"ok"})
+    report.record(1, make_invocation(1, {}, {"n": 1}), 0.01, {"n": 2})
+    report.record(2, make_invocation(2, {}, error="LambdaTimeoutError"), 0.5)
+    report.record(
+        3, {**make_invocation(3, {}), "streamed": True}, 0.05, b"streamed body"
+    )
+
+    summary = report.get_summary()
+    handler = summary["handlers"]["order_handler"]
+
+    assert handler["invocations"] == 4
+    assert (handler["matches"], handler["mismatches"], handler["unchecked"]) == (
+        1,
+        2,
+        1,
+    )
+    assert summary["mismatches"] == [
+        {
+            "index": 1,
+            "handler": "order_handler",
+            "expected": {"n": 1},
+            "actual": {"n": 2},
+        },
+        {
+            "index": 2,
+            "handler": "order_handler",
+            "expected": {"error": "LambdaTimeoutError"},
+            "actual": {"error": None},
+        },
+    ]
+    assert report.get_regressions(0.2) == [
+        "order_handler p90 latency 500.0 ms, recorded 10.0 ms",
+        "order_handler p99 latency 500.0 ms, recorded 10.0 ms",
+    ]
+    assert "1 matching, 2 different, 1 streamed" in format_replay_summary(summary)
+
+
+async def test_replay(mocker, config):
+    smyth = mocker.Mock(
+        invoke=mocker.AsyncMock(side_effect=[{"n": 1}, LambdaTimeoutError()])
+    )
+    invocations = [
+        make_invocation(100.0, {"n": 1}, {"n": 1}),
+        make_invocation(100.2, {"n": 2}, error="LambdaTimeoutError"),
+    ]
+
+    report = await replay(smyth, invocations, speed=2)
+
+    # The recorded 0.2s between the invocations, twice as fast
+    assert 0.09 < report.duration < 0.2
+    assert smyth.invoke.await_args_list == [
+        mocker.call(smyth.get_handler_for_name.return_value, {"n": 1}),
+        mocker.call(smyth.get_handler_for_name.return_value, {"n": 2}),
+    ]
+    assert report.handlers["order_handler"].matches == 2
+    assert report.handlers["order_handler"].errors == {"LambdaTimeoutError": 1}
+
+    with pytest.raises(ValueError):
+        await replay(smyth, invocations, speed=0)
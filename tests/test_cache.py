@@ -0,0 +1,128 @@
+import pytest
+from starlette.requests import Request
+
+from smyth.cache import ResponseCache, requests_invalidation
+from smyth.types import LambdaResponse
+
+
+def make_request(method="GET", path="/products", query_string=b"", headers=()):
+    return Request(
+        {
+            "type": "http",
+            "method": method,
+            "path": path,
+            "query_string": query_string,
+            "headers": [(name.encode(), value.encode()) for name, value in headers],
+        }
+    )
+
+
+@pytest.fixture
+def response_cache():
+    return ResponseCache(
+        ttl=60,
+        max_bytes=100,
+        key_query_parameters=["page"],
+        key_headers=["Accept-Language"],
+    )
+
+
+def test_get_key(response_cache):
+    request = make_request(
+        query_string=b"page=2&page=3&utm_source=test",
+        headers=[("accept-language", "pl"), ("user-agent", "test")],
+    )
+
+    assert response_cache.get_key(request) == (
+        "GET",
+        "/products",
+        (("page", "2"), ("page", "3")),
+        ("pl",),
+    )
+    assert response_cache.get_key(
+        make_request(query_string=b"page=2&page=3&utm_source=other")
+    ) == ("GET", "/products", (("page", "2"), ("page", "3")), ("",))
+    assert response_cache.get_key(make_request(method="POST")) is None
+
+
+def test_get_put(freezer, response_cache):
+    key = response_cache.get_key(make_request())
+    response = LambdaResponse(body="Hello, World!")
+
+    assert response_cache.get(key) is None
+    response_cache.put(key, response)
+    assert response_cache.get(key) is response
+
+    freezer.tick(61)
+    assert response_cache.get(key) is None
+    assert response_cache.get_status() == {
+        "entries": 0,
+        "bytes": 0,
+        "max_bytes": 100,
+        "hits": 1,
+        "misses": 2,
+        "hit_ratio": 1 / 3,
+        "invalidations": 0,
+        "evictions": 0,
+        "expirations": 1,
+    }
+
+
+def test_put_not_cacheable(response_cache):
+    key = response_cache.get_key(make_request())
+
+    response_cache.put(key, LambdaResponse(statusCode=500, body="Error"))
+    response_cache.put(key, LambdaResponse(body="a" * 101))
+
+    assert response_cache.entries == {}
+
+
+def test_lru_eviction(response_cache):
+    first, second, third = (
+        response_cache.get_key(make_request(path=f"/products/{index}"))
+        for index in range(3)
+    )
+
+    response_cache.put(first, LambdaResponse(body="a" * 40))
+    response_cache.put(second, LambdaResponse(body="b" * 40))
+    response_cache.get(first)
+    response_cache.put(third, LambdaResponse(body="c" * 40))
+
+    assert list(response_cache.entries) == [first, third]
+    assert response_cache.size == 80
+    assert response_cache.metrics.evictions == 1
+
+
+def test_response_size_in_bytes(response_cache):
+    key = response_cache.get_key(make_request())
+
+    response_cache.put(key, LambdaResponse(headers={"x-a": "ż"}, body="€" * 30))
+    assert response_cache.size == 3 + 2 + 90
+    # 34 characters, but over `max_bytes` once encoded
+    response_cache.put(key, LambdaResponse(body="€" * 34))
+    assert response_cache.entries == {}
+
+
+def test_invalidate(response_cache):
+    key = response_cache.get_key(make_request())
+    response_cache.put(key, LambdaResponse(body="Hello, World!"))
+
+    response_cache.invalidate(key)
+
+    assert response_cache.entries == {}
+    assert response_cache.size == 0
+    assert response_cache.metrics.invalidations == 1
+
+
+@pytest.mark.parametrize(
+    ("cache_control", "expected"),
+    [
+        (None, False),
+        ("max-age=0", True),
+        ("no-store, Max-Age = 0", True),
+        ("max-age=60", False),
+    ],
+)
+def test_requests_invalidation(cache_control, expected):
+    headers = [("cache-control", cache_control)] if cache_control else []
+    assert requests_invalidation(make_request(headers=headers)) is expected
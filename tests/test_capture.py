@@ -0,0 +1,107 @@
+from smyth.capture import TrafficRecorder, read_capture
+from smyth.exceptions import LambdaTimeoutError
+from smyth.types import LambdaStreamingResponse, RunnerInputMessage
+
+
+def make_message(event):
+    return RunnerInputMessage(
+        type="smyth.lambda.invoke",
+        event=event,
+        context={"aws_request_id": "request-id"},
+    )
+
+
+def test_record_and_read_capture(tmp_path):
+    path = tmp_path / "capture.jsonl"
+    recorder = TrafficRecorder(path)
+    # Opened by the first invocation
+    assert not path.exists()
+    recorder.record(
+        "order_handler",
+        "order_handler:0",
+        make_message({"n": 2}),
+        timestamp=20.0,
+        duration=0.5,
+        cold_start=False,
+        error=LambdaTimeoutError("Timed out"),
+    )
+    recorder.record(
+        "order_handler",
+        "order_handler:0",
+        make_message({"n": 1}),
+        timestamp=10.0,
+        duration=0.0125,
+        cold_start=True,
+        response={"body": b"\x00binary"},
+    )
+    recorder.record(
+        "product_handler",
+        "product_handler:0",
+        make_message({}),
+        timestamp=30.0,
+        duration=0.1,
+        cold_start=False,
+        response=LambdaStreamingResponse(chunks=iter([b"chunk"])),
+    )
+    recorder.close()
+
+    first, second, third = read_capture(path)
+
+    # In the order they started, bytes decoded
+    assert first == {
+        "timestamp": 10.0,
+        "handler": "order_handler",
+        "runner": "order_handler:0",
+        "cold_start": True,
+        "duration_ms": 12.5,
+        "event": {"n": 1},
+        "context": {"aws_request_id": "request-id"},
+        "response": {"body": b"\x00binary"},
+        "streamed": False,
+        "error": None,
+    }
+    assert second["error"] == {"type": "LambdaTimeoutError", "message": "Timed out"}
+    assert second["response"] is None
+    assert third["streamed"] is True
+    assert third["response"] is None
+
+
+def test_record_after_close(tmp_path):
+    path = tmp_path / "capture.jsonl"
+    recorder = TrafficRecorder(path)
+
+    for timestamp in (10.0, 20.0):
+        recorder.record(
+            "order_handler",
+            "order_handler:0",
+            make_message({}),
+            timestamp=timestamp,
+            duration=0.1,
+            cold_start=False,
+            response={},
+        )
+        recorder.close()
+
+    assert [invocation["timestamp"] for invocation in read_capture(path)] == [
+        10.0,
+        20.0,
+    ]
+
+
+def test_record_unserializable(tmp_path, caplog):
+    path = tmp_path / "capture.jsonl"
+    recorder = TrafficRecorder(path)
+
+    recorder.record(
+        "order_handler",
+        "order_handler:0",
+        make_message({}),
+        timestamp=10.0,
+        duration=0.1,
+        cold_start=False,
+        response={"value": object()},
+    )
+    recorder.close()
+
+    assert not path.exists()
+    assert "Can't record an invocation of order_handler" in caplog.text
@@ -0,0 +1,116 @@
+import gzip
+import zlib
+
+import pytest
+from starlette.responses import Response
+
+from smyth.compression import (
+    choose_encoding,
+    compress,
+    compress_response,
+    parse_accept_encoding,
+)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+pytestmark = pytest.mark.anyio
+requires_brotli = pytest.mark.skipif(brotli is None, reason="brotli is not installed")
+
+
+@pytest.fixture
+def no_brotli(mocker):
+    mocker.patch("smyth.compression.brotli", None)
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("gzip, deflate;q=0.5, br;q=abc, , *;q=0") == {
+        "gzip": 1.0,
+        "deflate": 0.5,
+        "br": 0.0,
+        "*": 0.0,
+    }
+
+
+@pytest.mark.parametrize(
+    ("accept_encoding", "expected"),
+    [
+        ("", None),
+        ("identity", None),
+        ("gzip", "gzip"),
+        pytest.param("gzip, deflate, br", "br", marks=requires_brotli),
+        ("gzip;q=1, br;q=0.5", "gzip"),
+        pytest.param("*", "br", marks=requires_brotli),
+        ("br;q=0, *", "gzip"),
+    ],
+)
+def test_choose_encoding(accept_encoding, expected):
+    assert choose_encoding(accept_encoding) == expected
+
+
+def test_choose_encoding_without_brotli(no_brotli):
+    assert choose_encoding("gzip, deflate, br") == "gzip"
+    assert choose_encoding("br") is None
+
+
+@pytest.mark.parametrize(
+    ("encoding", "decompress"),
+    [
+        pytest.param("br", lambda body: brotli.decompress(body), marks=requires_brotli),
+        ("gzip", gzip.decompress),
+        ("deflate", zlib.decompress),
+    ],
+)
+def test_compress(encoding, decompress):
+    assert decompress(compress(b"Hello, World!", encoding)) == b"Hello, World!"
+
+
+def test_compress_unsupported():
+    with pytest.raises(ValueError):
+        compress(b"Hello, World!", "zstd")
+
+
+async def test_compress_response():
+    response = Response(b"a" * 1024, headers={"vary": "Origin"})
+
+    await compress_response(response, "gzip", minimum_compression_size=1024)
+
+    assert gzip.decompress(response.body) == b"a" * 1024
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-length"] == str(len(response.body))
+    assert response.headers["vary"] == "Origin, Accept-Encoding"
+
+
+async def test_compress_response_off_loop(mocker):
+    mock_run_in_threadpool = mocker.patch(
+        "smyth.compression.run_in_threadpool", return_value=b"compressed"
+    )
+    response = Response(b"a" * 1024 * 1024)
+
+    await compress_response(response, "gzip", minimum_compression_size=0)
+
+    mock_run_in_threadpool.assert_awaited_once_with(
+        compress, b"a" * 1024 * 1024, "gzip"
+    )
+    assert response.body == b"compressed"
+
+
+@pytest.mark.parametrize(
+    ("body", "status_code", "headers", "accept_encoding"),
+    [
+        (b"a" * 1023, 200, {}, "gzip"),
+        (b"a" * 1024, 200, {"content-encoding": "gzip"}, "gzip"),
+        (b"a" * 1024, 200, {}, "identity"),
+        (b"a" * 1024, 404, {}, "gzip"),
+        (b"a" * 1024, 502, {}, "gzip"),
+    ],
+)
+async def test_compress_response_skipped(body, status_code, headers, accept_encoding):
+    response = Response(body, status_code=status_code, headers=headers)
+
+    await compress_response(response, accept_encoding, minimum_compression_size=1024)
+
+    assert response.body == body
+    assert "vary" not in response.headers
@@ -0,0 +1,93 @@
+import pytest
+
+from smyth.concurrency import ConcurrencyLimiter
+from smyth.exceptions import ConcurrencyLimitExceededError
+
+
+def test_no_limits():
+    limiter = ConcurrencyLimiter()
+    for _ in range(100):
+        limiter.acquire("test_handler")
+    assert limiter.in_flight == {"test_handler": 100}
+
+
+def test_max_concurrency():
+    limiter = ConcurrencyLimiter(max_concurrency=2)
+    limiter.acquire("order_handler")
+    limiter.acquire("product_handler")
+
+    with pytest.raises(ConcurrencyLimitExceededError) as excinfo:
+        limiter.acquire("order_handler")
+
+    assert excinfo.value.reason == "ConcurrentInvocationLimitExceeded"
+    assert limiter.throttled == {"order_handler": 1}
+
+    limiter.release("product_handler")
+    limiter.acquire("order_handler")
+    assert limiter.in_flight == {"order_handler": 2, "product_handler": 0}
+
+
+def test_reserved_concurrency():
+    limiter = ConcurrencyLimiter(max_concurrency=3)
+    limiter.reserve("order_handler", 2)
+    assert limiter.unreserved_concurrency == 1
+
+    limiter.acquire("order_handler")
+    limiter.acquire("order_handler")
+    with pytest.raises(ConcurrencyLimitExceededError) as excinfo:
+        limiter.acquire("order_handler")
+    assert excinfo.value.reason == "ReservedFunctionConcurrentInvocationLimitExceeded"
+
+    # the unreserved pool is not affected by the reserved handler
+    limiter.acquire("product_handler")
+    with pytest.raises(ConcurrencyLimitExceededError):
+        limiter.acquire("product_handler")
+
+
+def test_reserved_concurrency_without_max_concurrency():
+    limiter = ConcurrencyLimiter()
+    limiter.reserve("order_handler", 0)
+
+    with pytest.raises(ConcurrencyLimitExceededError):
+        limiter.acquire("order_handler")
+    limiter.acquire("product_handler")
+
+
+def test_reserve_validation():
+    limiter = ConcurrencyLimiter(max_concurrency=2)
+    limiter.reserve("order_handler", 2)
+
+    with pytest.raises(ValueError):
+        limiter.reserve("product_handler", 1)
+    with pytest.raises(ValueError):
+        limiter.reserve("product_handler", -1)
+
+    limiter.reserve("order_handler", None)
+    limiter.reserve("product_handler", 1)
+    assert limiter.reserved == {"product_handler": 1}
+
+
+def test_reserve_invalid_keeps_reservation():
+    limiter = ConcurrencyLimiter(max_concurrency=3)
+    limiter.reserve("order_handler", 2)
+
+    with pytest.raises(ValueError):
+        limiter.reserve("order_handler", 4)
+    with pytest.raises(ValueError):
+        limiter.reserve("order_handler", -1)
+    assert limiter.reserved == {"order_handler": 2}
+
+    limiter.reserve("order_handler", 3)
+    assert limiter.reserved == {"order_handler": 3}
+
+
+def test_admit():
+    limiter = ConcurrencyLimiter(max_concurrency=1)
+
+    with limiter.admit("test_handler"):
+        assert limiter.in_flight == {"test_handler": 1}
+        with pytest.raises(ConcurrencyLimitExceededError):
+            with limiter.admit("test_handler"):
+                pass
+
+    assert limiter.in_flight == {"test_handler": 0}
@@ -1,15 +1,21 @@
 import json
 import os
+from copy import deepcopy
 from dataclasses import asdict
 from pathlib import Path
 
 import pytest
 
 from smyth.config import (
+    Config,
+    HandlerChanges,
     HandlerConfig,
+    SQSEventSourceConfig,
+    diff_handlers,
     get_config,
     get_config_dict,
     get_config_file_path,
+    read_config,
     serialize_config,
 )
 from smyth.exceptions import ConfigFileNotFoundError
@@ -79,3 +85,68 @@ def test_get_env_overrides(config):
         "ROOT_ENV": "root",
         "TEST_ENV": "test",
     }
+
+
+def test_handler_config_sqs(mocker, config_toml_dict):
+    mocker.patch.dict("os.environ")
+    os.environ.pop("__SMYTH_CONFIG", None)
+    config_toml_dict["tool"]["smyth"]["handlers"]["order_handler"]["sqs"] = {
+        "queue_name": "orders",
+        "batch_size": 5,
+    }
+
+    config = get_config(config_toml_dict)
+
+    assert config.handlers["order_handler"].sqs == SQSEventSourceConfig(
+        queue_name="orders", batch_size=5
+    )
+    assert config.handlers["product_handler"].sqs is None
+
+    os.environ["__SMYTH_CONFIG"] = serialize_config(config)
+    assert get_config(None) == config
+
+
+def test_diff_handlers(config_toml_dict):
+    old_config = Config.from_dict(deepcopy(config_toml_dict["tool"]["smyth"]))
+    new_config = Config.from_dict(deepcopy(config_toml_dict["tool"]["smyth"]))
+
+    assert diff_handlers(old_config, new_config) == HandlerChanges()
+    assert not diff_handlers(old_config, new_config)
+
+    del new_config.handlers["order_handler"]
+    new_config.handlers["product_handler"].concurrency = 3
+    new_config.handlers["user_handler"] = HandlerConfig(
+        handler_path="tests.conftest.example_handler", url_path="/users"
+    )
+
+    assert diff_handlers(old_config, new_config) == HandlerChanges(
+        added=["user_handler"], removed=["order_handler"], resized=["product_handler"]
+    )
+
+    new_config.handlers["product_handler"].timeout = 10
+
+    assert diff_handlers(old_config, new_config).changed == ["product_handler"]
+
+
+def test_diff_handlers_env(config):
+    new_config = deepcopy(config)
+    new_config.env["ROOT_ENV"] = "changed"
+    new_config.env["TEST_ENV"] = "changed"
+
+    # order_handler overrides TEST_ENV
+    assert diff_handlers(config, new_config).changed == [
+        "order_handler",
+        "product_handler",
+    ]
+
+
+def test_read_config(mocker, config_toml_dict):
+    config = Config.from_dict(deepcopy(config_toml_dict["tool"]["smyth"]))
+    mocker.patch.dict("os.environ", {"__SMYTH_CONFIG": "{}"})
+    mock_get_config_dict = mocker.patch(
+        "smyth.config.get_config_dict", return_value=config_toml_dict
+    )
+
+    # Not the config passed in the environment
+    assert read_config() == config
+    mock_get_config_dict.assert_called_once_with(None)
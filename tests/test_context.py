@@ -1,19 +1,24 @@
 import re
 from unittest.mock import ANY
 
-from smyth.context import generate_context_data
-from smyth.types import SmythHandlerState
+from freezegun.api import FrozenDateTimeFactory
 
+from smyth.context import (
+    generate_context_data,
+    generate_static_context_data,
+    get_callable_path,
+    merge_context_data,
+)
+from smyth.types import DEFAULT_BINARY_MEDIA_TYPES, SmythHandlerState
 
-async def test_generate_context_data(
-    smyth_handler,
-    mock_runner_process,
-):
-    assert await generate_context_data(None, smyth_handler, mock_runner_process) == {
+
+def test_generate_static_context_data(smyth_handler):
+    assert generate_static_context_data(smyth_handler) == {
         "smyth": {
             "handler": {
                 "smyth_handler_config": {
                     "concurrency": 1,
+                    "reserved_concurrency": None,
                     "context_data_function": ANY,
                     "event_data_function": ANY,
                     "lambda_handler_path": "tests.conftest.example_handler",
@@ -23,9 +28,35 @@ async def test_generate_context_data(
                     "timeout": None,
                     "url_path": re.compile("/test_handler"),
                     "env_overrides": {"TEST_ENV": "test"},
+                    "method": None,
+                    "route_key": None,
+                    "binary_media_types": DEFAULT_BINARY_MEDIA_TYPES,
+                    "minimum_compression_size": None,
+                    "transport": "queue",
+                    "bootstrap": None,
                 },
                 "name": "test_handler",
             },
+        },
+    }
+
+
+def test_get_callable_path():
+    assert get_callable_path(generate_context_data) == (
+        "smyth.context.generate_context_data"
+    )
+
+
+async def test_generate_context_data(
+    freezer: FrozenDateTimeFactory,
+    smyth_handler,
+    mock_runner_process,
+):
+    freezer.move_to("2024-12-20 00:00:00")
+    assert await generate_context_data(None, smyth_handler, mock_runner_process) == {
+        "aws_request_id": ANY,
+        "deadline_ms": 1734652806000,
+        "smyth": {
             "process": {
                 "last_used_timestamp": 0,
                 "name": "test_process",
@@ -34,3 +65,23 @@ async def test_generate_context_data(
             },
         },
     }
+
+
+async def test_generate_context_data_request_ids(smyth_handler, mock_runner_process):
+    first = await generate_context_data(None, smyth_handler, mock_runner_process)
+    second = await generate_context_data(None, smyth_handler, mock_runner_process)
+    assert first["aws_request_id"] != second["aws_request_id"]
+
+
+def test_merge_context_data():
+    assert merge_context_data(
+        {"timeout": 10, "smyth": {"handler": {"name": "test_handler"}}},
+        {"aws_request_id": "1", "smyth": {"process": {"name": "test_process"}}},
+    ) == {
+        "timeout": 10,
+        "aws_request_id": "1",
+        "smyth": {
+            "handler": {"name": "test_handler"},
+            "process": {"name": "test_process"},
+        },
+    }
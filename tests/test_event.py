@@ -1,18 +1,38 @@
 import pytest
 
 from smyth.event import (
+    encode_body,
     generate_api_gw_v2_event_data,
     generate_lambda_invocation_event_data,
 )
+from smyth.payload import BODY_SCOPE_KEY
+from smyth.types import DEFAULT_BINARY_MEDIA_TYPES
 
 pytestmark = pytest.mark.anyio
 
 
+@pytest.mark.parametrize(
+    ("body", "content_type", "expected"),
+    [
+        (b"", "image/png", ("", False)),
+        (b'{"a": 1}', "application/json", ('{"a": 1}', False)),
+        ("zażółć".encode(), None, ("zażółć", False)),
+        (b"\x89PNG", "image/png", ("iVBORw==", True)),
+        (b"text", "application/octet-stream; charset=binary", ("dGV4dA==", True)),
+        (b"\xff\xfe", "text/plain", ("//4=", True)),
+    ],
+)
+def test_encode_body(body, content_type, expected):
+    assert encode_body(body, content_type, DEFAULT_BINARY_MEDIA_TYPES) == expected
+
+
 async def test_generate_api_gw_v2_event_data(mocker):
     mock_request = mocker.Mock()
-    mock_request.body = mocker.AsyncMock(return_value=b"")
+    # Read by the endpoint
+    mock_request.scope = {BODY_SCOPE_KEY: b""}
     mock_request.headers = {}
     mock_request.query_params = {}
+    mock_request.path_params = {}
     mock_request.client.host = "127.0.0.1"
     mock_request.method = "GET"
     mock_request.url.path = "/test"
@@ -20,7 +40,9 @@ async def test_generate_api_gw_v2_event_data(mocker):
     mock_request.url.scheme = "http"
 
     assert await generate_api_gw_v2_event_data(
-        mock_request, mocker.Mock(), mocker.Mock()
+        mock_request,
+        mocker.Mock(route_key=None, binary_media_types=DEFAULT_BINARY_MEDIA_TYPES),
+        mocker.Mock(),
     ) == {
         "version": "2.0",
         "rawPath": "/test",
@@ -44,9 +66,35 @@ async def test_generate_api_gw_v2_event_data(mocker):
     }
 
 
+async def test_generate_api_gw_v2_event_data_path_parameters(mocker):
+    mock_request = mocker.Mock()
+    # Read by the endpoint
+    mock_request.scope = {BODY_SCOPE_KEY: b""}
+    mock_request.headers = {}
+    mock_request.query_params = {}
+    mock_request.path_params = {"order_id": "1"}
+    mock_request.method = "GET"
+    mock_request.url.path = "/orders/1"
+
+    event_data = await generate_api_gw_v2_event_data(
+        mock_request,
+        mocker.Mock(
+            route_key="GET /orders/{order_id}",
+            binary_media_types=DEFAULT_BINARY_MEDIA_TYPES,
+        ),
+        mocker.Mock(),
+    )
+
+    assert event_data["pathParameters"] == {"order_id": "1"}
+    assert event_data["routeKey"] == "GET /orders/{order_id}"
+    assert event_data["requestContext"]["routeKey"] == "GET /orders/{order_id}"
+
+
 async def test_generate_lambda_invokation_event_data(mocker):
     mock_request = mocker.Mock()
-    mock_request.json = mocker.AsyncMock(return_value={"test": "test"})
+    mock_request.headers = {"content-length": "16"}
+    # Read by the endpoint
+    mock_request.scope = {BODY_SCOPE_KEY: b'{"test": "test"}'}
 
     assert await generate_lambda_invocation_event_data(
         mock_request, mocker.Mock(), mocker.Mock()
@@ -0,0 +1,146 @@
+import asyncio
+import json
+
+import pytest
+
+from smyth.exceptions import (
+    ConcurrencyLimitExceededError,
+    LambdaInvocationError,
+    NoAvailableProcessError,
+    QueueFullError,
+)
+from smyth.invocation import AsyncInvocation, AsyncInvocationQueue
+from smyth.sqs import LocalQueue
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def mock_smyth(mocker, smyth_handler):
+    smyth = mocker.Mock()
+    smyth.get_handler_for_name.return_value = smyth_handler
+    smyth.invoke = mocker.AsyncMock(return_value=None)
+    return smyth
+
+
+@pytest.fixture
+def sqs_queue():
+    queue = LocalQueue()
+    yield queue
+    queue.close()
+
+
+@pytest.fixture
+def async_invocation_queue(mock_smyth, sqs_queue):
+    return AsyncInvocationQueue(
+        smyth=mock_smyth,
+        handler_name="test_handler",
+        retry_delay=0.01,
+        queue_size=2,
+        on_failure="sqs:failures",
+        sqs_queue=sqs_queue,
+    )
+
+
+def test_invalid_config(mock_smyth):
+    with pytest.raises(ValueError):
+        AsyncInvocationQueue(mock_smyth, "test_handler", maximum_retry_attempts=3)
+    with pytest.raises(ValueError):
+        AsyncInvocationQueue(mock_smyth, "test_handler", on_failure="sqs:failures")
+
+
+def test_enqueue(async_invocation_queue):
+    request_id = async_invocation_queue.enqueue({"a": 1})
+    async_invocation_queue.enqueue({"a": 2})
+
+    with pytest.raises(QueueFullError):
+        async_invocation_queue.enqueue({"a": 3})
+
+    invocation = async_invocation_queue.queue.get_nowait()
+    assert invocation.request_id == request_id
+    assert invocation.event == {"a": 1}
+    assert async_invocation_queue.get_status()["received"] == 2
+    assert async_invocation_queue.get_status()["rejected"] == 1
+
+
+async def test_process(mock_smyth, smyth_handler, async_invocation_queue):
+    await async_invocation_queue.process(
+        AsyncInvocation(request_id="1", event={"a": 1})
+    )
+
+    mock_smyth.invoke.assert_awaited_once_with(smyth_handler, {"a": 1})
+    assert async_invocation_queue.metrics.succeeded == 1
+
+
+async def test_retries_exhausted(mock_smyth, sqs_queue, async_invocation_queue):
+    mock_smyth.invoke.side_effect = LambdaInvocationError("boom")
+
+    async_invocation_queue.start()
+    async_invocation_queue.enqueue({"a": 1})
+    await asyncio.sleep(0.1)
+    await async_invocation_queue.stop()
+
+    assert mock_smyth.invoke.await_count == 3
+    status = async_invocation_queue.get_status()
+    assert status["retried"] == 2
+    assert status["failed"] == 1
+    (message,) = sqs_queue.receive("failures", 10, visibility_timeout=30)
+    record = json.loads(message.body)
+    assert record["requestContext"]["condition"] == "RetriesExhausted"
+    assert record["requestContext"]["approximateInvokeCount"] == 3
+    assert record["requestContext"]["functionArn"] == (
+        "arn:aws:lambda:eu-central-1:000000000000:function:test_handler:$LATEST"
+    )
+    assert record["requestPayload"] == {"a": 1}
+    assert record["responsePayload"] == {
+        "errorMessage": "boom",
+        "errorType": "LambdaInvocationError",
+    }
+
+
+async def test_retry_succeeds(mock_smyth, async_invocation_queue):
+    mock_smyth.invoke.side_effect = [LambdaInvocationError("boom"), None]
+
+    async_invocation_queue.start()
+    async_invocation_queue.enqueue({"a": 1})
+    await asyncio.sleep(0.05)
+    await async_invocation_queue.stop()
+
+    assert async_invocation_queue.metrics.retried == 1
+    assert async_invocation_queue.metrics.succeeded == 1
+    assert async_invocation_queue.metrics.failed == 0
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        ConcurrencyLimitExceededError("Rate Exceeded"),
+        NoAvailableProcessError("No process available"),
+    ],
+)
+async def test_throttled(mocker, async_invocation_queue, error):
+    mock_requeue = mocker.patch.object(async_invocation_queue, "requeue")
+    async_invocation_queue.smyth.invoke.side_effect = error
+    invocation = AsyncInvocation(request_id="1", event={})
+
+    await async_invocation_queue.process(invocation)
+
+    mock_requeue.assert_called_once_with(invocation, 1.0)
+    assert invocation.attempts == 0
+    assert async_invocation_queue.metrics.throttled == 1
+
+
+async def test_event_age_exceeded(mock_smyth, tmp_path, async_invocation_queue):
+    async_invocation_queue.on_failure = str(tmp_path / "failures.jsonl")
+    async_invocation_queue.maximum_event_age = 60
+
+    await async_invocation_queue.process(
+        AsyncInvocation(request_id="1", event={"a": 1}, received_at=-61)
+    )
+
+    mock_smyth.invoke.assert_not_called()
+    assert async_invocation_queue.metrics.expired == 1
+    (line,) = (tmp_path / "failures.jsonl").read_text().splitlines()
+    record = json.loads(line)
+    assert record["requestContext"]["condition"] == "EventAgeExceeded"
+    assert "responsePayload" not in record
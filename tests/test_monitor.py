@@ -0,0 +1,66 @@
+import asyncio
+import threading
+
+import pytest
+
+from smyth.monitor import RunnerMonitor
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_publish():
+    monitor = RunnerMonitor()
+    # Nobody listens
+    monitor.publish("runner.spawn", runner="handler:0")
+
+    with monitor.subscribe() as subscription:
+        monitor.publish("runner.spawn", runner="handler:0")
+        event = await subscription.get()
+
+    assert event["type"] == "runner.spawn"
+    assert event["runner"] == "handler:0"
+    assert "timestamp" in event
+    assert monitor.subscriptions == set()
+
+
+async def test_publish_drops_events_of_slow_subscribers():
+    monitor = RunnerMonitor()
+
+    with monitor.subscribe(buffer_size=2) as slow, monitor.subscribe() as fast:
+        for index in range(4):
+            monitor.publish("invocation.start", index=index)
+
+        assert [(await fast.get())["index"] for _ in range(4)] == [0, 1, 2, 3]
+        dropped = await slow.get()
+        assert dropped["type"] == "monitor.dropped"
+        assert dropped["count"] == 2
+        assert [(await slow.get())["index"] for _ in range(2)] == [0, 1]
+
+
+async def test_publish_from_thread():
+    monitor = RunnerMonitor()
+
+    with monitor.subscribe() as subscription:
+        thread = threading.Thread(
+            target=monitor.publish, args=("runner.state",), kwargs={"state": "warm"}
+        )
+        thread.start()
+        thread.join()
+        event = await asyncio.wait_for(subscription.get(), 1)
+
+    assert event["state"] == "warm"
+
+
+async def test_subscription_iteration():
+    monitor = RunnerMonitor()
+
+    with monitor.subscribe() as subscription:
+        monitor.publish("runner.spawn")
+        monitor.publish("runner.stop")
+        events = []
+        async for event in subscription:
+            events.append(event["type"])
+            if len(events) == 2:
+                break
+
+    assert events == ["runner.spawn", "runner.stop"]
@@ -0,0 +1,93 @@
+import pytest
+from starlette.requests import Request
+
+from smyth.exceptions import PayloadTooLargeError
+from smyth.payload import check_payload_size, read_body, replay_body
+
+pytestmark = pytest.mark.anyio
+
+
+def make_request(chunks, headers=None):
+    received = []
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": index < len(chunks) - 1}
+        for index, chunk in enumerate(chunks)
+    ]
+
+    async def receive():
+        message = messages[len(received)]
+        received.append(message)
+        return message
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/",
+        "headers": [
+            (name.encode(), value.encode()) for name, value in (headers or {}).items()
+        ],
+    }
+    return Request(scope, receive), received
+
+
+def test_check_payload_size():
+    check_payload_size(10, 10)
+    with pytest.raises(PayloadTooLargeError) as error:
+        check_payload_size(11, 10)
+    assert error.value.limit == 10
+
+
+async def test_read_body():
+    request, _ = make_request([b"a" * 5, b"b" * 5], {"content-length": "10"})
+
+    assert await read_body(request, limit=10) == b"aaaaabbbbb"
+    assert await replay_body(request, b"aaaaabbbbb").body() == b"aaaaabbbbb"
+
+
+async def test_read_body_empty():
+    request, _ = make_request([b""])
+
+    assert await read_body(request, limit=10) == b""
+
+
+async def test_read_body_content_length_over_limit():
+    request, received = make_request([b"a" * 11], {"content-length": "11"})
+
+    with pytest.raises(PayloadTooLargeError):
+        await read_body(request, limit=10)
+    # Rejected without reading the body
+    assert received == []
+
+
+async def test_read_body_streamed_over_limit():
+    request, received = make_request([b"a" * 4] * 10, {"transfer-encoding": "chunked"})
+
+    with pytest.raises(PayloadTooLargeError):
+        await read_body(request, limit=10)
+    # Rejected as soon as the limit is crossed
+    assert len(received) == 3
+
+
+async def test_read_body_chunked():
+    chunks = [bytes([index]) * 1024 for index in range(8)]
+    request, received = make_request(chunks, {"transfer-encoding": "chunked"})
+
+    body = await read_body(request, limit=8 * 1024)
+
+    assert body == b"".join(chunks)
+    # Read from the client once
+    assert await read_body(request, limit=8 * 1024) == body
+    assert len(received) == 8
+    with pytest.raises(PayloadTooLargeError):
+        await read_body(request, limit=1024)
+
+
+async def test_replay_body():
+    request, received = make_request([b"body", b""])
+    await read_body(request, limit=10)
+
+    replayed = replay_body(request, b"body")
+
+    assert await replayed.body() == b"body"
+    assert await read_body(replayed, limit=10) == b"body"
+    assert len(received) == 2
@@ -0,0 +1,102 @@
+import asyncio
+import os
+
+import pytest
+
+from smyth.reload import HandlerReloader, get_modification_times
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def handler_files(tmp_path):
+    files = {name: tmp_path / f"{name}.py" for name in ("shared", "orders", "users")}
+    for file in files.values():
+        file.write_text("")
+    return {name: str(file) for name, file in files.items()}
+
+
+@pytest.fixture
+def mock_smyth(mocker, handler_files):
+    smyth = mocker.Mock()
+    smyth.smyth_handlers = {"orders": mocker.Mock(), "users": mocker.Mock()}
+    module_files = {
+        "orders": {handler_files["shared"], handler_files["orders"]},
+        "users": {handler_files["shared"], handler_files["users"]},
+    }
+    smyth.get_module_files.side_effect = module_files.__getitem__
+    smyth.restart_runners = mocker.AsyncMock()
+    return smyth
+
+
+def touch(path):
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 1))
+
+
+def test_get_modification_times(tmp_path):
+    file = tmp_path / "handler.py"
+    file.write_text("")
+
+    assert get_modification_times({str(file), str(tmp_path / "missing.py")}) == {
+        str(file): os.stat(file).st_mtime,
+        str(tmp_path / "missing.py"): None,
+    }
+
+
+async def test_check_restarts_changed_handlers(mock_smyth, handler_files):
+    reloader = HandlerReloader(mock_smyth)
+
+    await reloader.check()
+    mock_smyth.restart_runners.assert_not_called()
+
+    touch(handler_files["orders"])
+    await reloader.check()
+    await asyncio.sleep(0)
+    mock_smyth.restart_runners.assert_called_once_with("orders")
+
+    mock_smyth.restart_runners.reset_mock()
+    os.unlink(handler_files["shared"])
+    await reloader.check()
+    await asyncio.sleep(0)
+    assert sorted(
+        call.args[0] for call in mock_smyth.restart_runners.call_args_list
+    ) == ["orders", "users"]
+    assert reloader.get_status()["reloads"] == 3
+    assert reloader.get_status()["watched_files"] == 3
+
+
+async def test_check_skips_handlers_restarting(mocker, mock_smyth, handler_files):
+    restarted = asyncio.Event()
+
+    async def restart_runners(handler_name):
+        await restarted.wait()
+
+    mock_smyth.restart_runners = mocker.AsyncMock(side_effect=restart_runners)
+    reloader = HandlerReloader(mock_smyth)
+    await reloader.check()
+
+    touch(handler_files["orders"])
+    await reloader.check()
+    await asyncio.sleep(0)
+    assert reloader.get_status()["restarting"] == ["orders"]
+
+    touch(handler_files["orders"])
+    await reloader.check()
+    assert mock_smyth.restart_runners.call_count == 1
+
+    restarted.set()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert reloader.get_status()["restarting"] == []
+
+
+async def test_start_stop(mock_smyth, handler_files):
+    reloader = HandlerReloader(mock_smyth, interval=0.01)
+
+    reloader.start()
+    await asyncio.sleep(0.05)
+    await reloader.stop()
+
+    assert reloader.get_status()["watched_files"] == 3
+    assert reloader.get_status()["last_reload"] is None
@@ -0,0 +1,187 @@
+import re
+
+import pytest
+from starlette.routing import compile_path
+
+from smyth.exceptions import ProcessDefinitionNotFoundError
+from smyth.router import Router, get_static_prefix, parse_route_key
+from smyth.types import SmythHandler
+
+
+def make_handler(name, path):
+    method, path, route_key = parse_route_key(path)
+    return SmythHandler(
+        name=name,
+        url_path=compile_path(path)[0],
+        method=method,
+        route_key=route_key,
+        lambda_handler_path="tests.conftest.example_handler",
+        event_data_function=None,
+        context_data_function=None,
+        strategy_generator=None,
+    )
+
+
+@pytest.mark.parametrize(
+    ("route_key", "expected"),
+    [
+        ("/items/{id}", (None, "/items/{id}", "ANY /items/{id}")),
+        ("GET /items/{id}", ("GET", "/items/{id}", "GET /items/{id}")),
+        ("get /items/{id:int}", ("GET", "/items/{id:int}", "GET /items/{id}")),
+        ("ANY /{proxy+}", (None, "/{proxy:path}", "ANY /{proxy+}")),
+        (
+            "/products/{path:path}",
+            (None, "/products/{path:path}", "ANY /products/{path+}"),
+        ),
+        ("$default", (None, "/{proxy:path}", "$default")),
+    ],
+)
+def test_parse_route_key(route_key, expected):
+    assert parse_route_key(route_key) == expected
+
+
+def test_parse_route_key_invalid_method():
+    with pytest.raises(ValueError):
+        parse_route_key("FETCH /items")
+
+
+@pytest.mark.parametrize(
+    ("url_path", "expected_prefix"),
+    [
+        (compile_path("/orders/{order_id}")[0], "/orders/"),
+        (compile_path("/orders/{order_id}/items")[0], "/orders/"),
+        (compile_path("/orders")[0], "/orders"),
+        (compile_path("/{path:path}")[0], "/"),
+        (compile_path("/a.b/c-d/{path:path}")[0], "/a.b/c-d/"),
+        (re.compile(r"/test_handler"), "/"),
+        (re.compile(r"/orders/items?"), "/orders/"),
+        (re.compile(r"/orders/\d+"), "/orders/"),
+        (re.compile(r"^/orders|/products$"), ""),
+        (re.compile(r".*"), ""),
+    ],
+)
+def test_get_static_prefix(url_path, expected_prefix):
+    assert get_static_prefix(url_path) == expected_prefix
+
+
+@pytest.fixture
+def router():
+    router = Router(cache_size=8)
+    router.add(make_handler("order_handler", "/orders/{order_id}"))
+    router.add(make_handler("item_handler", "/orders/{order_id}/items/{id:int}"))
+    router.add(make_handler("product_handler", "/products/{path:path}"))
+    router.add(make_handler("fallback_handler", "/{path:path}"))
+    return router
+
+
+@pytest.mark.parametrize(
+    ("path", "expected_handler", "expected_path_params"),
+    [
+        ("/orders/1", "order_handler", {"order_id": "1"}),
+        ("/orders/1/items/2", "item_handler", {"order_id": "1", "id": "2"}),
+        ("/orders/1/items/two", "fallback_handler", {"path": "orders/1/items/two"}),
+        ("/products/a/b", "product_handler", {"path": "a/b"}),
+        ("/products/", "product_handler", {"path": ""}),
+        ("/", "fallback_handler", {"path": ""}),
+        ("/orders", "fallback_handler", {"path": "orders"}),
+    ],
+)
+def test_resolve(router, path, expected_handler, expected_path_params):
+    route_match = router.resolve(path)
+    assert route_match.handler.name == expected_handler
+    assert route_match.path_params == expected_path_params
+
+
+def test_resolve_not_found():
+    router = Router()
+    router.add(make_handler("order_handler", "/orders/{order_id}"))
+
+    with pytest.raises(ProcessDefinitionNotFoundError):
+        router.resolve("/products")
+
+
+def test_resolve_uncompiled_pattern(smyth_handler):
+    router = Router()
+    router.add(smyth_handler)
+
+    assert router.resolve("/test_handler").handler == smyth_handler
+    assert smyth_handler.url_path == re.compile(r"/test_handler")
+
+
+@pytest.mark.parametrize(
+    ("method", "expected_handler"),
+    [
+        ("GET", "get_item_handler"),
+        ("DELETE", "delete_item_handler"),
+        ("POST", "proxy_handler"),
+        (None, "get_item_handler"),
+    ],
+)
+def test_resolve_method(method, expected_handler):
+    router = Router()
+    router.add(make_handler("get_item_handler", "GET /items/{id}"))
+    router.add(make_handler("delete_item_handler", "DELETE /items/{id}"))
+    router.add(make_handler("proxy_handler", "ANY /{proxy+}"))
+
+    route_match = router.resolve("/items/1", method)
+
+    assert route_match.handler.name == expected_handler
+    assert route_match.route_key == route_match.handler.route_key
+
+
+def test_resolve_method_not_found():
+    router = Router()
+    router.add(make_handler("get_item_handler", "GET /items/{id}"))
+
+    assert router.resolve("/items/1", "GET").path_params == {"id": "1"}
+    with pytest.raises(ProcessDefinitionNotFoundError):
+        router.resolve("/items/1", "POST")
+
+
+def test_resolve_most_specific():
+    router = Router()
+    router.add(make_handler("default_handler", "$default"))
+    router.add(make_handler("proxy_handler", "ANY /{proxy+}"))
+    router.add(make_handler("products_handler", "/products/{path:path}"))
+    router.add(make_handler("product_handler", "GET /products/{id}"))
+    router.add(make_handler("featured_handler", "GET /products/featured"))
+
+    assert router.resolve("/products/featured").handler.name == "featured_handler"
+    assert router.resolve("/products/1").handler.name == "product_handler"
+    assert router.resolve("/products/1/reviews").handler.name == "products_handler"
+    assert router.resolve("/orders").handler.name == "proxy_handler"
+
+
+def test_resolve_default_last():
+    router = Router()
+    router.add(make_handler("default_handler", "$default"))
+    router.add(make_handler("order_handler", "/orders/{order_id}"))
+
+    assert router.resolve("/orders/1").handler.name == "order_handler"
+    assert router.resolve("/products").handler.name == "default_handler"
+
+
+def test_resolve_registration_order():
+    router = Router()
+    router.add(make_handler("order_handler", "/orders/{order_id}"))
+    router.add(make_handler("other_order_handler", "/orders/{id}"))
+
+    assert router.resolve("/orders/1").handler.name == "order_handler"
+
+
+def test_resolve_cache(mocker, router):
+    compile_spy = mocker.spy(router, "compile")
+
+    assert router.resolve("/orders/1").handler.name == "order_handler"
+    assert router.resolve("/orders/1").handler.name == "order_handler"
+    assert compile_spy.call_count == 1
+    assert router._resolve_cached.cache_info().hits == 1
+
+    for index in range(router.cache_size + 1):
+        router.resolve(f"/orders/{index}")
+    assert router._resolve_cached.cache_info().currsize == router.cache_size
+
+    router.remove("fallback_handler")
+    with pytest.raises(ProcessDefinitionNotFoundError):
+        router.resolve("/")
+    assert compile_spy.call_count == 2
@@ -0,0 +1,174 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from smyth.exceptions import LambdaInvocationError
+from smyth.schedule import (
+    CronSchedule,
+    RateSchedule,
+    ScheduledEventSource,
+    parse_schedule,
+)
+
+pytestmark = pytest.mark.anyio
+
+MOMENT = datetime(2024, 1, 1, 12, 30, 15, tzinfo=timezone.utc)  # a Monday
+
+
+@pytest.fixture
+def mock_smyth(mocker, smyth_handler):
+    smyth = mocker.Mock()
+    smyth.get_handler_for_name.return_value = smyth_handler
+    smyth.invoke = mocker.AsyncMock(return_value=None)
+    return smyth
+
+
+@pytest.mark.parametrize(
+    "expression, interval",
+    [
+        ("rate(1 minute)", timedelta(minutes=1)),
+        ("rate(5 minutes)", timedelta(minutes=5)),
+        ("rate(2 hours)", timedelta(hours=2)),
+        ("rate(1 day)", timedelta(days=1)),
+        ("rate(10 seconds)", timedelta(seconds=10)),
+    ],
+)
+def test_parse_rate(expression, interval):
+    schedule = parse_schedule(expression)
+
+    assert schedule == RateSchedule(interval)
+    assert schedule.next_after(MOMENT) == MOMENT + interval
+
+
+@pytest.mark.parametrize(
+    "expression, expected",
+    [
+        ("cron(* * * * ? *)", datetime(2024, 1, 1, 12, 31)),
+        ("cron(0 12 * * ? *)", datetime(2024, 1, 2, 12, 0)),
+        ("cron(0/15 * * * ? *)", datetime(2024, 1, 1, 12, 45)),
+        ("cron(0 8-10 ? * MON-FRI *)", datetime(2024, 1, 2, 8, 0)),
+        ("cron(0 0 ? * 1 *)", datetime(2024, 1, 7, 0, 0)),
+        ("cron(15 10 1,15 * ? *)", datetime(2024, 1, 15, 10, 15)),
+        ("cron(0 0 29 FEB ? *)", datetime(2024, 2, 29, 0, 0)),
+        ("cron(0 0 1 1 ? 2026)", datetime(2026, 1, 1, 0, 0)),
+    ],
+)
+def test_parse_cron(expression, expected):
+    schedule = parse_schedule(expression)
+
+    assert isinstance(schedule, CronSchedule)
+    assert schedule.next_after(MOMENT) == expected.replace(tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "every 5 minutes",
+        "rate(0 minutes)",
+        "rate(5 weeks)",
+        "cron(0 12 * * *)",
+        "cron(0 12 * * 1 *)",
+        "cron(0 12 ? * ? *)",
+        "cron(0 12 L * ? *)",
+        "cron(0 25 * * ? *)",
+    ],
+)
+def test_parse_invalid_schedule(expression):
+    with pytest.raises(ValueError):
+        parse_schedule(expression)
+
+
+def test_cron_after_leap_day():
+    schedule = parse_schedule("cron(0 12 * * ? *)")
+
+    assert schedule.next_after(
+        datetime(2028, 2, 29, 13, tzinfo=timezone.utc)
+    ) == datetime(2028, 3, 1, 12, tzinfo=timezone.utc)
+
+
+def test_cron_never_fires():
+    with pytest.raises(ValueError, match="never fires"):
+        parse_schedule("cron(0 0 31 FEB ? *)").next_after(MOMENT)
+
+
+def test_invalid_overlap(mock_smyth):
+    with pytest.raises(ValueError):
+        ScheduledEventSource(mock_smyth, "test_handler", "rate(1 minute)", "wait")
+
+
+def test_get_event_data(mock_smyth):
+    event_source = ScheduledEventSource(mock_smyth, "test_handler", "rate(1 minute)")
+
+    event_data = event_source.get_event_data(MOMENT)
+
+    assert event_data["detail-type"] == "Scheduled Event"
+    assert event_data["source"] == "aws.events"
+    assert event_data["time"] == "2024-01-01T12:30:15Z"
+    assert event_data["region"] == "eu-central-1"
+    assert event_data["resources"] == [
+        "arn:aws:events:eu-central-1:000000000000:rule/test_handler"
+    ]
+    assert event_data["detail"] == {}
+
+
+async def test_invoke(mock_smyth, smyth_handler):
+    event_source = ScheduledEventSource(mock_smyth, "test_handler", "rate(1 minute)")
+    scheduled_time = datetime.now(timezone.utc)
+
+    await event_source.invoke(scheduled_time)
+
+    mock_smyth.invoke.assert_awaited_once()
+    assert mock_smyth.invoke.call_args.args[0] is smyth_handler
+    status = event_source.get_status()
+    assert status["invocations"] == 1
+    assert status["failed"] == 0
+    assert status["drift"]["last"] >= 0
+
+
+async def test_invoke_failure(mock_smyth):
+    mock_smyth.invoke.side_effect = LambdaInvocationError("boom")
+    event_source = ScheduledEventSource(mock_smyth, "test_handler", "rate(1 minute)")
+
+    await event_source.invoke(datetime.now(timezone.utc))
+
+    assert event_source.get_status()["failed"] == 1
+
+
+@pytest.mark.parametrize(
+    "overlap, invocations, skipped, queued",
+    [("skip", 1, 1, 0), ("queue", 2, 0, 1)],
+)
+async def test_overlap(mock_smyth, overlap, invocations, skipped, queued):
+    release = asyncio.Event()
+
+    async def invoke(*args):
+        await release.wait()
+
+    mock_smyth.invoke.side_effect = invoke
+    event_source = ScheduledEventSource(
+        mock_smyth, "test_handler", "rate(1 minute)", overlap
+    )
+
+    event_source.trigger(datetime.now(timezone.utc))
+    await asyncio.sleep(0)
+    event_source.trigger(datetime.now(timezone.utc))
+    release.set()
+    await asyncio.gather(*event_source._run_tasks)
+
+    status = event_source.get_status()
+    assert status["invocations"] == invocations
+    assert status["skipped"] == skipped
+    assert status["queued"] == queued
+
+
+async def test_start_stop(mock_smyth):
+    event_source = ScheduledEventSource(mock_smyth, "test_handler", "rate(1 second)")
+    event_source.schedule = RateSchedule(timedelta(milliseconds=10))
+
+    event_source.start()
+    await asyncio.sleep(0.1)
+    await event_source.stop()
+
+    assert mock_smyth.invoke.await_count >= 2
+    assert event_source.get_status()["next_run"] is not None
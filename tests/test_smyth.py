@@ -1,16 +1,27 @@
+import asyncio
+import threading
+
 import pytest
 
-from smyth.exceptions import ProcessDefinitionNotFoundError
+from smyth.exceptions import (
+    ConcurrencyLimitExceededError,
+    LambdaInvocationError,
+    NoAvailableProcessError,
+    ProcessDefinitionNotFoundError,
+)
+from smyth.runner.remote import RemoteRunnerProcess
+from smyth.runner.runtime_api import RuntimeAPIRunnerProcess
 from smyth.runner.strategy import first_warm
 from smyth.smyth import Smyth
-from smyth.types import SmythHandlerState
+from smyth.types import LambdaResponse, LambdaStreamingResponse, SmythHandlerState
 
 pytestmark = pytest.mark.anyio
 
 
 @pytest.fixture
 def smyth(mock_event_data_function, mock_context_data_function):
-    smyth = Smyth()
+    # The mocked invocations leave the runners working, they aren't drained
+    smyth = Smyth(shutdown_timeout=0)
     smyth.add_handler(
         name="test_handler",
         path="/test_handler",
@@ -38,6 +49,22 @@ def test_smyth_add_handler(smyth, mock_event_data_function, mock_context_data_fu
     assert handler.concurrency == 1
 
 
+def test_smyth_add_handler_route_key():
+    smyth = Smyth()
+    smyth.add_handler(
+        name="item_handler",
+        path="GET /items/{id}",
+        lambda_handler_path="tests.conftest.example_handler",
+    )
+
+    handler = smyth.get_handler_for_name("item_handler")
+    assert handler.method == "GET"
+    assert handler.route_key == "GET /items/{id}"
+    assert smyth.get_handler_for_request("/items/1", "GET") == handler
+    with pytest.raises(ProcessDefinitionNotFoundError):
+        smyth.get_handler_for_request("/items/1", "POST")
+
+
 def test_context_enter_exit(mocker):
     smyth = Smyth()
     mocker.patch.object(smyth, "start_runners")
@@ -55,6 +82,127 @@ def test_start_stop_runners(smyth):
     smyth.stop_runners()
 
 
+def test_launch_processes_not_ready(mocker, smyth, caplog):
+    smyth.startup_timeout = 0.1
+    ready, not_ready = mocker.Mock(), mocker.Mock()
+    ready.wait_ready.return_value = True
+    not_ready.wait_ready.return_value = False
+    not_ready.name = "test_handler:1"
+    handler = smyth.get_handler_for_name("test_handler")
+
+    smyth.launch_processes([(handler, ready), (handler, not_ready)])
+
+    ready.start.assert_called_once()
+    not_ready.start.assert_called_once()
+    ready.emit.assert_called_with("runner.ready")
+    not_ready.emit.assert_called_once_with("runner.spawn")
+    assert "Processes not ready after 0.1s: test_handler:1" in caplog.text
+
+
+def test_stop_runners_drains(mocker, smyth):
+    smyth.shutdown_timeout = 5
+    working = mocker.Mock(state=SmythHandlerState.WORKING)
+    warm = mocker.Mock(state=SmythHandlerState.WARM)
+    smyth.processes = {"test_handler": [working, warm]}
+
+    def finish(seconds):
+        working.state = SmythHandlerState.WARM
+
+    mocker.patch("smyth.smyth.sleep", side_effect=finish)
+
+    smyth.stop_runners()
+
+    # Waited for the invocation in flight, then stopped both
+    for process in (working, warm):
+        process.stop.assert_called_once()
+        process.terminate.assert_not_called()
+        process.emit.assert_called_once_with("runner.stop", terminated=False)
+
+
+def test_stop_runners_closes_recorder(mocker, smyth):
+    smyth.recorder = mocker.Mock()
+
+    smyth.stop_runners()
+
+    smyth.recorder.close.assert_called_once()
+
+
+def test_stop_runners_drain_deadline(mocker, smyth):
+    smyth.shutdown_timeout = 0.05
+    working = mocker.Mock(state=SmythHandlerState.WORKING)
+    warm = mocker.Mock(state=SmythHandlerState.WARM)
+    smyth.processes = {"test_handler": [working, warm]}
+
+    smyth.stop_runners()
+
+    working.terminate.assert_called_once()
+    working.stop.assert_not_called()
+    working.emit.assert_called_once_with("runner.stop", terminated=True)
+    warm.stop.assert_called_once()
+
+
+def test_start_stop_runners_in_runner_pool(mocker, smyth):
+    mock_start = mocker.patch("smyth.runner.remote.RemoteRunnerProcess.start")
+    smyth.runner_pool_path = "/tmp/runners.sock"
+
+    smyth.start_runners()
+
+    (process,) = smyth.processes["test_handler"]
+    assert isinstance(process, RemoteRunnerProcess)
+    assert process.handler_name == "test_handler"
+    assert process.socket_path == "/tmp/runners.sock"
+    mock_start.assert_called_once()
+    smyth.stop_runners()
+
+
+def test_start_stop_runners_with_runtime_api(mocker):
+    mock_start = mocker.patch("smyth.runner.runtime_api.RuntimeAPIRunnerProcess.start")
+    mock_stop = mocker.patch("smyth.runner.runtime_api.RuntimeAPIRunnerProcess.stop")
+    smyth = Smyth()
+    smyth.add_handler(
+        name="test_handler",
+        path="/test_handler",
+        lambda_handler_path="tests.conftest.example_handler",
+        transport="runtime_api",
+        bootstrap=["./bootstrap"],
+    )
+
+    smyth.start_runners()
+
+    (process,) = smyth.processes["test_handler"]
+    assert isinstance(process, RuntimeAPIRunnerProcess)
+    assert process.command == ["./bootstrap"]
+    assert process.environ["AWS_LAMBDA_FUNCTION_NAME"] == "test_handler"
+    mock_start.assert_called_once()
+    smyth.stop_runners()
+    mock_stop.assert_called_once()
+
+
+def test_create_process_with_start_method(mocker):
+    mock_configure = mocker.patch("smyth.smyth.configure_start_method")
+    smyth = Smyth(start_method="forkserver", preload_modules=["boto3"])
+    smyth.add_handler(
+        name="test_handler",
+        path="/test_handler",
+        lambda_handler_path="tests.conftest.example_handler",
+    )
+
+    process = smyth.create_process(smyth.smyth_handlers["test_handler"], 0)
+
+    mock_configure.assert_called_once_with("forkserver", ["boto3"])
+    assert process.start_method == "forkserver"
+
+
+def test_smyth_add_handler_invalid_transport():
+    with pytest.raises(ValueError, match="Invalid runner transport"):
+        Smyth().add_handler(
+            name="test_handler",
+            path="/test_handler",
+            lambda_handler_path="tests.conftest.example_handler",
+            transport="carrier_pigeon",
+        )
+
+
 def test_get_handler_for_request(smyth):
     handler = smyth.get_handler_for_request("/test_handler")
     assert handler.name == "test_handler"
@@ -66,7 +214,10 @@ def test_get_handler_for_request(smyth):
 async def test_smyth_dispatch(
     smyth, mocker, mock_event_data_function, mock_context_data_function
 ):
-    mock_asend = mocker.patch("smyth.runner.process.RunnerProcess.asend")
+    mock_asend = mocker.patch(
+        "smyth.runner.process.RunnerProcess.asend",
+        return_value={"statusCode": 201, "body": "Hello, World!"},
+    )
     mock_request = mocker.Mock()
     mock_request.method = "GET"
     mock_request.url.path = "/test_handler"
@@ -80,7 +231,102 @@ async def test_smyth_dispatch(
     assert mock_asend.await_args[0][0].type == "smyth.lambda.invoke"
     assert mock_asend.await_args[0][0].event == await mock_event_data_function()
     assert mock_asend.await_args[0][0].context == await mock_context_data_function()
-    assert response == mock_asend.return_value
+    assert response == LambdaResponse(statusCode=201, body="Hello, World!")
+
+
+async def test_smyth_dispatch_malformed_response(smyth, mocker):
+    mocker.patch(
+        "smyth.runner.process.RunnerProcess.asend",
+        return_value={"batchItemFailures": []},
+    )
+
+    with smyth:
+        with pytest.raises(LambdaInvocationError):
+            await smyth.dispatch(
+                smyth.get_handler_for_name("test_handler"), mocker.Mock()
+            )
+
+
+async def test_smyth_dispatch_streaming(smyth, mocker):
+    mocker.patch(
+        "smyth.runner.process.RunnerProcess.asend",
+        return_value=LambdaStreamingResponse(
+            chunks=iter([b"Hello, ", b"World!"]), status_code=201
+        ),
+    )
+
+    with smyth:
+        response = await smyth.dispatch(
+            smyth.get_handler_for_name("test_handler"), mocker.Mock()
+        )
+        # the invocation is in flight until the stream is read
+        assert smyth.concurrency_limiter.in_flight == {"test_handler": 1}
+        assert response.status_code == 201
+        assert [chunk async for chunk in response.iterate()] == [
+            b"Hello, ",
+            b"World!",
+        ]
+
+    assert smyth.concurrency_limiter.in_flight == {"test_handler": 0}
+
+
+async def test_smyth_dispatch_streaming_closed(smyth, mocker):
+    drained = []
+
+    def chunks():
+        try:
+            yield b"Hello, "
+            yield b"World!"
+        finally:
+            drained.append(threading.get_ident())
+
+    mocker.patch(
+        "smyth.runner.process.RunnerProcess.asend",
+        return_value=LambdaStreamingResponse(chunks=chunks()),
+    )
+
+    with smyth:
+        response = await smyth.dispatch(
+            smyth.get_handler_for_name("test_handler"), mocker.Mock()
+        )
+        stream = response.iterate()
+        assert await anext(stream) == b"Hello, "
+        await stream.aclose()
+
+    # the rest of the stream is drained in a thread, not on the event loop
+    assert drained and drained != [threading.get_ident()]
+    assert smyth.concurrency_limiter.in_flight == {"test_handler": 0}
+
+
+async def test_smyth_dispatch_streaming_closed_unread(smyth, mocker):
+    chunks = iter([b"Hello, ", b"World!"])
+    mocker.patch(
+        "smyth.runner.process.RunnerProcess.asend",
+        return_value=LambdaStreamingResponse(chunks=chunks),
+    )
+
+    with smyth:
+        response = await smyth.dispatch(
+            smyth.get_handler_for_name("test_handler"), mocker.Mock()
+        )
+        await response.aclose()
+        await response.aclose()
+
+    # a stream that was never read is read to its end
+    assert list(chunks) == []
+    assert smyth.concurrency_limiter.in_flight == {"test_handler": 0}
+
+
+async def test_invoke_streaming(smyth, mocker):
+    mocker.patch(
+        "smyth.runner.process.RunnerProcess.asend",
+        return_value=LambdaStreamingResponse(chunks=iter([b"Hello, ", b"World!"])),
+    )
+
+    with smyth:
+        response = await smyth.invoke(smyth.get_handler_for_name("test_handler"), {})
+
+    assert response == b"Hello, World!"
 
 
 async def test_invoke(
@@ -99,3 +345,309 @@ async def test_invoke(
     assert mock_asend.await_args[0][0].event == event_data
     assert mock_asend.await_args[0][0].context == await mock_context_data_function()
     assert response == mock_asend.return_value
+
+
+async def test_invoke_throttled(smyth, mocker):
+    mock_asend = mocker.patch("smyth.runner.process.RunnerProcess.asend")
+    smyth.concurrency_limiter.reserve("test_handler", 0)
+
+    with smyth:
+        with pytest.raises(ConcurrencyLimitExceededError):
+            await smyth.invoke(smyth.get_handler_for_name("test_handler"), {})
+
+    mock_asend.assert_not_called()
+    assert smyth.concurrency_limiter.in_flight == {}
+
+
+async def test_send_recorded(smyth, mocker):
+    process = mocker.Mock(
+        task_counter=0,
+        asend=mocker.AsyncMock(side_effect=[{"ok": True}, LambdaInvocationError()]),
+    )
+    process.name = "test_handler:0"
+    smyth.recorder = mocker.Mock()
+    message = mocker.Mock()
+
+    assert await smyth.send("test_handler", process, message) == {"ok": True}
+    with pytest.raises(LambdaInvocationError):
+        await smyth.send("test_handler", process, message)
+
+    first, second = smyth.recorder.record.call_args_list
+    assert first.args[:3] == ("test_handler", "test_handler:0", message)
+    assert first.args[5] is True
+    assert first.kwargs == {"response": {"ok": True}}
+    assert isinstance(second.kwargs["error"], LambdaInvocationError)
+
+
+@pytest.fixture
+def smyth_with_runners(mocker, smyth):
+    smyth.smyth_handlers["test_handler"].concurrency = 3
+    processes = [
+        mocker.Mock(name=f"process{index}", state=SmythHandlerState.WARM)
+        for index in range(3)
+    ]
+    smyth.processes = {"test_handler": processes}
+    smyth.strategy_generators = {
+        "test_handler": first_warm("test_handler", smyth.processes)
+    }
+    return smyth
+
+
+async def test_claim_process(smyth_with_runners):
+    first, second, third = smyth_with_runners.processes["test_handler"]
+
+    async with smyth_with_runners.claim_process("test_handler") as process:
+        assert process is third
+        # the process is claimed once the event and context are built
+        assert process.state == SmythHandlerState.WARM
+    assert process.state == SmythHandlerState.WORKING
+    with pytest.raises(ValueError):
+        async with smyth_with_runners.claim_process("test_handler") as process:
+            assert process is second
+            raise ValueError
+
+    assert second.state == SmythHandlerState.WARM
+    assert third.state == SmythHandlerState.WORKING
+
+
+async def test_claim_process_waits(smyth_with_runners):
+    processes = smyth_with_runners.processes["test_handler"]
+    for process in processes:
+        process.state = SmythHandlerState.WORKING
+
+    async def claim():
+        async with smyth_with_runners.claim_process("test_handler") as process:
+            return process
+
+    task = asyncio.create_task(claim())
+    await asyncio.sleep(0.01)
+    assert not task.done()
+    processes[1].state = SmythHandlerState.WARM
+    await smyth_with_runners.release_process("test_handler")
+
+    assert await task is processes[1]
+
+
+async def test_claim_process_none_available(smyth_with_runners):
+    smyth_with_runners.smyth_handlers["test_handler"].timeout = 0.05
+    processes = smyth_with_runners.processes["test_handler"]
+    for process in processes:
+        process.state = SmythHandlerState.WORKING
+
+    with pytest.raises(NoAvailableProcessError):
+        async with smyth_with_runners.claim_process("test_handler"):
+            pass
+
+    processes[0].state = SmythHandlerState.WARM
+    async with smyth_with_runners.claim_process("test_handler") as process:
+        assert process is processes[0]
+
+
+async def test_claim_process_not_found(smyth):
+    with pytest.raises(ProcessDefinitionNotFoundError):
+        async with smyth.claim_process("test_handler"):
+            pass
+
+
+async def test_dispatch_waits_for_process(mocker, smyth_with_runners):
+    process = smyth_with_runners.processes["test_handler"][0]
+    smyth_with_runners.processes["test_handler"][1:] = []
+    handler = smyth_with_runners.smyth_handlers["test_handler"]
+    states = []
+
+    async def context_data_function(request, smyth_handler, process):
+        states.append(process.state)
+        return {}
+
+    async def asend(message):
+        await asyncio.sleep(0.01)
+        process.state = SmythHandlerState.WARM
+        return {"statusCode": 200, "body": ""}
+
+    handler.context_data_function = context_data_function
+    process.asend = mocker.AsyncMock(side_effect=asend)
+
+    responses = await asyncio.gather(
+        *(smyth_with_runners.dispatch(handler, mocker.Mock()) for _ in range(3))
+    )
+
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert states == [SmythHandlerState.WARM] * 3
+    assert smyth_with_runners.concurrency_limiter.in_flight == {"test_handler": 0}
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+async def test_invoke_many(mocker, smyth_with_runners, ordered):
+    in_flight = 0
+    max_in_flight = 0
+
+    async def invoke(handler, event_data):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01 * (5 - event_data["n"]))
+        in_flight -= 1
+        if event_data["n"] == 3:
+            raise LambdaInvocationError("boom")
+        return event_data["n"] * 2
+
+    mocker.patch.object(smyth_with_runners, "invoke", side_effect=invoke)
+    handler = smyth_with_runners.get_handler_for_name("test_handler")
+
+    results = [
+        result
+        async for result in smyth_with_runners.invoke_many(
+            handler, ({"n": n} for n in range(5)), parallelism=2, ordered=ordered
+        )
+    ]
+
+    assert max_in_flight == 2
+    assert sorted(result.index for result in results) == [0, 1, 2, 3, 4]
+    if ordered:
+        assert [result.index for result in results] == [0, 1, 2, 3, 4]
+    else:
+        assert [result.index for result in results] != [0, 1, 2, 3, 4]
+    results_by_index = {result.index: result for result in results}
+    assert results_by_index[1].response == 2
+    assert isinstance(results_by_index[3].error, LambdaInvocationError)
+
+
+async def test_invoke_many_async_events(mocker, smyth_with_runners):
+    async def invoke(handler, event_data):
+        return event_data
+
+    mocker.patch.object(smyth_with_runners, "invoke", side_effect=invoke)
+
+    async def events():
+        for n in range(3):
+            yield {"n": n}
+
+    results = [
+        result.response
+        async for result in smyth_with_runners.invoke_many(
+            smyth_with_runners.get_handler_for_name("test_handler"),
+            events(),
+            parallelism=10,
+        )
+    ]
+
+    assert results == [{"n": 0}, {"n": 1}, {"n": 2}]
+
+
+async def test_restart_runners(mocker, smyth_with_runners):
+    old_processes = smyth_with_runners.processes["test_handler"]
+    old_processes[0].state = SmythHandlerState.WORKING
+    new_processes = [mocker.Mock(name="new", state=SmythHandlerState.COLD)]
+    mocker.patch.object(
+        smyth_with_runners, "start_processes", return_value=new_processes
+    )
+    mocker.patch("smyth.smyth.DRAIN_INTERVAL", 0.01)
+
+    async def finish_invocation():
+        await asyncio.sleep(0.05)
+        old_processes[0].state = SmythHandlerState.WARM
+
+    task = asyncio.create_task(finish_invocation())
+    await smyth_with_runners.restart_runners("test_handler")
+    await task
+
+    assert smyth_with_runners.processes["test_handler"] == new_processes
+    async with smyth_with_runners.claim_process("test_handler") as process:
+        assert process is new_processes[0]
+    for process in old_processes:
+        process.stop.assert_called_once()
+        process.terminate.assert_not_called()
+        process.join.assert_called_once()
+
+
+async def test_restart_runners_terminates_after_timeout(mocker, smyth_with_runners):
+    smyth_with_runners.smyth_handlers["test_handler"].timeout = 0.05
+    old_process = smyth_with_runners.processes["test_handler"][0]
+    old_process.state = SmythHandlerState.WORKING
+    mocker.patch.object(smyth_with_runners, "start_processes", return_value=[])
+    mocker.patch("smyth.smyth.DRAIN_INTERVAL", 0.01)
+
+    await smyth_with_runners.restart_runners("test_handler")
+
+    old_process.terminate.assert_called_once()
+    old_process.stop.assert_not_called()
+
+
+def test_get_module_files(mocker, smyth_with_runners):
+    first, second, third = smyth_with_runners.processes["test_handler"]
+    first.module_files = {"/app/handler.py", "/app/models.py"}
+    second.module_files = {"/app/handler.py"}
+    third.module_files = set()
+
+    assert smyth_with_runners.get_module_files("test_handler") == {
+        "/app/handler.py",
+        "/app/models.py",
+    }
+    assert smyth_with_runners.get_module_files("unknown") == set()
+
+
+async def test_resize_runners(mocker, smyth_with_runners):
+    first, second, third = smyth_with_runners.processes["test_handler"]
+    new_process = mocker.Mock(name="new", state=SmythHandlerState.COLD)
+    mock_create_process = mocker.patch.object(
+        smyth_with_runners, "create_process", return_value=new_process
+    )
+
+    smyth_with_runners.smyth_handlers["test_handler"].concurrency = 4
+    await smyth_with_runners.resize_runners("test_handler")
+
+    assert smyth_with_runners.processes["test_handler"] == [
+        first,
+        second,
+        third,
+        new_process,
+    ]
+    assert mock_create_process.call_args.args[1] == 3
+    new_process.start.assert_called_once()
+
+    smyth_with_runners.smyth_handlers["test_handler"].concurrency = 1
+    await smyth_with_runners.resize_runners("test_handler")
+
+    assert smyth_with_runners.processes["test_handler"] == [first]
+    async with smyth_with_runners.claim_process("test_handler") as process:
+        assert process is first
+    first.stop.assert_not_called()
+    for process in (second, third, new_process):
+        process.stop.assert_called_once()
+
+
+async def test_remove_handler(smyth_with_runners):
+    processes = smyth_with_runners.processes["test_handler"]
+    smyth_with_runners.concurrency_limiter.reserve("test_handler", 2)
+
+    await smyth_with_runners.remove_handler("test_handler")
+
+    assert smyth_with_runners.smyth_handlers == {}
+    assert smyth_with_runners.processes == {}
+    assert smyth_with_runners.concurrency_limiter.reserved == {}
+    with pytest.raises(ProcessDefinitionNotFoundError):
+        smyth_with_runners.get_handler_for_request("/test_handler")
+    for process in processes:
+        process.stop.assert_called_once()
+
+
+async def test_runner_events(mocker, smyth):
+    process = mocker.Mock(name="process", state=SmythHandlerState.WARM)
+    process.name = "test_handler:0"
+    mocker.patch.object(smyth, "create_process", return_value=process)
+
+    with smyth.monitor.subscribe() as subscription:
+        smyth.start_processes(smyth.smyth_handlers["test_handler"])
+        assert process.emit.call_args_list == [
+            mocker.call("runner.spawn"),
+            mocker.call("runner.ready"),
+        ]
+        process.on_event("runner.state", runner=process.name, state="cold")
+        event = await subscription.get()
+
+    assert event["handler"] == "test_handler"
+    assert event["runner"] == "test_handler:0"
+    assert event["state"] == "cold"
+
+    Smyth.stop_process(process)
+    process.emit.assert_called_with("runner.stop", terminated=False)
@@ -0,0 +1,255 @@
+import asyncio
+
+import pytest
+
+from smyth.exceptions import LambdaInvocationError
+from smyth.sqs import LocalQueue, SQSEventSource
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def queue():
+    queue = LocalQueue()
+    yield queue
+    queue.close()
+
+
+@pytest.fixture
+def mock_smyth(mocker, smyth_handler):
+    smyth = mocker.Mock()
+    smyth.get_handler_for_name.return_value = smyth_handler
+    smyth.invoke = mocker.AsyncMock(return_value=None)
+    return smyth
+
+
+@pytest.fixture
+def event_source(mock_smyth, queue):
+    return SQSEventSource(
+        smyth=mock_smyth,
+        handler_name="test_handler",
+        queue=queue,
+        queue_name="orders",
+        batch_size=2,
+        max_receive_count=1,
+        dead_letter_queue_name="orders-dlq",
+        poll_interval=0.01,
+    )
+
+
+def test_queue_send_receive(queue):
+    first = queue.send("orders", "first", {"a": {"StringValue": "1"}})
+    queue.send("orders", "second")
+    queue.send("products", "third")
+
+    messages = queue.receive("orders", 10, visibility_timeout=30)
+
+    assert [message.body for message in messages] == ["first", "second"]
+    assert messages[0].message_id == first.message_id
+    assert messages[0].message_attributes == {"a": {"StringValue": "1"}}
+    assert messages[0].receive_count == 1
+    assert messages[0].receipt_handle is not None
+    assert queue.receive("orders", 10, visibility_timeout=30) == []
+    assert queue.count("orders") == 2
+
+
+def test_queue_visibility_timeout(queue):
+    queue.send("orders", "first")
+
+    (message,) = queue.receive("orders", 10, visibility_timeout=0)
+    (received_again,) = queue.receive("orders", 10, visibility_timeout=0)
+
+    assert received_again.message_id == message.message_id
+    assert received_again.receive_count == 2
+    assert received_again.receipt_handle != message.receipt_handle
+    assert received_again.first_receive_timestamp == message.first_receive_timestamp
+
+
+def test_queue_delay(queue):
+    queue.send("orders", "first", delay_seconds=30)
+
+    assert queue.receive("orders", 10, visibility_timeout=30) == []
+
+
+def test_queue_delete(queue):
+    queue.send("orders", "first")
+    (message,) = queue.receive("orders", 10, visibility_timeout=0)
+
+    queue.delete("orders", ["stale-receipt-handle"])
+    assert queue.count("orders") == 1
+
+    queue.delete("orders", [message.receipt_handle])
+    assert queue.count("orders") == 0
+
+
+def test_queue_move(queue):
+    queue.send("orders", "first")
+    (message,) = queue.receive("orders", 10, visibility_timeout=30)
+
+    queue.move(message, "orders-dlq")
+
+    assert queue.count("orders") == 0
+    (moved,) = queue.receive("orders-dlq", 10, visibility_timeout=30)
+    assert moved.message_id == message.message_id
+
+
+def test_queue_file(tmp_path):
+    queue = LocalQueue(str(tmp_path / "queues.sqlite3"))
+    queue.send("orders", "first")
+    queue.close()
+
+    queue = LocalQueue(str(tmp_path / "queues.sqlite3"))
+    assert queue.count("orders") == 1
+    queue.close()
+
+
+def test_get_event_data(event_source, queue):
+    queue.send("orders", "first", {"a": {"StringValue": "1", "DataType": "String"}})
+    (message,) = queue.receive("orders", 10, visibility_timeout=30)
+
+    assert event_source.get_event_data([message]) == {
+        "Records": [
+            {
+                "messageId": message.message_id,
+                "receiptHandle": message.receipt_handle,
+                "body": "first",
+                "attributes": {
+                    "ApproximateReceiveCount": "1",
+                    "SentTimestamp": str(message.sent_timestamp),
+                    "SenderId": "000000000000",
+                    "ApproximateFirstReceiveTimestamp": str(
+                        message.first_receive_timestamp
+                    ),
+                },
+                "messageAttributes": {"a": {"stringValue": "1", "dataType": "String"}},
+                "md5OfBody": "8b04d5e3775d298e78455efc5ca404d5",
+                "eventSource": "aws:sqs",
+                "eventSourceARN": "arn:aws:sqs:eu-central-1:000000000000:orders",
+                "awsRegion": "eu-central-1",
+            }
+        ]
+    }
+
+
+async def test_receive_batch(event_source, queue):
+    for body in ("first", "second", "third"):
+        queue.send("orders", body)
+
+    messages = await event_source.receive_batch()
+
+    assert [message.body for message in messages] == ["first", "second"]
+
+
+async def test_receive_batch_window(event_source, queue):
+    event_source.maximum_batching_window = 0.05
+    queue.send("orders", "first")
+
+    async def send_later():
+        await asyncio.sleep(0.02)
+        queue.send("orders", "second")
+
+    _, messages = await asyncio.gather(send_later(), event_source.receive_batch())
+
+    assert [message.body for message in messages] == ["first", "second"]
+
+
+async def test_receive_batch_dead_letter_queue(event_source, queue):
+    event_source.maximum_batching_window = 0.01
+    queue.send("orders", "first")
+    queue.receive("orders", 10, visibility_timeout=0)
+    queue.send("orders", "second")
+
+    messages = await event_source.receive_batch()
+
+    assert [message.body for message in messages] == ["second"]
+    assert queue.count("orders-dlq") == 1
+    assert event_source.metrics.moved_to_dead_letter_queue == 1
+
+
+async def test_process_batch(event_source, queue, mock_smyth):
+    queue.send("orders", "first")
+    queue.send("orders", "second")
+    messages = queue.receive("orders", 10, visibility_timeout=30)
+
+    await event_source.process_batch(messages)
+
+    mock_smyth.invoke.assert_awaited_once_with(
+        mock_smyth.get_handler_for_name.return_value,
+        event_source.get_event_data(messages),
+    )
+    assert queue.count("orders") == 0
+    assert event_source.metrics.succeeded == 2
+
+
+async def test_process_batch_item_failures(event_source, queue, mock_smyth):
+    queue.send("orders", "first")
+    queue.send("orders", "second")
+    messages = queue.receive("orders", 10, visibility_timeout=30)
+    mock_smyth.invoke.return_value = {
+        "batchItemFailures": [{"itemIdentifier": messages[1].message_id}]
+    }
+
+    await event_source.process_batch(messages)
+
+    assert queue.count("orders") == 1
+    assert event_source.metrics.succeeded == 1
+    assert event_source.metrics.failed == 1
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        {"batchItemFailures": [{"itemIdentifier": "unknown"}]},
+        {"batchItemFailures": [{"itemIdentifier": ""}]},
+        {"batchItemFailures": ["invalid"]},
+    ],
+)
+async def test_process_batch_invalid_item_failures(
+    event_source, queue, mock_smyth, response
+):
+    queue.send("orders", "first")
+    messages = queue.receive("orders", 10, visibility_timeout=30)
+    mock_smyth.invoke.return_value = response
+
+    await event_source.process_batch(messages)
+
+    assert queue.count("orders") == 1
+    assert event_source.metrics.failed == 1
+
+
+async def test_process_batch_error(event_source, queue, mock_smyth):
+    queue.send("orders", "first")
+    messages = queue.receive("orders", 10, visibility_timeout=30)
+    mock_smyth.invoke.side_effect = LambdaInvocationError("Test error")
+
+    await event_source.process_batch(messages)
+
+    assert queue.count("orders") == 1
+    assert event_source.metrics.failed == 1
+
+
+async def test_start_stop(event_source, queue, mock_smyth):
+    queue.send("orders", "first")
+
+    event_source.start()
+    for _ in range(100):
+        if queue.count("orders") == 0:
+            break
+        await asyncio.sleep(0.01)
+    await event_source.stop()
+
+    assert queue.count("orders") == 0
+    mock_smyth.invoke.assert_awaited_once()
+    assert event_source.get_status() == {
+        "handler": "test_handler",
+        "queue": "orders",
+        "messages": 0,
+        "in_flight_batches": 0,
+        "batches": 1,
+        "received": 1,
+        "succeeded": 1,
+        "failed": 0,
+        "moved_to_dead_letter_queue": 0,
+        "invocation_time": event_source.metrics.invocation_time,
+        "dead_letter_queue_messages": 0,
+    }
@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+from starlette.concurrency import run_in_threadpool
+
+from smyth.exceptions import LambdaInvocationError, LambdaTimeoutError, SubprocessError
+from smyth.runner.remote import RemoteRunnerProcess
+from smyth.runner.strategy import first_warm
+from smyth.smyth import Smyth
+from smyth.supervisor import RunnerPool
+from smyth.types import LambdaStreamingResponse, RunnerInputMessage, SmythHandlerState
+
+pytestmark = pytest.mark.anyio
+
+INVOCATION = RunnerInputMessage(type="smyth.lambda.invoke", event={"n": 1}, context={})
+
+
+@pytest.fixture
+def smyth(mocker, mock_event_data_function, mock_context_data_function):
+    smyth = Smyth()
+    smyth.add_handler(
+        name="test_handler",
+        path="/test_handler",
+        lambda_handler_path="tests.conftest.example_handler",
+        event_data_function=mock_event_data_function,
+        context_data_function=mock_context_data_function,
+        strategy_generator=first_warm,
+    )
+    process = mocker.Mock(name="test_handler:0", state=SmythHandlerState.WARM)
+    process.asend = mocker.AsyncMock(return_value={"statusCode": 200})
+    smyth.processes = {"test_handler": [process]}
+    smyth.strategy_generators = {
+        "test_handler": first_warm("test_handler", smyth.processes)
+    }
+    return smyth
+
+
+@pytest.fixture
+async def runner_pool(smyth, tmp_path):
+    pool = RunnerPool(smyth, str(tmp_path / "runners.sock"))
+    await pool.start()
+    yield pool
+    await pool.stop()
+
+
+@pytest.fixture
+def remote_process(runner_pool):
+    process = RemoteRunnerProcess(
+        "test_handler:0", "test_handler", runner_pool.socket_path
+    )
+    process.start()
+    yield process
+    process.stop()
+
+
+async def test_runner_pool_response(smyth, remote_process):
+    assert await remote_process.asend(INVOCATION) == {"statusCode": 200}
+    assert remote_process.state == SmythHandlerState.WARM
+    assert remote_process.task_counter == 1
+    smyth.processes["test_handler"][0].asend.assert_awaited_once_with(INVOCATION)
+
+
+@pytest.mark.parametrize(
+    ("error", "expected_error"),
+    [
+        (LambdaTimeoutError("Lambda timeout"), LambdaTimeoutError),
+        (LambdaInvocationError("boom"), LambdaInvocationError),
+        (SubprocessError("Process is not alive"), LambdaInvocationError),
+    ],
+)
+async def test_runner_pool_error(smyth, remote_process, error, expected_error):
+    smyth.processes["test_handler"][0].asend.side_effect = error
+
+    with pytest.raises(expected_error, match=str(error)):
+        await remote_process.asend(INVOCATION)
+
+
+async def test_runner_pool_stream(smyth, remote_process):
+    smyth.processes["test_handler"][0].asend.return_value = LambdaStreamingResponse(
+        chunks=iter([b"a,b\n", b"1,2\n"]), status_code=201
+    )
+
+    response = await remote_process.asend(INVOCATION)
+
+    assert isinstance(response, LambdaStreamingResponse)
+    assert response.status_code == 201
+    assert await run_in_threadpool(response.read) == b"a,b\n1,2\n"
+    assert remote_process.state == SmythHandlerState.WARM
+
+
+async def test_runner_pool_shares_runners(smyth, runner_pool):
+    in_flight = 0
+    max_in_flight = 0
+
+    async def asend(message):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        smyth.processes["test_handler"][0].state = SmythHandlerState.WARM
+        return message.event
+
+    smyth.processes["test_handler"][0].asend.side_effect = asend
+    remote_processes = [
+        RemoteRunnerProcess(
+            f"test_handler:{index}", "test_handler", runner_pool.socket_path
+        )
+        for index in range(3)
+    ]
+    for process in remote_processes:
+        process.start()
+
+    responses = await asyncio.gather(
+        *(process.asend(INVOCATION) for process in remote_processes)
+    )
+
+    for process in remote_processes:
+        process.stop()
+    assert responses == [{"n": 1}] * 3
+    assert max_in_flight == 1
+
+
+async def test_runner_pool_unknown_handler(runner_pool):
+    process = RemoteRunnerProcess("unknown:0", "unknown", runner_pool.socket_path)
+    process.start()
+
+    with pytest.raises(SubprocessError):
+        await process.asend(INVOCATION)
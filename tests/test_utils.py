@@ -1,4 +1,7 @@
-from smyth.utils import get_logging_config, import_attribute
+import io
+import logging
+
+from smyth.utils import DeferredHandler, get_logging_config, import_attribute
 
 
 def test_get_logging_config():
@@ -26,6 +29,26 @@ def test_get_logging_config():
     )
     assert logging_config["handlers"]["console"]["filters"] == ["smyth_api_filter"]
 
+    logging_config = get_logging_config("INFO", deferred=True)
+    assert (
+        logging_config["handlers"]["console"]["class"] == "smyth.utils.DeferredHandler"
+    )
+    assert (
+        logging_config["handlers"]["console"]["handler_class"]
+        == "smyth.utils.SmythRichHandler"
+    )
+
+
+def test_deferred_handler():
+    stream = io.StringIO()
+    handler = DeferredHandler("logging.StreamHandler", stream=stream)
+    assert handler.handler is None
+
+    handler.handle(logging.makeLogRecord({"msg": "Hello"}))
+
+    assert isinstance(handler.handler, logging.StreamHandler)
+    assert stream.getvalue() == "Hello\n"
+
 
 def test_import_attribute():
     assert import_attribute("smyth.utils.get_logging_config") == get_logging_config